@@ -1,16 +1,136 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, send_file, flash
+from flask import (
+    Flask, render_template, request, redirect, url_for, flash, jsonify,
+    Response, stream_with_context,
+)
 from backend import (
-    get_system_overview, get_network_overview,
-    list_dir, delete_path, make_dir, rename_path, save_upload, build_breadcrumbs, _safe_join
+    get_system_overview, get_network_overview, get_nic_history, get_processes, get_providers, start_sampler, get_metric_history, start_metric_archive,
+    prefetch_public_ip, get_live_state, sampler, configure_dir_cache, configure_ps_pool, write_listeners, _fmt_bytes,
+    list_dir_page, iter_dir, delete_path, make_dir, rename_path, save_upload,
+    build_breadcrumbs, list_roots_windows, _safe_join
 )
 import os
+import json
+import threading
 import config
+from sampler import diff
+from downloads import send_download, send_archive
+from uploads import UploadManager, UploadError
+from jobs import JobManager, JobError
+from dupfinder import DupFinder
+import fileview
+from duindex import DuIndex
+from searchindex import SearchIndex
+from metrics import Exporter, CONTENT_TYPE_TEXT, CONTENT_TYPE_OPENMETRICS
 
-def create_app():
+def create_app(follow=None, max_streams=None):
+    """
+    follow 为空：单进程，自己采集、自己跑后台索引（python app.py / serve.py 单 worker）。
+    follow 是共享快照路径：serve.py 起的多 worker 之一，采集和定时重扫都交给主进程。
+    max_streams：同时开着的 SSE 连接上限（None 不限）。固定大小的线程池里每条 SSE
+    一直占着一个线程，serve.py 按线程数给一个上限，超出的返回 503，普通请求总有线程可用。
+    """
     app = Flask(__name__)
     app.config.update(SECRET_KEY="dev-change-me")
     app.config["FILE_ROOT"] = getattr(config, "FILE_ROOT", os.path.abspath("."))
+    app.config["FILES_PAGE_SIZE"] = getattr(config, "FILES_PAGE_SIZE", 500)
+    app.config["ARCHIVE_LEVEL"] = getattr(config, "ARCHIVE_LEVEL", 6)
+    app.config["ARCHIVE_WORKERS"] = getattr(config, "ARCHIVE_WORKERS", 4)
+
+    configure_dir_cache(max_entries=getattr(config, "DIR_CACHE_MAX_ENTRIES", 200_000))
+    # 目录大小索引：FILE_ROOT 定时增量重扫，写操作后补扫对应目录
+    # worker 进程只查询；扫描请求经索引库里的 requests 表交给主进程
+    du = DuIndex(getattr(config, "DU_INDEX_PATH", os.path.abspath(".index/du.sqlite3")),
+                 workers=getattr(config, "DU_WORKERS", 8), remote=bool(follow))
+    if not follow:
+        du.start([app.config["FILE_ROOT"]], interval=getattr(config, "DU_RESCAN_INTERVAL", 600),
+                 restat_every=getattr(config, "DU_RESTAT_EVERY", 6))
+    write_listeners.append(du.touch)
+    app.jinja_env.filters["fmt_bytes"] = _fmt_bytes
+    stream_slots = threading.BoundedSemaphore(max_streams) if max_streams else None
+
+    # 文件名搜索索引：FILE_ROOT + 各盘符，inotify / 写操作回调只重列变化的目录
+    # worker 进程只查询；inotify 和重扫都在主进程
+    search = SearchIndex(getattr(config, "SEARCH_INDEX_PATH", os.path.abspath(".index/search.sqlite3")),
+                         workers=getattr(config, "SEARCH_WORKERS", 8), use_inotify=not follow)
+    search.add_root(app.config["FILE_ROOT"])
+    if getattr(config, "SEARCH_INCLUDE_DRIVES", True):
+        for d in list_roots_windows():
+            search.add_root(d["name"] + "\\", d["name"])
+    if not follow:
+        search.start(interval=getattr(config, "SEARCH_RESCAN_INTERVAL", 3600))
+        write_listeners.append(search.mark_dirty)
+
+    uploads = UploadManager(
+        state_dir=getattr(config, "UPLOAD_STATE_DIR", os.path.abspath(".uploads")),
+        chunk_size=getattr(config, "UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024),
+        ttl=getattr(config, "UPLOAD_TTL_HOURS", 72) * 3600,
+    )
+
+    jobs = JobManager(
+        state_dir=getattr(config, "JOB_STATE_DIR", os.path.abspath(".jobs")),
+        workers=getattr(config, "JOB_WORKERS", 2),
+        copy_threads=getattr(config, "JOB_COPY_THREADS", 8),
+    )
+    # 重复文件查找：哈希按 (设备, inode, 大小, mtime) 缓存，重扫只算变了的文件
+    dupes = DupFinder(getattr(config, "DUP_CACHE_PATH", os.path.abspath(".index/hashes.sqlite3")),
+                      processes=getattr(config, "DUP_PROCESSES", 4))
+
+    # 常驻 PowerShell 进程池（只在 Windows 上真正用到，第一次查询时才起进程）
+    configure_ps_pool(
+        size=getattr(config, "PS_WORKERS", 2),
+        timeout=getattr(config, "PS_TIMEOUT", 5.0),
+        idle_timeout=getattr(config, "PS_IDLE_TIMEOUT", 600),
+    )
+
+    # 历史指标落盘：采集进程批量写，worker 只读
+    archive_dir = getattr(config, "METRICS_ARCHIVE_DIR", None)
+    if archive_dir:
+        max_mb = getattr(config, "METRICS_ARCHIVE_MAX_MB", None)
+        start_metric_archive(
+            archive_dir,
+            raw_hours=getattr(config, "METRICS_ARCHIVE_RAW_HOURS", 48),
+            days=getattr(config, "METRICS_ARCHIVE_DAYS", 90),
+            max_bytes=max_mb * 1024 * 1024 if max_mb else None,
+            flush_interval=getattr(config, "METRICS_ARCHIVE_FLUSH", 10.0),
+            write=not follow,
+        )
+
+    # 后台采样线程：/system 只读快照
+    start_sampler(
+        interval=getattr(config, "SAMPLE_INTERVAL", 1.0),
+        gpu_interval=getattr(config, "GPU_SAMPLE_INTERVAL", 5.0),
+        network_interval=getattr(config, "NETWORK_SAMPLE_INTERVAL", 5.0),
+        listeners_use_procfs=getattr(config, "LISTENERS_USE_PROCFS", None),
+        follow=follow,
+    )
+    # 公网 IP 后台预取，/network 只读快照；worker 不自己查，用采集进程的结果
+    if not follow:
+        prefetch_public_ip(
+            urls=getattr(config, "PUBLIC_IP_URLS", None),
+            ttl=getattr(config, "PUBLIC_IP_TTL", 600),
+            negative_ttl=getattr(config, "PUBLIC_IP_NEGATIVE_TTL", 60),
+        )
+
+    def _sse(gen):
+        """包成 text/event-stream；占一个 SSE 名额，连接关掉时还回去。名额用完返回 503。"""
+        if stream_slots is not None and not stream_slots.acquire(blocking=False):
+            resp = jsonify({"error": f"实时连接数已满（每个进程最多 {max_streams} 条），请关掉一些页面后重试"})
+            resp.status_code = 503
+            resp.headers["Retry-After"] = "30"
+            return resp
+        resp = Response(stream_with_context(gen), mimetype="text/event-stream")
+        resp.headers["Cache-Control"] = "no-cache"
+        resp.headers["X-Accel-Buffering"] = "no"
+        if stream_slots is not None:
+            released = []
+
+            def release():
+                if not released:
+                    released.append(True)
+                    stream_slots.release()
+            resp.call_on_close(release)
+        return resp
 
     @app.route("/")
     def index():
@@ -25,27 +145,218 @@ def create_app():
     @app.route("/files")
     def files():
         path = request.args.get("path", "")
+        cursor = request.args.get("cursor") or None
+        limit = request.args.get("limit", app.config["FILES_PAGE_SIZE"], type=int)
         try:
-            items = list_dir(app.config["FILE_ROOT"], path)
+            page = list_dir_page(app.config["FILE_ROOT"], path, cursor=cursor, limit=limit)
             crumbs = build_breadcrumbs(path)
 
             norm = (path or "").replace("\\", "/").strip("/")
             is_c_root = (norm.upper() == "C:")
 
-            return render_template("files.html", items=items, path=path, crumbs=crumbs, is_c_root=is_c_root)
+            dir_sizes = du.child_sizes(_safe_join(app.config["FILE_ROOT"], path)) if path else {}
+
+            return render_template("files.html", items=page["items"], path=path, crumbs=crumbs,
+                                   is_c_root=is_c_root, cursor=cursor, next_cursor=page["next_cursor"],
+                                   limit=limit, dir_sizes=dir_sizes)
         except Exception as e:
             flash(f"打开目录失败：{e}", "danger")
             return render_template("files.html", items=[], path="", crumbs=[], is_c_root=False)
 
+    # ✅ 空间分析：/api/du?path= 返回目录汇总 + 子目录大小；没索引过的先排队扫描
+    @app.route("/api/du")
+    def api_du():
+        path = request.args.get("path", "")
+        if not path:
+            return jsonify({"error": "请指定目录"}), 400
+        try:
+            p = _safe_join(app.config["FILE_ROOT"], path)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if not p.is_dir():
+            return jsonify({"error": "不是目录"}), 404
+        info = du.lookup(p)
+        if info is None or request.args.get("refresh"):
+            du.request_scan(p)
+        if info is None:
+            return jsonify({"path": path, "pending": True}), 202
+        base = path.replace("\\", "/").strip("/")
+        for c in info["children"]:
+            c["path"] = f"{base}/{c['name']}"
+        info["path"] = path
+        info["pending"] = False
+        return jsonify(info)
+
+    @app.route("/files/du")
+    def files_du():
+        path = request.args.get("path", "")
+        return render_template("du.html", path=path, crumbs=build_breadcrumbs(path))
+
+    # ✅ 重复文件：POST /api/dupes 开始扫描，GET /api/dupes?path= 看进度和结果
+    @app.route("/api/dupes", methods=["POST"])
+    def api_dupes_start():
+        data = request.get_json(silent=True) or {}
+        path = data.get("path", "")
+        if not path:
+            return jsonify({"error": "请指定目录"}), 400
+        try:
+            p = _safe_join(app.config["FILE_ROOT"], path)
+            min_size = int(data.get("min_size") or getattr(config, "DUP_MIN_SIZE", 1))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if not p.is_dir():
+            return jsonify({"error": "不是目录"}), 404
+        return jsonify(dupes.start(p, path, min_size=min_size)), 202
+
+    @app.route("/api/dupes")
+    def api_dupes():
+        path = request.args.get("path", "")
+        info = dupes.status(path, limit=request.args.get("limit", 200, type=int))
+        if info is None:
+            return jsonify({"error": "这个目录还没有扫描过"}), 404
+        return jsonify(info)
+
+    @app.route("/api/dupes/cancel", methods=["POST"])
+    def api_dupes_cancel():
+        data = request.get_json(silent=True) or {}
+        info = dupes.cancel(data.get("path", ""))
+        if info is None:
+            return jsonify({"error": "这个目录还没有扫描过"}), 404
+        return jsonify(info)
+
+    @app.route("/files/dupes")
+    def files_dupes():
+        path = request.args.get("path", "")
+        return render_template("dupes.html", path=path, crumbs=build_breadcrumbs(path),
+                               min_size=getattr(config, "DUP_MIN_SIZE", 1))
+
+    # ✅ 文件名搜索：/api/files/search?q=&mode=auto|prefix|substring|glob&limit=
+    @app.route("/api/files/search")
+    def api_files_search():
+        q = request.args.get("q", "")
+        mode = request.args.get("mode", "auto")
+        try:
+            limit = max(1, min(int(request.args.get("limit", 100)), 1000))
+        except ValueError:
+            limit = 100
+        try:
+            return jsonify(search.search(q, mode=mode, limit=limit))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route("/api/files/search/stats")
+    def api_files_search_stats():
+        return jsonify(search.stats())
+
+    # ✅ 目录列表 JSON（分页）：/api/files/list?path=&cursor=&limit=
+    @app.route("/api/files/list")
+    def api_files_list():
+        path = request.args.get("path", "")
+        cursor = request.args.get("cursor") or None
+        limit = request.args.get("limit", app.config["FILES_PAGE_SIZE"], type=int)
+        try:
+            page = list_dir_page(app.config["FILE_ROOT"], path, cursor=cursor, limit=limit)
+        except (FileNotFoundError, NotADirectoryError) as e:
+            return jsonify({"error": str(e)}), 404
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"path": path, **page})
+
+    # ✅ 目录列表流式（NDJSON，一行一个条目，按读到的顺序边读边发）
+    @app.route("/api/files/stream")
+    def api_files_stream():
+        path = request.args.get("path", "")
+        try:
+            rows = iter_dir(app.config["FILE_ROOT"], path)
+            first = next(rows, None)   # 先读一条，目录打不开能返回正常的错误码
+        except (FileNotFoundError, NotADirectoryError) as e:
+            return jsonify({"error": str(e)}), 404
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        def gen():
+            if first is None:
+                return
+            yield json.dumps(first, ensure_ascii=False) + "\n"
+            for it in rows:
+                yield json.dumps(it, ensure_ascii=False) + "\n"
+
+        return Response(stream_with_context(gen()), mimetype="application/x-ndjson")
+
     # ✅ 下载
     @app.route("/files/download")
     def files_download():
         path = request.args.get("path", "")
         p = _safe_join(app.config["FILE_ROOT"], path)
-        if not p.exists() or p.is_dir():
-            flash("文件不存在或是目录，无法下载。", "warning")
+        if not p.exists():
+            flash("文件不存在，无法下载。", "warning")
+            return redirect(url_for("files", path=os.path.dirname(path).replace("\\", "/")))
+        if p.is_dir():
+            # 目录：边遍历边打包成 zip / tar / tar.gz
+            try:
+                return send_archive(p, request.args.get("format", "zip"),
+                                    level=app.config["ARCHIVE_LEVEL"], workers=app.config["ARCHIVE_WORKERS"])
+            except (ValueError, OSError) as e:
+                flash(f"打包失败：{e}", "danger")
+                return redirect(url_for("files", path=path))
+        return send_download(request, p, download_name=p.name)
+
+    # ✅ 在线查看大文件：/api/files/view?path=&line= | offset= | before= | tail=1 &lines=
+    def _view_target(path):
+        p = _safe_join(app.config["FILE_ROOT"], path)
+        if not p.is_file():
+            raise FileNotFoundError(path)
+        return p
+
+    @app.route("/api/files/view")
+    def api_files_view():
+        args = request.args
+        try:
+            p = _view_target(args.get("path", ""))
+            info = fileview.view(p, line=args.get("line", type=int), offset=args.get("offset", type=int),
+                                 before=args.get("before", type=int), tail=bool(args.get("tail")),
+                                 lines=args.get("lines", 200, type=int))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except FileNotFoundError:
+            return jsonify({"error": "文件不存在"}), 404
+        except PermissionError:
+            return jsonify({"error": "没有读取权限"}), 403
+        return jsonify(info), 202 if info["indexing"] else 200
+
+    # ✅ tail -f：SSE 推送新增的行，offset 缺省从文件末尾开始
+    @app.route("/api/files/tail")
+    def api_files_tail():
+        try:
+            p = _view_target(request.args.get("path", ""))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except FileNotFoundError:
+            return jsonify({"error": "文件不存在"}), 404
+        offset = request.args.get("offset", type=int)
+
+        def gen():
+            try:
+                for event, data in fileview.follow(p, offset):
+                    if event == "ping":
+                        yield ": ping\n\n"
+                    else:
+                        yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+            except OSError as e:
+                yield f"event: error\ndata: {json.dumps({'error': str(e)}, ensure_ascii=False)}\n\n"
+
+        return _sse(gen())
+
+    @app.route("/files/view")
+    def files_view():
+        path = request.args.get("path", "")
+        try:
+            p = _view_target(path)
+        except (ValueError, FileNotFoundError):
+            flash("文件不存在或是目录，无法查看。", "warning")
             return redirect(url_for("files", path=os.path.dirname(path).replace("\\", "/")))
-        return send_file(str(p), as_attachment=True, download_name=p.name)
+        return render_template("view.html", path=path, name=p.name, size=p.stat().st_size,
+                               crumbs=build_breadcrumbs(os.path.dirname(path).replace("\\", "/")))
 
     # ✅ 上传
     @app.route("/files/upload", methods=["POST"])
@@ -67,6 +378,87 @@ def create_app():
             flash(f"上传失败：{e}", "danger")
         return redirect(url_for("files", path=path))
 
+    # ✅ 分块上传：init → PUT 分块（可并行 / 续传）→ finalize
+    @app.errorhandler(UploadError)
+    def upload_error(e):
+        return jsonify({"error": str(e)}), e.status
+
+    @app.route("/api/uploads", methods=["POST"])
+    def api_upload_init():
+        data = request.get_json(silent=True) or {}
+        path = data.get("path", "")
+        norm = (path or "").replace("\\", "/").strip("/")
+        if norm.upper() == "C:":
+            return jsonify({"error": "C 盘根目录受系统保护，不允许在此上传/写入。"}), 403
+        try:
+            return jsonify(uploads.init(app.config["FILE_ROOT"], path, data.get("filename"), data.get("size")))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route("/api/uploads/<uid>", methods=["PUT"])
+    def api_upload_chunk(uid):
+        offset = request.args.get("offset", type=int)
+        if offset is None:
+            return jsonify({"error": "缺少 offset"}), 400
+        st = uploads.write_chunk(uid, offset, request.stream, request.content_length,
+                                 sha256=request.headers.get("X-Chunk-SHA256"))
+        return jsonify(st)
+
+    @app.route("/api/uploads/<uid>", methods=["GET"])
+    def api_upload_status(uid):
+        return jsonify(uploads.status(uid))
+
+    @app.route("/api/uploads/<uid>/finalize", methods=["POST"])
+    def api_upload_finalize(uid):
+        return jsonify({"name": uploads.finalize(uid)})
+
+    @app.route("/api/uploads/<uid>", methods=["DELETE"])
+    def api_upload_abort(uid):
+        uploads.abort(uid)
+        return jsonify({"ok": True})
+
+    # ✅ 批量复制 / 移动 / 删除：后台任务，前端轮询进度
+    from pathlib import Path
+
+    @app.errorhandler(JobError)
+    def job_error(e):
+        return jsonify({"error": str(e)}), e.status
+
+    @app.route("/api/jobs", methods=["POST"])
+    def api_jobs_submit():
+        data = request.get_json(silent=True) or {}
+        kind = data.get("kind")
+        paths = data.get("paths") or []
+        dest = data.get("dest", "")
+        # 和单个删除 / 重命名一样：C 盘根目录下的东西不许动，也不许往 C 盘根目录里放
+        for rel in paths:
+            try:
+                p = _safe_join(app.config["FILE_ROOT"], rel)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            if p.parent == p:
+                return jsonify({"error": "不能操作盘符本身。"}), 403
+            if p.drive.upper() == "C:" and p.parent.resolve() == Path("C:\\").resolve():
+                return jsonify({"error": "C 盘根目录下多为系统文件/目录，出于安全与权限原因，已禁止批量操作。"}), 403
+        if kind != "delete" and (dest or "").replace("\\", "/").strip("/").upper() == "C:":
+            return jsonify({"error": "C 盘根目录受系统保护，不允许在此写入。"}), 403
+        try:
+            return jsonify(jobs.submit(app.config["FILE_ROOT"], kind, paths, dest)), 202
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route("/api/jobs")
+    def api_jobs_list():
+        return jsonify({"jobs": jobs.list(limit=request.args.get("limit", 20, type=int))})
+
+    @app.route("/api/jobs/<jid>")
+    def api_job_status(jid):
+        return jsonify(jobs.get(jid))
+
+    @app.route("/api/jobs/<jid>/cancel", methods=["POST"])
+    def api_job_cancel(jid):
+        return jsonify(jobs.cancel(jid))
+
     # ✅ 新建文件夹
     @app.route("/files/mkdir", methods=["POST"])
     def files_mkdir():
@@ -134,8 +526,100 @@ def create_app():
         info = get_network_overview()
         return render_template("network.html", info=info)
 
+    # ✅ 实时数据 JSON（页面原地刷新用）
+    @app.route("/api/system")
+    def api_system():
+        return jsonify(get_system_overview())
+
+    # ✅ Prometheus 抓取：正文按快照版本缓存，抓取本身只是发 bytes
+    exporter = Exporter(sampler)
+
+    @app.route("/metrics")
+    def metrics():
+        om = "application/openmetrics-text" in request.headers.get("Accept", "")
+        gz = "gzip" in request.headers.get("Accept-Encoding", "")
+        resp = Response(exporter.body(openmetrics=om, gzipped=gz),
+                        content_type=CONTENT_TYPE_OPENMETRICS if om else CONTENT_TYPE_TEXT)
+        if gz:
+            resp.headers["Content-Encoding"] = "gzip"
+        resp.headers["Vary"] = "Accept, Accept-Encoding"
+        return resp
+
+    # ✅ 采集 provider 一览：间隔、实测耗时、最近一次运行
+    @app.route("/api/providers")
+    def api_providers():
+        return jsonify(get_providers())
+
+    @app.route("/providers")
+    def providers():
+        return render_template("providers.html", info=get_providers())
+
+    # ✅ 进程 Top-N：/api/processes?sort=cpu&n=50
+    @app.route("/api/processes")
+    def api_processes():
+        sort = request.args.get("sort", "cpu")
+        n = request.args.get("n", 50, type=int)
+        try:
+            return jsonify(get_processes(sort, n))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    @app.route("/processes")
+    def processes():
+        return render_template("processes.html", sort=request.args.get("sort", "cpu"))
+
+    @app.route("/api/network")
+    def api_network():
+        return jsonify(get_network_overview())
+
+    # ✅ SSE：第一条推全量，之后只推变化的字段；所有连接共用一个采样器
+    @app.route("/api/stream")
+    def api_stream():
+        def gen():
+            last = get_live_state()
+            version = sampler.version
+            yield f"event: snapshot\ndata: {json.dumps(last, ensure_ascii=False)}\n\n"
+            while True:
+                new_version = sampler.wait(version, timeout=15)
+                if new_version == version:
+                    yield ": ping\n\n"   # 心跳，防止代理断开空闲连接
+                    continue
+                version = new_version
+                cur = get_live_state()
+                delta = diff(last, cur)
+                last = cur
+                if delta:
+                    yield f"event: delta\ndata: {json.dumps(delta, ensure_ascii=False)}\n\n"
+
+        return _sse(gen())
+
+    # ✅ 历史曲线 JSON：/api/metrics/history?metric=cpu&range=1h
+    @app.route("/api/metrics/history")
+    def api_metrics_history():
+        metric = request.args.get("metric", "cpu")
+        rng = request.args.get("range", "1h")
+        max_points = request.args.get("points", type=int)
+        try:
+            return jsonify(get_metric_history(metric, rng, max_points=max_points))
+        except KeyError as e:
+            return jsonify({"error": e.args[0]}), 404
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    # ✅ 各网卡最近的速率曲线：/api/network/rates?range=5m&points=150
+    @app.route("/api/network/rates")
+    def api_network_rates():
+        rng = request.args.get("range", "5m")
+        max_points = request.args.get("points", type=int)
+        try:
+            return jsonify(get_nic_history(rng, max_points=max_points))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
     return app
 
 if __name__ == "__main__":
+    # 开发用；正式跑用 python serve.py（多线程 / 多进程，不开调试器）
     app = create_app()
-    app.run(host="0.0.0.0", port=8000, debug=True)
+    app.run(host=getattr(config, "SERVE_HOST", "0.0.0.0"), port=getattr(config, "SERVE_PORT", 8000),
+            debug=getattr(config, "DEBUG", False), threaded=True)
@@ -0,0 +1,464 @@
+# archives.py
+"""
+目录打包下载：边遍历边输出 ZIP / TAR / TAR.GZ，不落临时文件，内存占用和目录大小无关。
+
+- 目录树是惰性遍历的，第一个文件打开就开始出字节，100 GB 的目录也不用先全部列一遍；
+- ZIP 自己写：本地头 + 数据 + 数据描述符（大小事先不知道时），最后是中央目录；
+  单个文件 / 偏移 / 条目数超过 32 位上限时自动用 ZIP64；
+- 已经压缩过的格式（jpg / mp4 / zip ...）直接 STORE，不再浪费 CPU；
+- workers > 1 时并行压缩：ZIP 按文件（小文件丢给线程池，zlib 压缩时放开 GIL），
+  TAR.GZ 把 tar 流切成块，每块压成一个独立的 gzip member 再按顺序拼起来（和 pigz 一样，
+  gzip / tar 都认多 member 的文件）。
+- 不跟随符号链接：链接按链接本身打包，指向根目录外面的东西也不会被带出去。
+
+文件在打包过程中变大的，只取开始时 stat 到的大小；读失败 / 打不开的跳过，
+最后在包里附一个说明文件列出来。
+"""
+import collections
+import os
+import stat
+import struct
+import tarfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+READ_BLOCK = 1024 * 1024
+FLUSH_AT = 256 * 1024          # 输出攒到这么多再 yield，别一次吐几十字节
+PARALLEL_FILE_MAX = 8 * 1024 * 1024    # ZIP 并行压缩只管这么大以内的文件（整个读进内存）
+GZ_BLOCK = 4 * 1024 * 1024     # TAR.GZ 并行压缩的块大小
+SKIPPED_NAME = "_下载时跳过的文件.txt"
+
+# 本身就是压缩格式，再 deflate 一遍基本不会变小
+STORED_EXTS = frozenset("""
+.zip .gz .tgz .bz2 .xz .txz .zst .7z .rar .lz .lz4 .br .cab .jar .war .apk .ipa .whl .deb .rpm .dmg
+.jpg .jpeg .png .gif .webp .heic .heif .avif .jxl
+.mp3 .aac .m4a .ogg .opus .flac .wma
+.mp4 .m4v .mkv .mov .avi .webm .wmv .flv .ts
+.docx .xlsx .pptx .odt .ods .odp .epub .pdf
+""".split())
+
+FORMATS = {
+    "zip": ("application/zip", ".zip"),
+    "tar": ("application/x-tar", ".tar"),
+    "tar.gz": ("application/gzip", ".tar.gz"),
+}
+
+
+# ========= 遍历 =========
+def walk(top, skipped):
+    """
+    惰性地产出 (相对路径, 绝对路径, lstat)；目录在其内容之前，按名字排序。
+    列不开的目录记进 skipped。
+    """
+    stack = [("", top)]
+    while stack:
+        rel, path = stack.pop()
+        try:
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            skipped.append(f"{rel or '.'}: {e.strerror or e}")
+            continue
+        subdirs = []
+        for e in entries:
+            r = f"{rel}/{e.name}" if rel else e.name
+            try:
+                st = e.stat(follow_symlinks=False)
+            except OSError as err:
+                skipped.append(f"{r}: {err.strerror or err}")
+                continue
+            yield r, e.path, st
+            if stat.S_ISDIR(st.st_mode):
+                subdirs.append((r, e.path))
+        stack.extend(reversed(subdirs))
+
+
+def _read_capped(path, size):
+    """按块读文件，最多读 size 字节（打包途中变大的部分不要）。"""
+    with open(path, "rb") as f:
+        left = size
+        while left > 0:
+            buf = f.read(min(READ_BLOCK, left))
+            if not buf:
+                return
+            left -= len(buf)
+            yield buf
+
+
+def _skipped_note(skipped):
+    return ("以下文件 / 目录在打包时读取失败，没有包含在内：\n\n" + "\n".join(skipped) + "\n").encode("utf-8")
+
+
+# ========= ZIP =========
+_LOCAL = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL = struct.Struct("<IHHHHHHIIIHHHHHII")
+_DESC32 = struct.Struct("<IIII")
+_DESC64 = struct.Struct("<IIQQ")
+_EOCD = struct.Struct("<IHHHHIIH")
+_EOCD64 = struct.Struct("<IQHHIIQQQQ")
+_EOCD64_LOC = struct.Struct("<IIQI")
+_U32 = 0xFFFFFFFF
+_FLAG_DESC = 0x08
+_FLAG_UTF8 = 0x800
+
+
+def _dos_time(mtime):
+    t = time.localtime(max(mtime, 315532800))   # ZIP 时间从 1980 年开始
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+
+class _Entry:
+    __slots__ = ("name", "method", "flags", "dtime", "ddate", "crc", "csize", "size", "offset", "mode", "zip64")
+
+
+class ZipStream:
+    def __init__(self, level=6):
+        self.level = level
+        self.offset = 0
+        self.entries = []
+
+    def _method_for(self, name, size):
+        if self.level == 0 or size == 0 or os.path.splitext(name)[1].lower() in STORED_EXTS:
+            return 0
+        return 8
+
+    def _entry(self, name, st, method):
+        e = _Entry()
+        e.name = name.encode("utf-8")
+        e.method = method
+        e.flags = _FLAG_UTF8
+        e.dtime, e.ddate = _dos_time(st.st_mtime)
+        e.mode = st.st_mode
+        e.crc = e.csize = e.size = 0
+        e.offset = self.offset
+        # deflate 最坏会略微变大，留点余量；大文件一开始就按 ZIP64 写
+        e.zip64 = st.st_size + (st.st_size >> 10) + 1024 >= _U32 if stat.S_ISREG(st.st_mode) else False
+        return e
+
+    def _local_header(self, e, known):
+        extra = b""
+        if e.zip64:
+            extra = struct.pack("<HHQQ", 1, 16, e.size if known else 0, e.csize if known else 0)
+            csize = size = _U32
+        else:
+            csize, size = (e.csize, e.size) if known else (0, 0)
+        crc = e.crc if known else 0
+        version = 45 if e.zip64 else 20
+        head = _LOCAL.pack(0x04034b50, version, e.flags, e.method, e.dtime, e.ddate,
+                           crc, csize, size, len(e.name), len(extra))
+        return head + e.name + extra
+
+    def _emit(self, data):
+        self.offset += len(data)
+        return data
+
+    # ---- 各类条目 ----
+    def known(self, name, st, data, crc, raw_size, method):
+        """内容已经在内存里（小文件 / 并行压缩好的 / 链接 / 目录）。"""
+        e = self._entry(name, st, method)
+        e.crc, e.csize, e.size = crc, len(data), raw_size
+        e.zip64 = e.zip64 or e.size >= _U32 or e.csize >= _U32
+        self.entries.append(e)
+        return self._emit(self._local_header(e, True)) + self._emit(data)
+
+    def streamed(self, name, st, chunks):
+        """大文件：先写头，边读边压边输出，最后补数据描述符。"""
+        method = self._method_for(name, st.st_size)
+        e = self._entry(name, st, method)
+        e.flags |= _FLAG_DESC
+        self.entries.append(e)
+        yield self._emit(self._local_header(e, False))
+        comp = zlib.compressobj(self.level, zlib.DEFLATED, -15) if method == 8 else None
+        crc = 0
+        size = csize = 0
+        pending = []
+        pending_len = 0
+        for buf in chunks:
+            crc = zlib.crc32(buf, crc)
+            size += len(buf)
+            out = comp.compress(buf) if comp else buf
+            if out:
+                pending.append(out)
+                pending_len += len(out)
+            if pending_len >= FLUSH_AT:
+                data = b"".join(pending)
+                csize += len(data)
+                yield self._emit(data)
+                pending, pending_len = [], 0
+        if comp:
+            pending.append(comp.flush())
+        data = b"".join(pending)
+        csize += len(data)
+        if data:
+            yield self._emit(data)
+        e.crc, e.size, e.csize = crc, size, csize
+        if e.zip64:
+            yield self._emit(_DESC64.pack(0x08074b50, crc, csize, size))
+        else:
+            yield self._emit(_DESC32.pack(0x08074b50, crc, csize, size))
+
+    def finish(self):
+        cd_start = self.offset
+        parts = []
+        for e in self.entries:
+            extra_vals = []
+            size, csize, offset = e.size, e.csize, e.offset
+            if e.zip64 or size >= _U32:
+                extra_vals.append(size)
+                size = _U32
+            if e.zip64 or csize >= _U32:
+                extra_vals.append(csize)
+                csize = _U32
+            if offset >= _U32:
+                extra_vals.append(offset)
+                offset = _U32
+            extra = struct.pack(f"<HH{len(extra_vals)}Q", 1, 8 * len(extra_vals), *extra_vals) if extra_vals else b""
+            version = 45 if extra_vals else 20
+            external = (e.mode & 0xFFFF) << 16
+            if stat.S_ISDIR(e.mode):
+                external |= 0x10   # MS-DOS 目录属性
+            parts.append(_CENTRAL.pack(0x02014b50, (3 << 8) | version, version, e.flags, e.method,
+                                       e.dtime, e.ddate, e.crc, csize, size, len(e.name), len(extra),
+                                       0, 0, 0, external, offset) + e.name + extra)
+        cd = b"".join(parts)
+        self.offset += len(cd)
+        n = len(self.entries)
+        tail = b""
+        if n >= 0xFFFF or cd_start >= _U32 or len(cd) >= _U32:
+            eocd64_at = self.offset
+            tail += _EOCD64.pack(0x06064b50, 44, (3 << 8) | 45, 45, 0, 0, n, n, len(cd), cd_start)
+            tail += _EOCD64_LOC.pack(0x07064b50, 0, eocd64_at, 1)
+        tail += _EOCD.pack(0x06054b50, 0, 0, min(n, 0xFFFF), min(n, 0xFFFF),
+                           min(len(cd), _U32), min(cd_start, _U32), 0)
+        self.offset += len(tail)
+        return cd + tail
+
+
+def _compress_small(path, size, method, level):
+    """线程池里跑：读整个小文件，算 CRC，按需 deflate。"""
+    data = b"".join(_read_capped(path, size))
+    crc = zlib.crc32(data)
+    if method == 8:
+        c = zlib.compressobj(level, zlib.DEFLATED, -15)
+        out = c.compress(data) + c.flush()
+        # 压完反而更大（随机数据之类）就存原样
+        if len(out) < len(data):
+            return out, crc, len(data), 8
+    return data, crc, len(data), 0
+
+
+def zip_stream(top, prefix, level=6, workers=1):
+    """top 目录打成 ZIP，条目名以 prefix/ 开头；返回 bytes 的生成器。"""
+    z = ZipStream(level)
+    skipped = []
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="zip") if workers > 1 else None
+    queue = collections.deque()   # 按顺序等待输出的 (name, st, future)
+    try:
+        def drain(limit):
+            while len(queue) > limit:
+                name, st, fut = queue.popleft()
+                try:
+                    data, crc, size, method = fut.result()
+                except OSError as err:
+                    skipped.append(f"{name}: {err.strerror or err}")
+                    continue
+                yield z.known(name, st, data, crc, size, method)
+
+        yield z.known(prefix + "/", os.stat(top), b"", 0, 0, 0)
+        for rel, path, st in walk(top, skipped):
+            name = f"{prefix}/{rel}"
+            if stat.S_ISDIR(st.st_mode):
+                yield from drain(0)
+                yield z.known(name + "/", st, b"", 0, 0, 0)
+            elif stat.S_ISLNK(st.st_mode):
+                yield from drain(0)
+                try:
+                    target = os.readlink(path).encode("utf-8")
+                except OSError as err:
+                    skipped.append(f"{rel}: {err.strerror or err}")
+                    continue
+                yield z.known(name, st, target, zlib.crc32(target), len(target), 0)
+            elif stat.S_ISREG(st.st_mode):
+                method = z._method_for(name, st.st_size)
+                if pool is not None and st.st_size <= PARALLEL_FILE_MAX:
+                    queue.append((name, st, pool.submit(_compress_small, path, st.st_size, method, level)))
+                    yield from drain(workers * 2)
+                    continue
+                yield from drain(0)
+                try:
+                    f = open(path, "rb")
+                except OSError as err:
+                    skipped.append(f"{rel}: {err.strerror or err}")
+                    continue
+                with f:
+                    def chunks(left=st.st_size):
+                        while left > 0:
+                            try:
+                                buf = f.read(min(READ_BLOCK, left))
+                            except OSError as err:
+                                skipped.append(f"{rel}: 只打包了前一部分（{err.strerror or err}）")
+                                return
+                            if not buf:
+                                return
+                            left -= len(buf)
+                            yield buf
+                    yield from z.streamed(name, st, chunks())
+            # 设备文件 / FIFO 之类不打包
+        yield from drain(0)
+        if skipped:
+            note = _skipped_note(skipped)
+            yield z.known(f"{prefix}/{SKIPPED_NAME}", os.stat(top), note, zlib.crc32(note), len(note), 0)
+        yield z.finish()
+    finally:
+        if pool is not None:
+            for _name, _st, fut in queue:
+                fut.cancel()
+            pool.shutdown(wait=False)
+
+
+# ========= TAR =========
+def _tarinfo(name, st, linkname=""):
+    ti = tarfile.TarInfo(name)
+    ti.mode = stat.S_IMODE(st.st_mode)
+    ti.mtime = int(st.st_mtime)
+    ti.uid = getattr(st, "st_uid", 0)
+    ti.gid = getattr(st, "st_gid", 0)
+    if stat.S_ISDIR(st.st_mode):
+        ti.type = tarfile.DIRTYPE
+    elif stat.S_ISLNK(st.st_mode):
+        ti.type = tarfile.SYMTYPE
+        ti.linkname = linkname
+    else:
+        ti.type = tarfile.REGTYPE
+        ti.size = st.st_size
+    return ti
+
+
+def tar_stream(top, prefix):
+    """未压缩的 tar 字节流（PAX 格式，长文件名 / 大文件 / 中文名都没问题）。"""
+    skipped = []
+
+    def header(ti):
+        return ti.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+
+    total = 0
+    buf = header(_tarinfo(prefix, os.stat(top)))
+    total += len(buf)
+    yield buf
+    for rel, path, st in walk(top, skipped):
+        name = f"{prefix}/{rel}"
+        if stat.S_ISDIR(st.st_mode):
+            buf = header(_tarinfo(name, st))
+        elif stat.S_ISLNK(st.st_mode):
+            try:
+                buf = header(_tarinfo(name, st, os.readlink(path)))
+            except OSError as err:
+                skipped.append(f"{rel}: {err.strerror or err}")
+                continue
+        elif stat.S_ISREG(st.st_mode):
+            try:
+                f = open(path, "rb")
+            except OSError as err:
+                skipped.append(f"{rel}: {err.strerror or err}")
+                continue
+            # tar 头里先写了大小，读不够的部分只能补零
+            with f:
+                head = header(_tarinfo(name, st))
+                total += len(head)
+                yield head
+                left = st.st_size
+                while left > 0:
+                    try:
+                        data = f.read(min(READ_BLOCK, left))
+                    except OSError as err:
+                        skipped.append(f"{rel}: 后半部分读取失败，已用 0 填充（{err.strerror or err}）")
+                        data = b""
+                    if not data:
+                        data = bytes(min(READ_BLOCK, left))
+                    left -= len(data)
+                    total += len(data)
+                    yield data
+                pad = -st.st_size % tarfile.BLOCKSIZE
+                if pad:
+                    total += pad
+                    yield bytes(pad)
+            continue
+        else:
+            continue
+        total += len(buf)
+        yield buf
+    if skipped:
+        note = _skipped_note(skipped)
+        ti = tarfile.TarInfo(f"{prefix}/{SKIPPED_NAME}")
+        ti.size = len(note)
+        ti.mtime = int(time.time())
+        buf = header(ti) + note + bytes(-len(note) % tarfile.BLOCKSIZE)
+        total += len(buf)
+        yield buf
+    end = bytes(tarfile.BLOCKSIZE * 2)
+    total += len(end)
+    yield end + bytes(-total % tarfile.RECORDSIZE)
+
+
+def _rechunk(stream, size):
+    """把任意大小的 bytes 流切成 size 大小的块（最后一块可以小一点）。"""
+    pending = []
+    n = 0
+    for data in stream:
+        pending.append(data)
+        n += len(data)
+        if n >= size:
+            blob = b"".join(pending)
+            for i in range(0, len(blob) - size + 1, size):
+                yield blob[i:i + size]
+            rest = blob[len(blob) - len(blob) % size:] if len(blob) % size else b""
+            pending, n = ([rest], len(rest)) if rest else ([], 0)
+    if n:
+        yield b"".join(pending)
+
+
+def _gzip_member(data, level):
+    c = zlib.compressobj(level, zlib.DEFLATED, 31)   # wbits 31 = 带 gzip 头尾
+    return c.compress(data) + c.flush()
+
+
+def tar_gz_stream(top, prefix, level=6, workers=1):
+    tar = tar_stream(top, prefix)
+    if workers <= 1:
+        c = zlib.compressobj(level, zlib.DEFLATED, 31)
+        pending, n = [], 0
+        for data in tar:
+            out = c.compress(data)
+            if out:
+                pending.append(out)
+                n += len(out)
+            if n >= FLUSH_AT:
+                yield b"".join(pending)
+                pending, n = [], 0
+        pending.append(c.flush())
+        yield b"".join(pending)
+        return
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="targz") as pool:
+        queue = collections.deque()
+        try:
+            for block in _rechunk(tar, GZ_BLOCK):
+                queue.append(pool.submit(_gzip_member, block, level))
+                while len(queue) > workers * 2:
+                    yield queue.popleft().result()
+            while queue:
+                yield queue.popleft().result()
+        finally:
+            for fut in queue:
+                fut.cancel()
+
+
+def stream(fmt, top, prefix, level=6, workers=1):
+    if fmt == "zip":
+        return zip_stream(top, prefix, level, workers)
+    if fmt == "tar":
+        return tar_stream(top, prefix)
+    if fmt == "tar.gz":
+        return tar_gz_stream(top, prefix, level, workers)
+    raise ValueError(f"不支持的格式：{fmt}")
@@ -1,26 +1,45 @@
 # backend.py
+import atexit
 import time
 import platform
 import psutil
 import json
 import socket
-import subprocess as _sp
 import platform as _plat
 import sys
 import os
 import string
-
-# ========= 可选：requests 用来查公网 IP =========
-try:
-    import requests
-except Exception:
-    requests = None
-
-# ========= 你原来的：N 卡走 GPUtil =========
-try:
-    import GPUtil
-except Exception:
-    GPUtil = None
+import heapq
+import itertools
+import shutil
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+from sampler import Sampler
+from timeseries import MetricStore, parse_range, downsample
+from metricarchive import MetricArchive
+from dircache import DirCache
+from proctable import ProcessTable
+from sharedsnap import SnapshotReader, SnapshotWriter
+from psworker import ShellPool, ShellError, powershell_argv
+from gpuprobe import (
+    StreamProbe, StaticInventory, nvidia_smi_cmd, parse_nvidia_smi, gpu_load_cmd, parse_gpu_load,
+)
+
+# ========= 可选依赖：用到时才导入 =========
+# requests 用来查公网 IP，GPUtil 是没有 nvidia-smi 常驻时的 N 卡兜底；
+# 启动时不碰它们，对应的 provider 第一次跑的时候才导入（导入失败记一次，不再重试）
+_optional_modules = {}
+
+
+def _optional(name):
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = __import__(name)
+        except Exception:
+            _optional_modules[name] = None
+    return _optional_modules[name]
 
 
 def _fmt_bytes(n):
@@ -97,15 +116,27 @@ def _win_os_cpu_pretty():
 
 
 # ========= Windows：GPU（Intel/AMD/NVIDIA） =========
-def _ps_run(ps_script: str, timeout=2.5) -> str:
+# 所有 WMI / CIM 查询走常驻的 PowerShell 进程池，不再每次冷启动一个 powershell
+ps_pool = None
+
+
+def configure_ps_pool(size=None, timeout=None, idle_timeout=None):
+    """由 create_app() 调用；没调用过时第一次查询按默认值建池。"""
+    global ps_pool
+    if ps_pool is not None:
+        ps_pool.close()
+    ps_pool = ShellPool(powershell_argv(), size=size or 2, timeout=timeout or 5.0,
+                        idle_timeout=600.0 if idle_timeout is None else idle_timeout)
+    return ps_pool
+
+
+def _ps_run(ps_script: str, timeout=5.0) -> str:
+    # 第一次调用要算上进程启动（几百毫秒），之后同一个进程直接复用
+    if ps_pool is None:
+        configure_ps_pool()
     try:
-        out = _sp.check_output(
-            ["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-Command", ps_script],
-            stderr=_sp.DEVNULL,
-            timeout=timeout,
-        )
-        return out.decode("utf-8", "ignore").strip()
-    except Exception:
+        return ps_pool.run(ps_script, timeout=timeout).strip()
+    except ShellError:
         return ""
 
 
@@ -149,7 +180,8 @@ def _normalize_wmi_list(data_list):
             vendor = "Intel"
 
         mem = d.get("AdapterRAM")
-        mem_mb = f"{int(mem)//(1024*1024)} MB" if isinstance(mem, int) and mem > 0 else None
+        mem_ok = isinstance(mem, int) and mem > 0
+        mem_mb = f"{int(mem)//(1024*1024)} MB" if mem_ok else None
 
         item = {
             "name": name or "GPU",
@@ -159,6 +191,10 @@ def _normalize_wmi_list(data_list):
             "load": None,
             "temperature": None,
             "notes": [],
+            # 原始数值（/metrics 用），上面几个是给页面看的字符串
+            "memory_total_bytes": int(mem) if mem_ok else None,
+            "memory_used_bytes": None,
+            "load_percent": None,
         }
         drv = d.get("DriverVersion")
         if drv:
@@ -167,73 +203,246 @@ def _normalize_wmi_list(data_list):
     return out
 
 
+# 静态信息（名称 / 显存 / 驱动）进程里只查一次；负载走长驻的 Get-Counter -Continuous，
+# 采集时只读最新值，不再每次起 PowerShell、等 1 秒采样
+_win_gpu_inventory = StaticInventory(_win_gpu_wmi_basic)
+_win_gpu_load = None
+_nvsmi = None
+# 流式样本超过这么多个采样间隔没更新就当它挂了，不展示过期数据
+_GPU_STALE_INTERVALS = 3
+_gpu_interval = 5.0
+
+
+def start_gpu_probes(interval=None):
+    """
+    起长驻的 nvidia-smi -l / Get-Counter 子进程（重复调用无副作用）。
+    Get-Counter -Continuous 一直占着输出，不适合放进一问一答的 ps_pool，单独一个进程。
+    """
+    global _win_gpu_load, _nvsmi, _gpu_interval
+    if interval:
+        _gpu_interval = interval
+    if _nvsmi is None and shutil.which("nvidia-smi"):
+        _nvsmi = StreamProbe(nvidia_smi_cmd(_gpu_interval), parse_nvidia_smi)
+        _nvsmi.start()
+    if _win_gpu_load is None and _plat.system() == "Windows":
+        _win_gpu_load = StreamProbe(gpu_load_cmd(_gpu_interval), parse_gpu_load)
+        _win_gpu_load.start()
+        _win_gpu_inventory.get()
+
+
 def _win_gpu_load_perf():
-    ps = r'''
-$cs = Get-Counter '\\GPU Engine(*)\\Utilization Percentage' -SampleInterval 1 -MaxSamples 1
-$avg = ($cs.CounterSamples | Measure-Object CookedValue -Average).Average
-if ($avg -ne $null) { [math]::Round($avg,1) } else { "" }
-'''
-    txt = _ps_run(ps, timeout=3.0)
-    if not txt:
-        return None
-    try:
-        return f"{float(txt):.1f}%"
-    except Exception:
+    if _win_gpu_load is None:
         return None
+    return _win_gpu_load.latest(max_age=_gpu_interval * _GPU_STALE_INTERVALS).get("load")
 
 
 def _collect_gpus_windows():
-    basics = _win_gpu_wmi_basic()
+    basics = _win_gpu_inventory.get()
     load = _win_gpu_load_perf()
     out = []
     for b in basics:
         item = dict(b)
-        if load and not item.get("load"):
-            item["load"] = load
+        item["notes"] = list(b["notes"])
+        if load is not None and not item.get("load"):
+            item["load"] = f"{load:.1f}%"
+            item["load_percent"] = load
         out.append(item)
     return out
 
 
+def _collect_gpus_nvsmi():
+    rows = _nvsmi.latest(max_age=_gpu_interval * _GPU_STALE_INTERVALS)
+    out = []
+    mb = 1024 * 1024
+    for _idx, g in sorted(rows.items()):
+        out.append({
+            "name": g["name"],
+            "vendor": "NVIDIA",
+            "memory_total": f"{g['memory_total_mb']:.0f} MB" if g["memory_total_mb"] is not None else None,
+            "memory_used": f"{g['memory_used_mb']:.0f} MB" if g["memory_used_mb"] is not None else None,
+            "load": f"{g['load']:.1f}%" if g["load"] is not None else None,
+            "temperature": g["temperature"],
+            "notes": [f"Driver {g['driver']}"] if g["driver"] else [],
+            "memory_total_bytes": int(g["memory_total_mb"] * mb) if g["memory_total_mb"] is not None else None,
+            "memory_used_bytes": int(g["memory_used_mb"] * mb) if g["memory_used_mb"] is not None else None,
+            "load_percent": g["load"],
+        })
+    return out
+
+
 # ========= 系统总览 =========
-def get_system_overview():
-    boot = psutil.boot_time()
-    vm = psutil.virtual_memory()
-    uptime = int(time.time() - boot)
+# 各部分拆成独立的采集函数，由后台采样器按各自的间隔调用；
+# get_system_overview() 只读快照，不再在请求里阻塞。
+_cpu_primed = False
+
 
-    # CPU
-    cpu = {
+def _collect_cpu():
+    global _cpu_primed
+    if _cpu_primed:
+        usage = psutil.cpu_percent(interval=None)
+    else:
+        # cpu_percent(None) 第一次调用没有基准，返回 0.0；第一次短采一下打底
+        psutil.cpu_percent(interval=None, percpu=True)
+        usage = psutil.cpu_percent(interval=0.1)
+        _cpu_primed = True
+    freq = psutil.cpu_freq()
+    return {
         "logical": psutil.cpu_count(True),
         "physical": psutil.cpu_count(False) or psutil.cpu_count(True),
-        "usage_percent": psutil.cpu_percent(interval=0.5),
-        "freq_current": (psutil.cpu_freq().current if psutil.cpu_freq() else None),
+        "usage_percent": usage,
+        "per_core": psutil.cpu_percent(interval=None, percpu=True),
+        "freq_current": (freq.current if freq else None),
     }
 
-    # 内存
-    mem = {
+
+def _collect_memory():
+    vm = psutil.virtual_memory()
+    return {
         "total": _fmt_bytes(vm.total),
         "available": _fmt_bytes(vm.available),
         "used": _fmt_bytes(vm.used),
         "percent": vm.percent,
+        "total_bytes": vm.total,
+        "available_bytes": vm.available,
+        "used_bytes": vm.used,
     }
 
-    # 磁盘
-    disks = []
-    for p in psutil.disk_partitions(all=False):
+
+# disk_usage 在挂死的网络盘（NFS / SMB）上会一直卡住：放到线程池里带超时调用，
+# 上一次还没返回的挂载点这一轮不再提交，直接报上次的结果并标记 stale，
+# 卡住的线程最多占住 _usage_pool 的几个 worker，不会越积越多。
+DISK_USAGE_TIMEOUT = 2.0
+_usage_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="disk-usage")
+_usage_pending = {}   # mount -> Future
+_usage_last = {}      # mount -> 上次成功的 sdiskusage
+
+
+def _disk_usage(mounts, timeout):
+    """
+    {mount: (usage 或 None, stale)}；所有挂载点共用一个截止时间。
+    上一轮的查询还没回来的挂载点（卡死的网络盘）不再等，直接给上次的值。
+    """
+    hung = set()
+    for m in mounts:
+        f = _usage_pending.get(m)
+        if f is None or f.done():
+            _usage_pending[m] = _usage_pool.submit(psutil.disk_usage, m)
+        else:
+            hung.add(m)
+    deadline = time.time() + timeout
+    out = {}
+    for m in mounts:
+        f = _usage_pending[m]
+        if m in hung:
+            out[m] = (_usage_last.get(m), True)
+            continue
         try:
-            u = psutil.disk_usage(p.mountpoint)
-            disks.append({
-                "device": p.device,
-                "mount": p.mountpoint,
-                "fstype": p.fstype,
-                "total": _fmt_bytes(u.total),
-                "used": _fmt_bytes(u.used),
-                "free": _fmt_bytes(u.free),
-                "percent": u.percent,
-            })
+            u = f.result(timeout=max(0.0, deadline - time.time()))
+            _usage_last[m] = u
+            out[m] = (u, False)
+        except FuturesTimeout:
+            out[m] = (_usage_last.get(m), True)
         except Exception:
+            out[m] = (None, False)
+    return out
+
+
+def _io_device(device):
+    """分区设备 → disk_io_counters(perdisk=True) 里的名字：/dev/sda1 → sda1，/dev/mapper/x → dm-0。"""
+    if not device.startswith("/dev/"):
+        return None
+    try:
+        return os.path.basename(os.path.realpath(device))
+    except OSError:
+        return os.path.basename(device)
+
+
+def _collect_disks():
+    disks = []
+    parts = psutil.disk_partitions(all=False)
+    usage = _disk_usage([p.mountpoint for p in parts], DISK_USAGE_TIMEOUT)
+    for p in parts:
+        u, stale = usage.get(p.mountpoint, (None, False))
+        if u is None:
+            if stale:
+                disks.append({"device": p.device, "mount": p.mountpoint, "fstype": p.fstype,
+                              "total": "-", "used": "-", "free": "-", "percent": None,
+                              "stale": True, "io_device": _io_device(p.device)})
+            continue
+        disks.append({
+            "device": p.device,
+            "mount": p.mountpoint,
+            "fstype": p.fstype,
+            "total": _fmt_bytes(u.total),
+            "used": _fmt_bytes(u.used),
+            "free": _fmt_bytes(u.free),
+            "percent": u.percent,
+            "total_bytes": u.total,
+            "used_bytes": u.used,
+            "free_bytes": u.free,
+            "stale": stale,
+            "io_device": _io_device(p.device),
+        })
+    return disks
+
+
+# ========= 磁盘 I/O =========
+# disk_io_counters(perdisk=True) 相邻两次的差分：吞吐、IOPS、平均服务时间、忙碌占比
+_diskio_prev = None   # (ts, {dev: sdiskio})
+# 虚拟块设备不看
+_DISKIO_SKIP = ("loop", "ram", "zram", "fd", "sr")
+
+
+def _collect_diskio():
+    global _diskio_prev
+    now = time.time()
+    try:
+        cur = psutil.disk_io_counters(perdisk=True) or {}
+    except Exception:
+        cur = {}
+    cur = {d: c for d, c in cur.items() if not d.startswith(_DISKIO_SKIP)}
+    prev, _diskio_prev = _diskio_prev, (now, cur)
+    if prev is None or now <= prev[0]:
+        return {}
+
+    mounts = {}
+    for d in sampler.get("disks") or []:
+        if d.get("io_device"):
+            mounts.setdefault(d["io_device"], []).append(d["mount"])
+
+    dt = now - prev[0]
+    out = {}
+    for dev, c in cur.items():
+        p = prev[1].get(dev)
+        if p is None:
             continue
+        d = {k: _counter_delta(getattr(p, k), getattr(c, k))
+             for k in ("read_bytes", "write_bytes", "read_count", "write_count", "read_time", "write_time")}
+        if any(v is None for v in d.values()):
+            continue   # 计数器被重置，这一轮跳过
+        ops = d["read_count"] + d["write_count"]
+        busy = None
+        if hasattr(c, "busy_time"):   # 只有 Linux / FreeBSD 有
+            b = _counter_delta(p.busy_time, c.busy_time)
+            # 忙碌时间比经过的时间还长（多出一成以上）只能是计数器被重置过，不当成 100%
+            if b is not None and b <= dt * 1000 * 1.1:
+                busy = round(min(100.0, b / (dt * 1000) * 100), 1)
+        out[dev] = {
+            "read_bps": round(d["read_bytes"] / dt, 1),
+            "write_bps": round(d["write_bytes"] / dt, 1),
+            "read_iops": round(d["read_count"] / dt, 1),
+            "write_iops": round(d["write_count"] / dt, 1),
+            # 平均每次 I/O 花了多久（含排队），和 iostat 的 await 一样
+            "await_ms": round((d["read_time"] + d["write_time"]) / ops, 2) if ops else 0.0,
+            "util_percent": busy,
+            "mounts": mounts.get(dev, []),
+        }
+    return out
+
 
-    # 平台
+def _collect_platform():
+    boot = psutil.boot_time()
+    uptime = int(time.time() - boot)
     plat = {
         "platform": platform.platform(),
         "machine": platform.machine(),
@@ -246,12 +455,18 @@ def get_system_overview():
     win_extra = _win_os_cpu_pretty() if _plat.system() == "Windows" else {}
     if win_extra:
         plat.update(win_extra)
+    return plat
 
-    # GPU
+
+def _collect_gpus():
+    start_gpu_probes()
     gpus = []
-    if GPUtil:
+    if _nvsmi is not None:
+        gpus = _collect_gpus_nvsmi()
+    elif _optional("GPUtil"):
+        # 没有 nvidia-smi 可常驻时才退回 GPUtil（它每次调用都起一个 nvidia-smi）
         try:
-            for g in GPUtil.getGPUs():
+            for g in _optional("GPUtil").getGPUs():
                 gpus.append({
                     "name": g.name,
                     "vendor": "NVIDIA",
@@ -260,6 +475,9 @@ def get_system_overview():
                     "load": f"{g.load * 100:.1f}%",
                     "temperature": getattr(g, "temperature", None),
                     "notes": [],
+                    "memory_total_bytes": int(g.memoryTotal * 1024 * 1024),
+                    "memory_used_bytes": int(g.memoryUsed * 1024 * 1024),
+                    "load_percent": g.load * 100,
                 })
         except Exception:
             pass
@@ -273,42 +491,322 @@ def get_system_overview():
                     gpus.append(w)
         except Exception:
             pass
+    return gpus
+
+
+# ========= provider 注册表 =========
+# 可能卡住的（挂载点、子进程、枚举连接）标 slow，在线程池里跑，不拖累 cpu / memory
+sampler = Sampler(interval=1.0)
+sampler.add("cpu", _collect_cpu)
+sampler.add("memory", _collect_memory)
+sampler.add("disks", _collect_disks, every=5.0, slow=True)
+sampler.add("platform", _collect_platform, every=30.0)
+sampler.add("gpus", _collect_gpus, every=5.0, slow=True)
+sampler.add("diskio", _collect_diskio)
+
+_SYSTEM_KEYS = ("platform", "cpu", "memory", "disks", "diskio", "gpus")
+# 页面 / 接口第一次读快照时，慢 provider 最多等这么久，没出结果就先空着，后台补上
+ENSURE_TIMEOUT = 0.1
+
+
+# ========= 历史曲线 =========
+# 每个采样周期把关键指标写进多分辨率环形缓冲，内存大小固定
+history = MetricStore()
+_history_since = time.time()
+# 磁盘归档（start_metric_archive 之后才有）：重启前的数据和超过 30 天的范围从这里读
+metric_archive = None
+
+
+_DISK_FIELDS = ("read_bps", "write_bps", "read_iops", "write_iops", "await_ms", "util_percent")
+_disk_seen = set()   # history 里有列的磁盘设备
+
+
+def _history_values(snap):
+    """从快照里挑出要记历史的指标：{名字: 数值}。"""
+    values = {}
+
+    cpu = snap.get("cpu")
+    if cpu:
+        values["cpu"] = cpu.get("usage_percent")
+    mem = snap.get("memory")
+    if mem:
+        values["memory"] = mem.get("percent")
+    disks = snap.get("disks")
+    if disks:
+        # 记最满的那个分区，最能说明“快满了”
+        values["disk"] = max((d["percent"] for d in disks if d.get("percent") is not None), default=None)
+    diskio = snap.get("diskio")
+    if diskio:
+        values["disk_read_bps"] = sum(d["read_bps"] for d in diskio.values())
+        values["disk_write_bps"] = sum(d["write_bps"] for d in diskio.values())
+        # 每块设备：disk.<设备>.<字段>，比如 disk.sda.await_ms
+        for dev, d in diskio.items():
+            for k in _DISK_FIELDS:
+                values[f"disk.{dev}.{k}"] = d[k]
+
+    netio = snap.get("netio")
+    if netio:
+        rated = [c for c in netio.values() if c.get("rx_bps") is not None and c.get("tx_bps") is not None]
+        if rated:
+            values["net_sent"] = sum(c["tx_bps"] for c in rated)
+            values["net_recv"] = sum(c["rx_bps"] for c in rated)
+    return values
+
+
+def _record_history():
+    """只读快照（local provider）：多进程部署时每个 worker 各记一份，/api/metrics/history 不用跨进程。"""
+    global _disk_seen
+    now = time.time()
+    snap = sampler.snapshot()
+    values = _history_values(snap)
+    history.add(now, values)
+    # 和网卡曲线一样：消失的设备把列删掉，U 盘 / loop 设备反复插拔时内存不会一直涨
+    if "diskio" in snap:
+        devs = set(snap["diskio"] or ())
+        gone = _disk_seen - devs
+        if gone:
+            history.drop([f"disk.{d}.{k}" for d in gone for k in _DISK_FIELDS])
+        _disk_seen = devs
+    return {"metrics": len(values), "ts": now}
+
+
+sampler.add("history", _record_history, local=True)
+
+
+def _record_archive():
+    """只在采集进程里跑：样本进归档的内存队列，写盘由归档自己的线程批量做。"""
+    now = time.time()
+    metric_archive.add(now, _history_values(sampler.snapshot()))
+    return {k: metric_archive.stats[k] for k in ("rows", "flushes", "last_flush_ms", "errors", "last_error")}
+
+
+def start_metric_archive(path, raw_hours=48, days=90, max_bytes=None, flush_interval=10.0, write=True):
+    """
+    由 create_app() 调用。write=False（多进程部署的 worker）只读，
+    写盘、过期清理和合并都在采集进程里。
+    """
+    global metric_archive
+    if metric_archive is not None:
+        return metric_archive
+    metric_archive = MetricArchive(path, raw_hours=raw_hours, days=days, max_bytes=max_bytes,
+                                   flush_interval=flush_interval)
+    if write:
+        metric_archive.start()
+        atexit.register(metric_archive.close)
+        sampler.add("archive", _record_archive)
+    return metric_archive
+
+
+def _rebucket(points, step):
+    """归档里读出来的点按 step 秒重新求平均，和内存里那一层的分辨率对齐。"""
+    if step <= 1:
+        return points
+    out = []
+    slot, total, n = None, 0.0, 0
+    for t, v in points:
+        s_ = t // step
+        if s_ != slot and n:
+            out.append((slot * step, total / n))
+            total, n = 0.0, 0
+        slot = s_
+        total += v
+        n += 1
+    if n:
+        out.append((slot * step, total / n))
+    return out
+
 
+def get_metric_history(metric: str, range_text: str = "1h", max_points=None):
+    """
+    返回:
+      {"metric": "cpu", "range": 3600, "step": 10, "points": [[ts, value], ...]}
+    """
+    span = parse_range(range_text)
+    known = set(history.metrics())
+    if metric_archive is not None:
+        known.update(metric_archive.metrics())
+    if metric not in known:
+        raise KeyError(f"未知指标：{metric}（可选：{', '.join(sorted(known))}）")
+    end = time.time()
+    start = end - span
+    # 内存里只有本进程启动之后、且不超过最粗一层保留时长的数据
+    covered = max(_history_since, end - history.retention)
+    if metric_archive is None or start >= covered:
+        res = history.query(metric, start, end, max_points=max_points)
+        return {"metric": metric, "range": span, **res}
+    # 更早的部分从归档里补
+    res = history.query(metric, start, end)
+    cut = res["points"][0][0] if res["points"] else end
+    old = metric_archive.query(metric, start, min(cut, end))
+    step = max(res["step"], old["step"])
+    pts = [(t, v) for t, v in _rebucket(old["points"], step) if t < cut] + [tuple(p) for p in res["points"]]
+    pts, step = downsample(pts, max_points, step)
+    return {"metric": metric, "range": span, "step": step, "points": [[t, round(v, 3)] for t, v in pts]}
+
+
+def start_sampler(interval=None, gpu_interval=None, network_interval=None, listeners_use_procfs=None,
+                  follow=None):
+    """
+    由 create_app() 调用：设置采样间隔并启动后台线程（重复调用无副作用）。
+    follow 是共享快照的路径：多进程部署时的 worker 不自己采集，只读采集进程写出的快照。
+    """
+    global USE_PROCFS_LISTENERS
+    if interval:
+        sampler.set_interval(interval)
+    if follow:
+        if not sampler.running:
+            sampler.follow(SnapshotReader(follow))
+        sampler.start()
+        return sampler
+    sampler.set_every("gpus", gpu_interval)
+    start_gpu_probes(gpu_interval)
+    sampler.set_every("network", network_interval)
+    if listeners_use_procfs is not None:
+        USE_PROCFS_LISTENERS = listeners_use_procfs
+    sampler.start()
+    return sampler
+
+
+def share_sampler(path, size=None):
+    """多进程部署时由采集进程调用：每次快照更新都写进共享内存，worker 用 start_sampler(follow=path) 读。"""
+    writer = SnapshotWriter(path, size or 4 * 1024 * 1024)
+    sampler.publish_to(lambda s: writer.write(s.export()))
+    writer.write(sampler.export())
+    return writer
+
+
+def prefetch_public_ip(urls=None, ttl=None, negative_ttl=None):
+    """由 create_app() 调用：应用配置并在后台先查一次公网 IP。"""
+    public_ip_cache.configure(urls=urls, ttl=ttl, negative_ttl=negative_ttl)
+    public_ip_cache.refresh_async()
+    return public_ip_cache
+
+
+def get_providers():
+    """/api/providers：每个 provider 的配置和耗时，外加常驻 PowerShell 池的状态。"""
     return {
-        "platform": plat,
-        "cpu": cpu,
-        "memory": mem,
-        "disks": disks,
-        "gpus": gpus,
+        "providers": sampler.providers(),
+        "ps_pool": ps_pool.stats() if ps_pool is not None else None,
+        "version": sampler.version,
     }
 
 
+def get_system_overview():
+    snap = sampler.ensure(*_SYSTEM_KEYS, timeout=ENSURE_TIMEOUT)
+    return {k: snap.get(k) for k in _SYSTEM_KEYS}
+
+
 # ========= 网络部分 =========
 
-def _get_public_ip():
-    """尝试获取公网 IP，尽量简单粗暴。"""
-    # 优先 requests
-    if requests is not None:
-        for url in ("https://api.ipify.org", "https://ifconfig.me/ip"):
-            try:
-                r = requests.get(url, timeout=3)
-                ip = r.text.strip()
-                if ip:
-                    return ip
-            except Exception:
-                continue
-    # 备用：urllib
-    try:
-        import urllib.request
-        with urllib.request.urlopen("https://api.ipify.org", timeout=3) as resp:
-            ip = resp.read().decode().strip()
-            if ip:
-                return ip
-    except Exception:
-        pass
+PUBLIC_IP_URLS = ("https://api.ipify.org", "https://ifconfig.me/ip")
+
+
+def _get_public_ip(urls=PUBLIC_IP_URLS, timeout=3):
+    """尝试获取公网 IP，按顺序问各个服务，返回第一个合法 IP。"""
+    import ipaddress
+    for url in urls:
+        try:
+            # 优先 requests，没有就用 urllib
+            requests = _optional("requests")
+            if requests is not None:
+                r = requests.get(url, timeout=timeout)
+                txt = r.text.strip()
+            else:
+                import urllib.request
+                with urllib.request.urlopen(url, timeout=timeout) as resp:
+                    txt = resp.read().decode().strip()
+            # 防止把错误页 / 门户劫持页当成 IP 缓存起来
+            return str(ipaddress.ip_address(txt))
+        except Exception:
+            continue
     return None
 
 
+class _PublicIpCache:
+    """
+    公网 IP 缓存（stale-while-revalidate）：
+    - get() 永远立即返回上次的值，不在请求线程里发 HTTP；
+    - 过期后由后台线程刷新，同一时间只有一个刷新在跑；
+    - 所有服务都失败时做负缓存，negative_ttl 内不再重试。
+    """
+
+    def __init__(self, urls=PUBLIC_IP_URLS, ttl=600, negative_ttl=60, timeout=3):
+        self.urls = tuple(urls)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.value = None
+        self.expires = 0.0
+        self.checked_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def configure(self, urls=None, ttl=None, negative_ttl=None, timeout=None):
+        with self._lock:
+            if urls:
+                self.urls = tuple(urls)
+            if ttl is not None:
+                self.ttl = ttl
+            if negative_ttl is not None:
+                self.negative_ttl = negative_ttl
+            if timeout is not None:
+                self.timeout = timeout
+            self.expires = 0.0
+
+    def _refresh(self):
+        try:
+            ip = _get_public_ip(self.urls, timeout=self.timeout)
+        except Exception:
+            ip = None
+        with self._lock:
+            now = time.time()
+            if ip:
+                self.value = ip
+                self.expires = now + self.ttl
+            else:
+                # 负缓存；旧值保留，总比显示“获取失败”强
+                self.expires = now + self.negative_ttl
+            self.checked_at = now
+            self._refreshing = False
+
+    def refresh_async(self):
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name="public-ip-refresh", daemon=True).start()
+        return True
+
+    def refresh(self):
+        """同步刷新（脚本 / 调试用）。"""
+        with self._lock:
+            self._refreshing = True
+        self._refresh()
+        return self.value
+
+    def get(self):
+        if time.time() >= self.expires:
+            self.refresh_async()
+        return self.value
+
+    @property
+    def pending(self):
+        """还从没查完过（第一次刷新还在路上）。"""
+        return self.checked_at is None
+
+
+public_ip_cache = _PublicIpCache()
+
+
+def _collect_public_ip():
+    """缓存过期时顺带触发后台刷新；放进快照是为了让多进程部署的 worker 也能看到。"""
+    ip = public_ip_cache.get()
+    return {"ip": ip, "pending": ip is None and public_ip_cache.pending}
+
+
+sampler.add("public_ip", _collect_public_ip, every=5.0)
+
+
 def _is_private_ipv4(ip: str) -> bool:
     if not ip:
         return False
@@ -333,23 +831,170 @@ def _is_private_ipv4(ip: str) -> bool:
     return False
 
 
-def get_network_overview():
+# ========= 监听端口 =========
+class _ProcNameCache:
     """
-    返回结构大概：
-    {
-      "public_ip": "...",
-      "lan_ip": "...",
-      "interfaces": [
-         {"name": "...", "ipv4": "...", "ipv6": "...", "is_up": True, "speed": 1000}
-      ],
-      "listeners": [
-         {"laddr_ip": "0.0.0.0", "laddr_port": 8000, "pid": 1234, "process": "python", "status": "LISTEN"}
-      ]
-    }
+    pid → 进程名 映射，一次 process_iter 批量建好。
+    请求的 pid 不在表里（有新进程）或超过 ttl（防 pid 复用）时整体重建。
+    """
+
+    def __init__(self, ttl=30.0):
+        self.ttl = ttl
+        self._names = {}
+        self._built = 0.0
+        self._lock = threading.Lock()
+
+    def _rebuild(self):
+        names = {}
+        for p in psutil.process_iter(["pid", "name"]):
+            info = p.info
+            names[info["pid"]] = info.get("name")
+        self._names = names
+        self._built = time.time()
+
+    def lookup(self, pids):
+        pids = {p for p in pids if p}
+        with self._lock:
+            stale = time.time() - self._built > self.ttl
+            if stale or not pids.issubset(self._names):
+                self._rebuild()
+            names = self._names
+        return {p: names.get(p) for p in pids}
+
+
+proc_names = _ProcNameCache()
+
+_TCP_LISTEN = "0A"
+
+
+def _hex_to_ip(h: str) -> str:
+    # /proc/net/tcp 的地址按 4 字节一组、主机字节序（小端）存放
+    raw = bytes.fromhex(h)
+    words = b"".join(raw[i:i + 4][::-1] for i in range(0, len(raw), 4))
+    family = socket.AF_INET if len(words) == 4 else socket.AF_INET6
+    return socket.inet_ntop(family, words)
+
+
+def _read_proc_listen(path: str):
+    """读 /proc/net/tcp{,6}，只挑 LISTEN 行；返回 [(ip, port, inode)]"""
+    out = []
+    try:
+        with open(path, "r") as f:
+            next(f, None)  # 表头
+            for line in f:
+                parts = line.split()
+                if len(parts) < 10 or parts[3] != _TCP_LISTEN:
+                    continue
+                ip_hex, port_hex = parts[1].split(":")
+                out.append((_hex_to_ip(ip_hex), int(port_hex, 16), int(parts[9])))
+    except OSError:
+        pass
+    return out
+
+
+class _SocketOwnerCache:
     """
-    # 公网 IP
-    public_ip = _get_public_ip()
+    socket inode → pid。监听 socket 很少变，所以只在出现没见过的 inode 时
+    才去扫一遍 /proc/*/fd，找到所有缺的就提前停；找不到的（没权限）记下来，
+    retry 秒内不重扫。
+    """
+
+    def __init__(self, retry=30.0):
+        self.retry = retry
+        self._owner = {}
+        self._missing = {}   # inode -> 上次扫描时间
+        self._lock = threading.Lock()
+
+    def _scan(self, wanted):
+        found = {}
+        try:
+            procs = os.scandir("/proc")
+        except OSError:
+            return found
+        with procs:
+            for d in procs:
+                if not d.name.isdigit():
+                    continue
+                try:
+                    fds = os.scandir(f"/proc/{d.name}/fd")
+                except OSError:
+                    continue
+                with fds:
+                    for fd in fds:
+                        try:
+                            link = os.readlink(fd.path)
+                        except OSError:
+                            continue
+                        if link.startswith("socket:["):
+                            ino = int(link[8:-1])
+                            if ino in wanted:
+                                found[ino] = int(d.name)
+                if len(found) == len(wanted):
+                    break
+        return found
+
+    def owners(self, inodes):
+        now = time.time()
+        with self._lock:
+            live = set(inodes)
+            # 关掉的 socket 清出去，表不会越长越大
+            for ino in list(self._owner):
+                if ino not in live:
+                    del self._owner[ino]
+            for ino in list(self._missing):
+                if ino not in live:
+                    del self._missing[ino]
+            wanted = {i for i in live
+                      if i not in self._owner and now - self._missing.get(i, 0) > self.retry}
+            if wanted:
+                found = self._scan(wanted)
+                self._owner.update(found)
+                for ino in wanted - found.keys():
+                    self._missing[ino] = now
+            return {i: self._owner.get(i) for i in live}
+
+
+socket_owners = _SocketOwnerCache()
+
+# Linux 下直接读 /proc/net/tcp{,6}，不走 net_connections 全量枚举
+USE_PROCFS_LISTENERS = sys.platform.startswith("linux")
+
+
+def _listeners_procfs():
+    rows = _read_proc_listen("/proc/net/tcp") + _read_proc_listen("/proc/net/tcp6")
+    owners = socket_owners.owners(ino for _, _, ino in rows if ino)
+    return [(ip, port, owners.get(ino)) for ip, port, ino in rows]
+
+
+def _listeners_psutil():
+    rows = []
+    for c in psutil.net_connections(kind="tcp"):
+        if c.status != psutil.CONN_LISTEN:
+            continue
+        rows.append((c.laddr.ip if c.laddr else "", c.laddr.port if c.laddr else None, c.pid))
+    return rows
 
+
+def get_listeners(use_procfs=None):
+    """
+    [{"laddr_ip", "laddr_port", "pid", "process", "status"}]
+    进程名统一走 proc_names 批量查，不再每个 pid 起一次 psutil.Process。
+    """
+    if use_procfs is None:
+        use_procfs = USE_PROCFS_LISTENERS
+    rows = _listeners_procfs() if use_procfs else _listeners_psutil()
+    names = proc_names.lookup(pid for _, _, pid in rows)
+    return [{
+        "laddr_ip": ip,
+        "laddr_port": port,
+        "pid": pid,
+        "process": names.get(pid) or "unknown",
+        "status": "LISTEN",
+    } for ip, port, pid in rows]
+
+
+def _collect_network():
+    """网卡 + 监听端口，由后台采样器定时调用。"""
     # 网卡信息
     if_addrs = psutil.net_if_addrs()
     if_stats = psutil.net_if_stats()
@@ -384,39 +1029,206 @@ def get_network_overview():
     lan_ip = candidate_lan_ips[0] if candidate_lan_ips else None
 
     # 监听端口信息
-    listeners = []
     try:
-        conns = psutil.net_connections(kind="inet")
-        for c in conns:
-            if c.status != psutil.CONN_LISTEN:
-                continue
-            laddr_ip = c.laddr.ip if c.laddr else ""
-            laddr_port = c.laddr.port if c.laddr else None
-            pid = c.pid
-            pname = None
-            if pid:
-                try:
-                    pname = psutil.Process(pid).name()
-                except Exception:
-                    pname = None
-            listeners.append({
-                "laddr_ip": laddr_ip,
-                "laddr_port": laddr_port,
-                "pid": pid,
-                "process": pname or "unknown",
-                "status": "LISTEN",
-            })
+        listeners = get_listeners()
     except Exception:
         listeners = []
 
-    # 为了在 Jinja 里好用，返回 dict
     return {
-        "public_ip": public_ip,
         "lan_ip": lan_ip,
         "interfaces": interfaces,
         "listeners": listeners,
     }
 
+
+sampler.add("network", _collect_network, every=5.0, slow=True)
+
+
+# ========= 网卡速率 =========
+# 相邻两次采样的计数差 / 时间差；每块网卡的速率进一个只有 1 秒分辨率的环形缓冲，
+# /network 的小曲线从这里取。网卡消失就把它的列删掉，缓冲大小只和当前网卡数有关。
+NIC_HISTORY_SECONDS = 600
+nic_history = MetricStore(levels=((1, NIC_HISTORY_SECONDS),))
+_RATE_FIELDS = (
+    ("rx_bps", ("bytes_recv",)),
+    ("tx_bps", ("bytes_sent",)),
+    ("rx_pps", ("packets_recv",)),
+    ("tx_pps", ("packets_sent",)),
+    ("err_ps", ("errin", "errout")),
+    ("drop_ps", ("dropin", "dropout")),
+)
+_nic_prev = {}   # nic -> (ts, counters)
+
+
+_WRAP_NEAR = 2 ** 32 - 2 ** 28   # 上一次读数超过它才可能是 32 位计数器回绕
+
+
+def _counter_delta(prev, cur):
+    """
+    计数差；变小时只有上一次已经接近 2**32、这一次又很小才按 32 位回绕算。
+    其它变小的情况（网卡重建 / 驱动重置，64 位计数器从小值归零）返回 None，
+    否则会算出一个约 4 GiB 的假增量。
+    """
+    if cur >= prev:
+        return cur - prev
+    if _WRAP_NEAR < prev < 2 ** 32 and cur < 2 ** 28:
+        return cur + 2 ** 32 - prev
+    return None
+
+
+def _nic_rates(now, counters, speeds):
+    """{nic: 计数} → {nic: 速率}；第一次见到的网卡没有基准，不出速率。"""
+    rates = {}
+    for nic, c in counters.items():
+        prev = _nic_prev.get(nic)
+        _nic_prev[nic] = (now, c)
+        if prev is None or now <= prev[0]:
+            continue
+        dt = now - prev[0]
+        r = {}
+        for field, keys in _RATE_FIELDS:
+            total = 0
+            for k in keys:
+                d = _counter_delta(prev[1][k], c[k])
+                if d is None:
+                    total = None
+                    break
+                total += d
+            r[field] = None if total is None else round(total / dt, 1)
+        speed = speeds.get(nic)
+        if speed and r["rx_bps"] is not None and r["tx_bps"] is not None:
+            # 全双工：两个方向各自能跑满，取较大的那个
+            r["util_percent"] = round(max(r["rx_bps"], r["tx_bps"]) * 8 / (speed * 1e6) * 100, 2)
+        else:
+            r["util_percent"] = None
+        rates[nic] = r
+    for n in [n for n in _nic_prev if n not in counters]:
+        del _nic_prev[n]
+    return rates
+
+
+def _collect_netio():
+    """各网卡的累计收发计数（字节 / 包 / 错误 / 丢弃）和按差分算出的速率，每个采样周期一次。"""
+    now = time.time()
+    counters = {}
+    for name, c in psutil.net_io_counters(pernic=True).items():
+        counters[name] = {
+            "bytes_sent": c.bytes_sent,
+            "bytes_recv": c.bytes_recv,
+            "packets_sent": c.packets_sent,
+            "packets_recv": c.packets_recv,
+            "errin": c.errin,
+            "errout": c.errout,
+            "dropin": c.dropin,
+            "dropout": c.dropout,
+        }
+    # 链路速率来自 network provider（5 秒一次），这里不再单独查 net_if_stats
+    net = sampler.get("network") or {}
+    speeds = {i["name"]: i["speed"] for i in net.get("interfaces", []) if i.get("speed")}
+    rates = _nic_rates(now, counters, speeds)
+    for nic, r in rates.items():
+        counters[nic] = dict(counters[nic], **r)
+    return counters
+
+
+_nic_seen = set()   # 曲线里有列的网卡
+_nic_recorded = None
+
+
+def _record_nic_history():
+    """把 netio 快照里的速率写进 nic_history；只读快照，多进程时每个进程各记一份。"""
+    global _nic_seen, _nic_recorded
+    ts = sampler.updated_at("netio")
+    if ts is None or ts == _nic_recorded:
+        return {"nics": len(_nic_seen)}
+    _nic_recorded = ts
+    netio = sampler.get("netio") or {}
+    values = {}
+    for nic, c in netio.items():
+        if "rx_bps" not in c:
+            continue
+        for k in [f for f, _ in _RATE_FIELDS] + ["util_percent"]:
+            values[f"{nic}/{k}"] = c[k]
+    if values:
+        nic_history.add(ts, values)
+    gone = _nic_seen - set(netio)
+    if gone:
+        nic_history.drop([f"{n}/{f}" for n in gone for f, _ in _RATE_FIELDS] + [f"{n}/util_percent" for n in gone])
+    _nic_seen = {nic for nic, c in netio.items() if "rx_bps" in c}
+    return {"nics": len(_nic_seen)}
+
+
+def get_nic_history(range_text="5m", fields=("rx_bps", "tx_bps"), max_points=None):
+    """{nic: {field: [[ts, value], ...]}}，给 /network 的小曲线用。"""
+    span = min(parse_range(range_text, default=300), NIC_HISTORY_SECONDS)
+    end = time.time()
+    out = {}
+    for nic in sorted(_nic_seen):
+        out[nic] = {f: nic_history.query(f"{nic}/{f}", end - span, end, max_points=max_points)["points"]
+                    for f in fields}
+    return out
+
+
+sampler.add("netio", _collect_netio)
+sampler.add("nichistory", _record_nic_history, local=True)
+
+
+def get_network_overview():
+    """
+    返回结构大概：
+    {
+      "public_ip": "...",
+      "lan_ip": "...",
+      "interfaces": [
+         {"name": "...", "ipv4": "...", "ipv6": "...", "is_up": True, "speed": 1000}
+      ],
+      "listeners": [
+         {"laddr_ip": "0.0.0.0", "laddr_port": 8000, "pid": 1234, "process": "python", "status": "LISTEN"}
+      ]
+    }
+    网卡 / 监听端口 / 公网 IP 都读采样器快照，不在请求里做 IO。
+    """
+    snap = sampler.ensure("network", "public_ip", timeout=ENSURE_TIMEOUT)
+    net = snap.get("network") or {}
+    pub = snap.get("public_ip") or {"ip": None, "pending": True}
+    rates = {}
+    for nic, c in (snap.get("netio") or {}).items():
+        if "rx_bps" in c:
+            rates[nic] = {f: c[f] for f, _ in _RATE_FIELDS}
+            rates[nic]["util_percent"] = c["util_percent"]
+
+    # 为了在 Jinja 里好用，返回 dict
+    return {
+        "public_ip": pub["ip"],
+        "public_ip_pending": pub["pending"],
+        "lan_ip": net.get("lan_ip"),
+        "interfaces": net.get("interfaces", []),
+        "listeners": net.get("listeners", []),
+        "rates": rates,
+    }
+
+
+# ========= 进程 =========
+# 按需刷新的增量进程表；和监听端口一样，Linux 上直接读 /proc
+process_table = ProcessTable(min_interval=1.0)
+
+
+def get_processes(sort="cpu", n=50):
+    """/api/processes：按 sort 取前 n 个进程，外加进程总数和这一轮刷新耗时。"""
+    n = max(1, min(int(n), 1000))
+    rows = process_table.top(sort, n)
+    return {
+        "sort": sort,
+        "processes": rows,
+        "refresh_ms": process_table.last_ms,
+        **process_table.stats,
+    }
+
+
+def get_live_state():
+    """/api/stream 推送的整体状态：系统 + 网络，全部来自快照。"""
+    return {"system": get_system_overview(), "network": get_network_overview()}
+
 from pathlib import Path
 from werkzeug.utils import secure_filename
 
@@ -448,31 +1260,212 @@ def list_dir(root: str, rel: str = ""):
     if not rel:
         return list_roots_windows()
 
-    p = _safe_join(root, rel)
+    p = _open_dir(root, rel)
+    key = str(p)
+    cached = dir_cache.get(key)
+    if cached is not None:
+        return list(cached)
+    mtime_ns = os.stat(p).st_mtime_ns   # 先拿 mtime 再列，列的过程中被改了就不进缓存
+    items = _scan_dir(p)
+    dir_cache.put(key, items, mtime_ns)
+    return items
+
+
+def _entry_item(e):
+    """DirEntry → 列表行：类型来自 d_type，最多一次 stat。"""
+    try:
+        is_dir = e.is_dir()
+    except OSError:
+        is_dir = False
+    try:
+        st = e.stat()
+        return {
+            "name": e.name,
+            "is_dir": is_dir,
+            "size": st.st_size if e.is_file() else None,
+            "mtime": st.st_mtime,
+        }
+    except OSError:
+        return {
+            "name": e.name,
+            "is_dir": is_dir,
+            "size": None,
+            "mtime": None,
+        }
+
+
+def _sort_key(is_dir, name):
+    # 目录在前，名字不区分大小写；最后带上原名保证全序（翻页游标要求）
+    return (0 if is_dir else 1, name.lower(), name)
+
+
+def _load_item(dir_path, name):
+    """单个条目的列表行（缓存原地更新用）；已经不存在返回 None。"""
+    full = os.path.join(dir_path, name)
+    try:
+        st = os.stat(full)
+    except OSError:
+        if not os.path.lexists(full):
+            return None
+        # 断掉的软链接：和 _entry_item 一样给空字段
+        return {"name": name, "is_dir": False, "size": None, "mtime": None}
+    is_dir = stat.S_ISDIR(st.st_mode)
+    return {
+        "name": name,
+        "is_dir": is_dir,
+        "size": st.st_size if stat.S_ISREG(st.st_mode) else None,
+        "mtime": st.st_mtime,
+    }
+
+
+dir_cache = DirCache(
+    key=lambda it: _sort_key(it["is_dir"], it["name"]),
+    load_item=_load_item,
+)
+
+
+# 写操作之后的回调：fn(dir_path)，目录大小索引等靠它得知哪个目录变了
+write_listeners = []
+
+
+def _notify_write(dir_path):
+    for fn in write_listeners:
+        try:
+            fn(str(dir_path))
+        except Exception:
+            pass
+
+
+def configure_dir_cache(max_entries=None):
+    if max_entries:
+        dir_cache.max_entries = max_entries
+    return dir_cache
 
+
+def _scan_dir(p):
+    """
+    os.scandir 版本：文件类型直接来自读目录时的 d_type（Windows 下连 stat 都自带），
+    每个条目最多一次 stat；排序只用已经拿到的字段，不再额外发系统调用。
+    """
+    with os.scandir(p) as it:
+        items = [_entry_item(e) for e in it]
+    items.sort(key=lambda x: _sort_key(x["is_dir"], x["name"]))
+    return items
+
+
+def _open_dir(root: str, rel: str):
+    p = _safe_join(root, rel)
     if not p.exists():
         raise FileNotFoundError("Path not found")
     if not p.is_dir():
         raise NotADirectoryError("Not a directory")
+    return p
+
+
+def encode_cursor(item) -> str:
+    return f"{0 if item['is_dir'] else 1}:{item['name']}"
+
+
+def decode_cursor(cursor: str):
+    flag, _, name = (cursor or "").partition(":")
+    if flag not in ("0", "1"):
+        raise ValueError("Bad cursor")
+    return _sort_key(flag == "0", name)
+
+
+def list_dir_page(root: str, rel: str = "", cursor: str = None, limit: int = 500):
+    """
+    按排序顺序取一页：
+      {"items": [...], "next_cursor": "1:foo.txt" 或 None}
+    游标是上一页最后一行的排序键。读目录时只用 d_type 和名字选出
+    这一页的 limit 个条目（heapq.nsmallest，内存 O(limit)），
+    只对这一页的条目做 stat，目录再大也不会整表进内存。
+    """
+    limit = max(1, min(int(limit or 500), 10000))
+    after = decode_cursor(cursor) if cursor else None
+
+    if not rel:
+        rows = list_roots_windows()
+        if after:
+            rows = [r for r in rows if _sort_key(True, r["name"]) > after]
+        page = rows[:limit]
+        nxt = encode_cursor(page[-1]) if len(rows) > limit else None
+        return {"items": page, "next_cursor": nxt}
+
+    p = _open_dir(root, rel)
+    key = str(p)
+
+    cached = dir_cache.get(key)
+    if cached is None:
+        cached, picked = _scan_page(p, after, limit)
+        if picked is not None:
+            items = [_entry_item(e) for _, e in picked[:limit]]
+            nxt = encode_cursor(items[-1]) if len(picked) > limit else None
+            return {"items": items, "next_cursor": nxt}
+
+    # 缓存里是排好序的完整列表，二分定位游标
+    start = _bisect_items(cached, after) if after is not None else 0
+    page = cached[start:start + limit]
+    nxt = encode_cursor(page[-1]) if start + limit < len(cached) else None
+    return {"items": page, "next_cursor": nxt}
+
+
+def _bisect_items(items, after):
+    lo, hi = 0, len(items)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        it = items[mid]
+        if _sort_key(it["is_dir"], it["name"]) <= after:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _scan_page(p, after, limit):
+    """
+    读一遍目录：条目数不超过缓存的单目录上限时，整表 stat、排序并放进缓存，
+    返回 (items, None)；超过时剩下的部分只按 d_type + 名字挑出这一页，
+    返回 (None, [(key, DirEntry)])，内存 O(limit)。
+    """
+    cap = dir_cache.max_entries // 4
+    mtime_ns = os.stat(p).st_mtime_ns
+    with os.scandir(p) as it:
+        buf = []
+        for e in it:
+            buf.append(e)
+            if len(buf) > cap:
+                break
+        else:
+            items = [_entry_item(e) for e in buf]
+            items.sort(key=lambda x: _sort_key(x["is_dir"], x["name"]))
+            dir_cache.put(str(p), items, mtime_ns)
+            return items, None
+
+        def keyed(entries):
+            for e in entries:
+                try:
+                    is_dir = e.is_dir()
+                except OSError:
+                    is_dir = False
+                k = _sort_key(is_dir, e.name)
+                if after is None or k > after:
+                    yield k, e
+
+        picked = heapq.nsmallest(limit + 1, keyed(itertools.chain(buf, it)), key=lambda ke: ke[0])
+        return None, picked
+
+
+def iter_dir(root: str, rel: str = ""):
+    """边读边产出（目录原始顺序，不排序），给流式接口用，首字节不用等整个目录读完。"""
+    if not rel:
+        yield from list_roots_windows()
+        return
+    p = _open_dir(root, rel)
+    with os.scandir(p) as it:
+        for e in it:
+            yield _entry_item(e)
 
-    items = []
-    for child in sorted(p.iterdir(), key=lambda x: (not x.is_dir(), x.name.lower())):
-        try:
-            stat = child.stat()
-            items.append({
-                "name": child.name,
-                "is_dir": child.is_dir(),
-                "size": stat.st_size if child.is_file() else None,
-                "mtime": stat.st_mtime,
-            })
-        except Exception:
-            items.append({
-                "name": child.name,
-                "is_dir": child.is_dir(),
-                "size": None,
-                "mtime": None,
-            })
-    return items
 
 def delete_path(root: str, rel: str):
     p = _safe_join(root, rel)
@@ -481,8 +1474,11 @@ def delete_path(root: str, rel: str):
     if p.is_dir():
         # 只允许删空目录（更安全）
         p.rmdir()
+        dir_cache.invalidate(str(p), recursive=True)
     else:
         p.unlink()
+    dir_cache.remove(str(p.parent), p.name)
+    _notify_write(p.parent)
 
 def make_dir(root: str, rel_dir: str, name: str):
     base = _safe_join(root, rel_dir)
@@ -490,6 +1486,8 @@ def make_dir(root: str, rel_dir: str, name: str):
     safe = secure_filename(name) or name  # 中文名 secure_filename 可能变空，这里保底
     target = (base / safe)
     target.mkdir(exist_ok=False)
+    dir_cache.upsert(str(base), safe)
+    _notify_write(base)
 
 def rename_path(root: str, rel: str, new_name: str):
     p = _safe_join(root, rel)
@@ -498,6 +1496,10 @@ def rename_path(root: str, rel: str, new_name: str):
     safe = secure_filename(new_name) or new_name
     newp = p.parent / safe
     p.rename(newp)
+    dir_cache.invalidate(str(p), recursive=True)
+    dir_cache.remove(str(p.parent), p.name)
+    dir_cache.upsert(str(p.parent), safe)
+    _notify_write(p.parent)
 
 def save_upload(root: str, rel_dir: str, file_storage):
     base = _safe_join(root, rel_dir)
@@ -507,6 +1509,8 @@ def save_upload(root: str, rel_dir: str, file_storage):
         raise ValueError("Empty filename")
     dst = (base / filename)
     file_storage.save(str(dst))
+    dir_cache.upsert(str(base), filename)
+    _notify_write(base)
     return filename
 
 def build_breadcrumbs(rel: str):
@@ -0,0 +1,84 @@
+# bench_archive.py
+"""
+目录打包下载基准：首字节时间（TTFB）、总耗时、吞吐、峰值内存。
+
+    python bench_archive.py                 # 造一个 ~1 GB 的混合目录（小文本、大日志、jpg/mp4 之类已压缩文件）
+    python bench_archive.py /some/dir       # 直接打包已有目录
+
+对照组是 shutil.make_archive：先写完临时文件才能开始发，TTFB = 总耗时。
+输出都丢掉不落盘，测的是打包本身。
+"""
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import archives
+
+
+def make_tree(root):
+    text = b"".join(b"%08d some log line with a little entropy %x\n" % (i, i * 2654435761 % 2**32)
+                    for i in range(20000))
+    for d in range(20):
+        sub = os.path.join(root, f"dir{d:02d}")
+        os.makedirs(sub)
+        for i in range(500):
+            with open(os.path.join(sub, f"note{i:04d}.txt"), "wb") as f:
+                f.write(text[:2000 + i * 37])
+        with open(os.path.join(sub, "app.log"), "wb") as f:
+            for _ in range(24):
+                f.write(text)
+        with open(os.path.join(sub, "photo.jpg"), "wb") as f:
+            f.write(os.urandom(8 * 1024 * 1024))
+    with open(os.path.join(root, "movie.mp4"), "wb") as f:
+        for _ in range(256):
+            f.write(os.urandom(1024 * 1024))
+
+
+def run(fmt, top, level, workers):
+    t = time.perf_counter()
+    ttfb = None
+    total = 0
+    for chunk in archives.stream(fmt, top, "bench", level=level, workers=workers):
+        if ttfb is None:
+            ttfb = time.perf_counter() - t
+        total += len(chunk)
+    return ttfb, time.perf_counter() - t, total
+
+
+def main(top):
+    size = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(top) for f in fs)
+    print(f"目录 {top}：{size / 1e6:.0f} MB")
+    print(f"{'method':>24} {'TTFB ms':>9} {'seconds':>8} {'in MB/s':>8} {'out MB':>8} {'maxrss MB':>10}")
+
+    for fmt in ("zip", "tar.gz"):
+        tmp = tempfile.mkdtemp(prefix="bench_archive_ref_")
+        try:
+            t = time.perf_counter()
+            out = shutil.make_archive(os.path.join(tmp, "ref"), "zip" if fmt == "zip" else "gztar", top)
+            dt = time.perf_counter() - t
+            print(f"{'make_archive ' + fmt:>24} {dt * 1e3:>9.0f} {dt:>8.2f} {size / dt / 1e6:>8.1f} "
+                  f"{os.path.getsize(out) / 1e6:>8.1f} {'':>10}")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    for fmt, level, workers in (("zip", 6, 1), ("zip", 6, os.cpu_count() or 4), ("zip", 0, 1),
+                                ("tar.gz", 6, 1), ("tar.gz", 6, os.cpu_count() or 4), ("tar", 0, 1)):
+        ttfb, dt, total = run(fmt, top, level, workers)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{f'{fmt} L{level} ×{workers}':>24} {ttfb * 1e3:>9.1f} {dt:>8.2f} {size / dt / 1e6:>8.1f} "
+              f"{total / 1e6:>8.1f} {rss:>10.0f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main(sys.argv[1])
+    else:
+        work = tempfile.mkdtemp(prefix="bench_archive_")
+        try:
+            make_tree(work)
+            main(work)
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
@@ -0,0 +1,83 @@
+# bench_dupes.py
+"""
+重复文件查找基准：冷扫描（全部要算哈希）、热扫描（全部命中缓存）、改动 1% 后再扫。
+
+    python bench_dupes.py                  # 10 万个文件，4 个哈希进程
+    python bench_dupes.py 500000 8         # 文件数、进程数（0 = 线程池）
+
+大小只取几十种，让大部分文件都要进局部哈希这一轮；约 10% 是真重复，
+另有一批大文件只有中间不同，要靠整文件哈希才能分开。
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from dupfinder import DupFinder
+
+FILES_PER_DIR = 1000
+
+
+def make_tree(root, n):
+    blobs = [os.urandom(256 * 1024) for _ in range(8)]
+    for i in range(n):
+        d = os.path.join(root, f"d{i // FILES_PER_DIR:04d}")
+        if i % FILES_PER_DIR == 0:
+            os.makedirs(d)
+        size = 1024 * (1 + i % 40)
+        if i % 10 == 0:
+            data = blobs[i % 8][:size]                   # 真重复
+        else:
+            data = i.to_bytes(8, "little") + blobs[(i // 7) % 8][8:size]
+        with open(os.path.join(d, f"f{i:07d}.bin"), "wb") as f:
+            f.write(data)
+    big = os.path.join(root, "big")
+    os.makedirs(big)
+    for i in range(8):
+        data = bytearray(blobs[0] * 64)                 # 16 MiB，头尾都一样
+        data[len(data) // 2] = i % 4                    # 每两份相同
+        with open(os.path.join(big, f"big{i}.bin"), "wb") as f:
+            f.write(data)
+
+
+def run(finder, root):
+    t = time.perf_counter()
+    finder.start(root, "bench")
+    while True:
+        info = finder.status("bench", limit=0)
+        if info["state"] != "running":
+            return info, time.perf_counter() - t
+        time.sleep(0.02)
+
+
+def main(n, processes):
+    work = tempfile.mkdtemp(prefix="bench_dupes_")
+    try:
+        root = os.path.join(work, "root")
+        t = time.perf_counter()
+        make_tree(root, n)
+        print(f"造 {n} 个文件：{time.perf_counter() - t:.1f} s")
+        finder = DupFinder(os.path.join(work, "hashes.sqlite3"), processes=processes)
+        print(f"{'run':>10} {'seconds':>8} {'files':>8} {'cand':>8} {'hashed':>8} {'hashed MB':>10} "
+              f"{'hits':>8} {'groups':>7} {'wasted MB':>10}")
+
+        def show(label):
+            info, dt = run(finder, root)
+            print(f"{label:>10} {dt:>8.2f} {info['files']:>8} {info['candidates']:>8} {info['hashed_files']:>8} "
+                  f"{info['hashed_bytes'] / 1e6:>10.1f} {info['cache_hits']:>8} {info['groups']:>7} "
+                  f"{info['wasted_bytes'] / 1e6:>10.1f}  {info['state']} {info['message']}")
+
+        show("cold")
+        show("warm")
+        for i in range(0, n, 100):
+            p = os.path.join(root, f"d{i // FILES_PER_DIR:04d}", f"f{i:07d}.bin")
+            with open(p, "r+b") as f:
+                f.write(b"changed!")
+        show("1% 改动")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000, int(sys.argv[2]) if len(sys.argv) > 2 else 4)
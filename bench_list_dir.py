@@ -0,0 +1,106 @@
+# bench_list_dir.py
+"""
+list_dir 基准：旧的 Path.iterdir 实现 vs 新的 os.scandir 实现。
+
+    python bench_list_dir.py                 # 1k / 100k / 1M 个条目
+    python bench_list_dir.py 1000 20000      # 自定义规模
+
+有 strace 时顺便统计 stat / getdents 系统调用次数（Linux）。
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import backend
+
+
+def list_dir_iterdir(p):
+    """改造前的实现，留作对照"""
+    items = []
+    for child in sorted(p.iterdir(), key=lambda x: (not x.is_dir(), x.name.lower())):
+        try:
+            stat = child.stat()
+            items.append({
+                "name": child.name,
+                "is_dir": child.is_dir(),
+                "size": stat.st_size if child.is_file() else None,
+                "mtime": stat.st_mtime,
+            })
+        except Exception:
+            items.append({"name": child.name, "is_dir": child.is_dir(), "size": None, "mtime": None})
+    return items
+
+
+IMPLS = {
+    "iterdir": list_dir_iterdir,
+    "scandir": backend._scan_dir,
+}
+
+
+def make_tree(base, n):
+    d = os.path.join(base, f"n{n}")
+    os.mkdir(d)
+    for i in range(n):
+        if i % 10 == 0:
+            os.mkdir(os.path.join(d, f"dir{i:07d}"))
+        else:
+            open(os.path.join(d, f"file{i:07d}.txt"), "wb").close()
+    return d
+
+
+def time_impl(name, d, repeat=3):
+    fn = IMPLS[name]
+    best = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(Path(d))
+        dt = time.perf_counter() - t
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def _strace_calls(code):
+    res = subprocess.run(
+        ["strace", "-f", "-c", "-e", "trace=%stat,getdents64,getdents", sys.executable, "-c", code],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    for line in res.stderr.splitlines():
+        parts = line.split()
+        # 汇总行：% time / seconds / usecs/call / calls / [errors] / total
+        if len(parts) >= 5 and parts[-1] == "total":
+            return int(parts[3])
+    return 0
+
+
+def count_syscalls(name, d):
+    """在子进程里跑一次，用 strace -c 统计；没有 strace 返回 None"""
+    if not shutil.which("strace"):
+        return None
+    setup = (f"import sys; sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r});"
+             f"import bench_list_dir as b; from pathlib import Path")
+    # 解释器启动本身的 stat 也会算进去，减去空跑的基线
+    return _strace_calls(f"{setup}; b.IMPLS[{name!r}](Path({d!r}))") - _strace_calls(setup)
+
+
+def main(sizes):
+    base = tempfile.mkdtemp(prefix="bench_list_dir_")
+    try:
+        print(f"{'entries':>9} {'impl':>8} {'best ms':>10} {'us/entry':>9} {'syscalls':>9}")
+        for n in sizes:
+            d = make_tree(base, n)
+            for name in IMPLS:
+                dt = time_impl(name, d, repeat=3 if n <= 100_000 else 1)
+                calls = count_syscalls(name, d)
+                print(f"{n:>9} {name:>8} {dt * 1000:>10.1f} {dt / n * 1e6:>9.2f} "
+                      f"{calls if calls is not None else 'n/a':>9}")
+            shutil.rmtree(d)
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or [1_000, 100_000, 1_000_000])
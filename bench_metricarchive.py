@@ -0,0 +1,76 @@
+# bench_metricarchive.py
+"""
+历史指标归档基准：add() 的开销、一次刷盘多久、查询 1 小时原值 / 30 天汇总的延迟、占多少磁盘。
+
+    python bench_metricarchive.py          # 模拟 30 天、每秒一行、12 个指标
+    python bench_metricarchive.py 7        # 天数
+
+原值只按 raw_hours 保留，所以只有最后 48 小时会写原值段，更早的部分只写 1 分钟汇总。
+"""
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from metricarchive import MetricArchive
+
+METRICS = ["cpu", "mem", "swap", "disk_read", "disk_write", "net_sent", "net_recv",
+           "load1", "procs", "gpu", "gpu_mem", "temp"]
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))]
+
+
+def main(days):
+    tmp = tempfile.mkdtemp(prefix="bench_metrics_")
+    try:
+        arc = MetricArchive(tmp, flush_interval=3600)
+        rnd = random.Random(1)
+        now = time.time()
+        t0 = now - days * 86400
+        rows = days * 86400
+
+        lat = []
+        flush = []
+        t = time.perf_counter()
+        for i in range(rows):
+            vals = {m: rnd.random() * 100 for m in METRICS}
+            a = time.perf_counter()
+            arc.add(t0 + i, vals)
+            lat.append(time.perf_counter() - a)
+            if i % 10 == 9:   # 和默认 METRICS_ARCHIVE_FLUSH=10 一样：攒 10 行写一次
+                a = time.perf_counter()
+                arc.flush()
+                flush.append(time.perf_counter() - a)
+        arc.flush()
+        total = time.perf_counter() - t
+        print(f"写入 {rows} 行 × {len(METRICS)} 个指标：{total:.1f} s")
+        print(f"add()：p50 {_pct(lat, 0.5) * 1e6:.1f} µs，p99 {_pct(lat, 0.99) * 1e6:.1f} µs")
+        print(f"刷盘（10 行，含 fsync）：p50 {_pct(flush, 0.5) * 1000:.2f} ms，p99 {_pct(flush, 0.99) * 1000:.2f} ms")
+
+        arc.maintain()
+        usage = arc.disk_usage()
+        print(f"磁盘：{usage['segments']} 个段，{usage['bytes'] / 1e6:.1f} MB")
+        arc.close()
+
+        # 重新打开，模拟重启后的第一次查询
+        arc = MetricArchive(tmp)
+        for label, span, points in (("1 小时原值", 3600, None), ("24 小时", 86400, 1440),
+                                    (f"{days} 天汇总", days * 86400, 1440)):
+            q = []
+            for k in range(20):
+                a = time.perf_counter()
+                res = arc.query(rnd.choice(METRICS), now - span, now, max_points=points)
+                q.append(time.perf_counter() - a)
+            print(f"{label}：{len(res['points'])} 点（step {res['step']} s），"
+                  f"p50 {_pct(q, 0.5) * 1000:.1f} ms，p99 {_pct(q, 0.99) * 1000:.1f} ms")
+        arc.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 30)
@@ -0,0 +1,114 @@
+# bench_metrics.py
+"""
+/metrics 抓取延迟基准：1 / 10 / 100 个并发抓取方，各自用长连接连续抓。
+
+    python bench_metrics.py                  # 每档 5 秒
+    python bench_metrics.py 10               # 每档 10 秒
+
+服务端在子进程里用 werkzeug 多线程服务器跑（和 python app.py 一样的栈），
+客户端线程在本进程里，互不抢 GIL。另外单独测一下 Exporter 本身：
+缓存命中时一次抓取的开销，以及快照变了以后重新渲染一次的开销。
+"""
+import http.client
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+SERVER = r'''
+import sys, config
+config.FILE_ROOT = sys.argv[1]
+config.DU_INDEX_PATH = sys.argv[2] + "/du.sqlite3"
+config.SEARCH_INDEX_PATH = sys.argv[2] + "/search.sqlite3"
+from werkzeug.serving import make_server
+from app import create_app
+srv = make_server("127.0.0.1", int(sys.argv[3]), create_app(), threaded=True)
+print("ready", flush=True)
+srv.serve_forever()
+'''
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))] if xs else float("nan")
+
+
+def scrape_load(port, clients, seconds):
+    lat = []
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def worker():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        mine = []
+        while time.perf_counter() < stop:
+            t = time.perf_counter()
+            conn.request("GET", "/metrics", headers={"Accept-Encoding": "gzip"})
+            r = conn.getresponse()
+            r.read()
+            mine.append(time.perf_counter() - t)
+        conn.close()
+        with lock:
+            lat.extend(mine)
+
+    ts = [threading.Thread(target=worker) for _ in range(clients)]
+    t0 = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return lat, time.perf_counter() - t0
+
+
+def exporter_cost(n=20000):
+    from metrics import Exporter
+    from backend import sampler
+    sampler.run_once()
+    ex = Exporter(sampler)
+    ex.body(gzipped=True)
+    t = time.perf_counter()
+    for _ in range(n):
+        ex.body(gzipped=True)
+    hit = (time.perf_counter() - t) / n
+    t = time.perf_counter()
+    for _ in range(200):
+        ex._cache.clear()
+        ex.body(gzipped=True)
+    miss = (time.perf_counter() - t) / 200
+    return hit, miss, len(ex.body())
+
+
+def main(seconds):
+    import tempfile
+    hit, miss, size = exporter_cost()
+    print(f"Exporter: cached {hit * 1e6:.2f} us/scrape, re-render + gzip {miss * 1e3:.2f} ms, body {size} B")
+
+    port = _free_port()
+    here = os.path.dirname(os.path.abspath(__file__))
+    tmp = tempfile.mkdtemp(prefix="bench_metrics_")
+    proc = subprocess.Popen([sys.executable, "-c", SERVER, tmp, tmp, str(port)], cwd=here,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        proc.stdout.readline()
+        print(f"{'clients':>8} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for clients in (1, 10, 100):
+            lat, dt = scrape_load(port, clients, seconds)
+            print(f"{clients:>8} {len(lat) / dt:>9.0f} {_pct(lat, 0.5) * 1e3:>8.2f} "
+                  f"{_pct(lat, 0.99) * 1e3:>8.2f} {max(lat) * 1e3:>8.2f}")
+    finally:
+        proc.kill()
+        proc.wait()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 5.0)
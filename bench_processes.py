@@ -0,0 +1,76 @@
+# bench_processes.py
+"""
+进程表刷新基准：先起一批睡眠子进程把进程数凑够，再测 ProcessTable 增量刷新的耗时。
+
+    python bench_processes.py                # 凑到 5000 个进程
+    python bench_processes.py 10000
+
+分别测 /proc 直读（只在 Linux 上）和 psutil oneshot 两条路径，
+对照组是每轮都新建 psutil.Process 的 process_iter 全量读法。
+"""
+import subprocess
+import sys
+import time
+
+import psutil
+
+from proctable import ProcessTable
+
+
+def spawn(target):
+    procs = []
+    need = target - len(psutil.pids())
+    for _ in range(max(0, need)):
+        procs.append(subprocess.Popen(["sleep", "600"], stdin=subprocess.DEVNULL,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    return procs
+
+
+def bench_table(use_procfs, rounds=10):
+    t = ProcessTable(min_interval=0, use_procfs=use_procfs)
+    t0 = time.perf_counter()
+    t.refresh(force=True)
+    first = time.perf_counter() - t0
+    best = None
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        t.refresh(force=True)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    t0 = time.perf_counter()
+    t.top("cpu", 50)
+    top = time.perf_counter() - t0
+    return first, best, top, t.stats["count"]
+
+
+def bench_iter(rounds=3):
+    best = None
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for p in psutil.process_iter(["pid", "name", "username", "cmdline", "cpu_times",
+                                      "memory_info", "num_threads", "status"]):
+            p.info
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def main(target):
+    procs = spawn(target)
+    try:
+        time.sleep(0.5)
+        print(f"{'path':>14} {'procs':>7} {'first ms':>9} {'tick ms':>8} {'top50 ms':>9}")
+        paths = [("procfs", True), ("psutil", False)] if sys.platform.startswith("linux") else [("psutil", False)]
+        for label, use_procfs in paths:
+            first, tick, top, count = bench_table(use_procfs)
+            print(f"{label:>14} {count:>7} {first * 1e3:>9.1f} {tick * 1e3:>8.1f} {top * 1e3:>9.1f}")
+        print(f"{'process_iter':>14} {len(psutil.pids()):>7} {'':>9} {bench_iter() * 1e3:>8.1f}")
+    finally:
+        for p in procs:
+            p.kill()
+        for p in procs:
+            p.wait()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
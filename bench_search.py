@@ -0,0 +1,83 @@
+# bench_search.py
+"""
+文件名搜索基准：直接往索引库里灌 N 条合成路径（不碰文件系统），再测几类查询的耗时。
+
+    python bench_search.py                   # 100k / 1M 条
+    python bench_search.py 10000000          # 一千万条（库大约几 GB，灌库要几分钟）
+
+顺带打印库文件大小和每条的平均字节数。
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from searchindex import SearchIndex
+
+WORDS = ["report", "invoice", "photo", "backup", "notes", "draft", "final", "data",
+         "img", "video", "config", "readme", "build", "log", "archive", "scan"]
+EXTS = [".txt", ".log", ".jpg", ".png", ".pdf", ".mp4", ".json", ".zip", ".py", ".csv"]
+
+QUERIES = [
+    ("prefix", "report"),
+    ("prefix", "zzz"),
+    ("substring", "nvoic"),
+    ("substring", "_20"),
+    ("substring", "qqqq"),       # 没有命中：trigram 直接判空
+    ("glob", "*.pdf"),
+    ("glob", "img_1234*.jpg"),
+    ("glob", "*final*2019*"),
+]
+
+
+def fill(idx, root, n, per_dir=1000):
+    rnd = random.Random(42)
+    db = idx._db
+    t = time.perf_counter()
+    with db:
+        for d in range(0, n, per_dir):
+            path = os.path.join(root, f"d{d // per_dir // 100:04d}", f"d{d // per_dir:06d}")
+            did = db.execute("INSERT INTO dirs (path, mtime_ns) VALUES (?, 0)", (path,)).lastrowid
+            rows = []
+            for i in range(min(per_dir, n - d)):
+                name = (f"{rnd.choice(WORDS)}_{rnd.choice(WORDS)}_{rnd.randrange(1990, 2030)}"
+                        f"_{rnd.randrange(100000):05d}{rnd.choice(EXTS)}")
+                if rnd.random() < 0.1:
+                    name = f"img_{rnd.randrange(10000):04d}.jpg"
+                rows.append((did, name, name.lower(), 0, 0, 0.0))
+            db.executemany(
+                "INSERT INTO entries (dir_id, name, lname, is_dir, size, mtime) VALUES (?,?,?,?,?,?)", rows)
+    return time.perf_counter() - t
+
+
+def main(sizes):
+    base = tempfile.mkdtemp(prefix="bench_search_")
+    try:
+        print(f"{'entries':>10} {'mode':>10} {'query':>16} {'hits':>5} {'ms':>8}")
+        for n in sizes:
+            db_path = os.path.join(base, f"s{n}.sqlite3")
+            idx = SearchIndex(db_path, use_inotify=False)
+            root = idx.add_root(os.path.join(base, "root"))
+            dt = fill(idx, root, n)
+            idx._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            size = idx.stats()["db_bytes"]
+            print(f"{n:>10} {'(fill)':>10} {'':>16} {'':>5} {dt * 1000:>8.0f}   "
+                  f"db {size / 1e6:.1f} MB, {size / n:.0f} B/entry")
+            for mode, q in QUERIES:
+                idx.search(q, mode=mode, limit=100)   # 先热一下页缓存
+                best = None
+                for _ in range(3):
+                    res = idx.search(q, mode=mode, limit=100)
+                    best = res["took_ms"] if best is None else min(best, res["took_ms"])
+                print(f"{n:>10} {mode:>10} {q:>16} {len(res['results']):>5} {best:>8.1f}"
+                      f"{'  (timeout)' if res['timed_out'] else ''}")
+            idx._db.close()
+            os.remove(db_path)
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or [100_000, 1_000_000])
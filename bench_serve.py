@@ -0,0 +1,136 @@
+# bench_serve.py
+"""
+serve.py 压测：/system、/network、/files 三个页面在不同并发下的 req/s 和延迟分位。
+
+    python bench_serve.py                      # 单进程 16 线程 vs 4 worker × 8 线程，每档 5 秒
+    python bench_serve.py 10                   # 每档 10 秒
+    python bench_serve.py 5 1x16 2x8 8x4       # 自定义部署形态：worker 数 x 线程数
+
+worker 是 serve.py 自己起的子进程，没法在本进程里改 config；所以先把代码拷到临时目录，
+在拷贝的 config.py 末尾改 FILE_ROOT / 索引路径，再从那里起 serve.py。
+FILE_ROOT 里放一个 2000 个文件的目录给 /files 用。
+"""
+import http.client
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PATHS = ["/system", "/network", "/files?path=many"]
+CLIENTS = (1, 10, 50)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))] if xs else float("nan")
+
+
+def prepare(tmp):
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = os.path.join(tmp, "app")
+    shutil.copytree(here, code, ignore=shutil.ignore_patterns(
+        ".git", ".index", ".uploads", "__pycache__", "data", "*.jsonl"))
+    root = os.path.join(tmp, "root")
+    os.makedirs(os.path.join(root, "many"))
+    for i in range(2000):
+        with open(os.path.join(root, "many", f"file_{i:05d}.txt"), "w") as f:
+            f.write("x" * i)
+    with open(os.path.join(code, "config.py"), "a", encoding="utf-8") as f:
+        f.write(f"\nFILE_ROOT = {root!r}\n"
+                f"DU_INDEX_PATH = {os.path.join(tmp, 'du.sqlite3')!r}\n"
+                f"SEARCH_INDEX_PATH = {os.path.join(tmp, 'search.sqlite3')!r}\n"
+                f"UPLOAD_STATE_DIR = {os.path.join(tmp, 'uploads')!r}\n"
+                f"SEARCH_INCLUDE_DRIVES = False\n")
+    return code
+
+
+def start(code, port, workers, threads):
+    proc = subprocess.Popen([sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port),
+                             "--workers", str(workers), "--threads", str(threads)],
+                            cwd=code, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/system")
+            conn.getresponse().read()
+            conn.close()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("serve.py 没起来")
+
+
+def load(port, path, clients, seconds):
+    lat = []
+    errors = [0]
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def worker():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        mine = []
+        while time.perf_counter() < stop:
+            t = time.perf_counter()
+            try:
+                conn.request("GET", path)
+                r = conn.getresponse()
+                r.read()
+                if r.status != 200:
+                    raise OSError(r.status)
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                with lock:
+                    errors[0] += 1
+                continue
+            mine.append(time.perf_counter() - t)
+        conn.close()
+        with lock:
+            lat.extend(mine)
+
+    ts = [threading.Thread(target=worker) for _ in range(clients)]
+    t0 = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return lat, time.perf_counter() - t0, errors[0]
+
+
+def main(seconds, shapes):
+    tmp = tempfile.mkdtemp(prefix="bench_serve_")
+    try:
+        code = prepare(tmp)
+        print(f"{'shape':>6} {'path':>16} {'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for workers, threads in shapes:
+            port = _free_port()
+            proc = start(code, port, workers, threads)
+            try:
+                time.sleep(1.0)   # 让采样器先跑满一轮
+                for path in PATHS:
+                    for clients in CLIENTS:
+                        lat, dt, err = load(port, path, clients, seconds)
+                        print(f"{workers}x{threads:<4} {path:>16} {clients:>8} {len(lat) / dt:>8.0f} "
+                              f"{_pct(lat, 0.5) * 1e3:>8.2f} {_pct(lat, 0.99) * 1e3:>8.2f} {err:>7}")
+            finally:
+                proc.terminate()
+                proc.wait(timeout=15)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    secs = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    shapes = [tuple(int(x) for x in s.split("x")) for s in sys.argv[2:]] or [(1, 16), (4, 8)]
+    main(secs, shapes)
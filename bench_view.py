@@ -0,0 +1,83 @@
+# bench_view.py
+"""
+大文件查看基准：建行索引要多久、索引建好后按行号跳转的延迟、进程内存。
+
+    python bench_view.py                 # 造一个 2000 万行（约 1.6 GB）的日志
+    python bench_view.py 50000000        # 行数
+    python bench_view.py 0 /var/log/x    # 直接用已有文件
+
+第一次跳到末尾时按 BUILD_BUDGET 分几次请求扫完，和前端看到的一样。
+"""
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import fileview
+
+
+def make_log(path, n):
+    words = [b"GET", b"POST", b"/api/system", b"/files?path=D:/data", b"200", b"404", b"user=alice", b"took=12ms"]
+    rnd = random.Random(1)
+    with open(path, "wb", buffering=8 * 1024 * 1024) as f:
+        batch = []
+        for i in range(n):
+            batch.append(b"2026-01-01T00:00:%02d line %d %s\n" % (i % 60, i + 1, b" ".join(rnd.sample(words, 4))))
+            if len(batch) == 100_000:
+                f.write(b"".join(batch))
+                batch.clear()
+        f.write(b"".join(batch))
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))]
+
+
+def main(path):
+    size = os.path.getsize(path)
+    print(f"文件 {path}：{size / 1e9:.2f} GB")
+
+    t = time.perf_counter()
+    calls = 0
+    while True:
+        calls += 1
+        info = fileview.view(path, line=10 ** 12, lines=1)
+        if not info["indexing"]:
+            break
+    dt = time.perf_counter() - t
+    print(f"建索引：{dt:.2f} s（{calls} 次请求，{size / dt / 1e6:.0f} MB/s），"
+          f"共 {info['total_lines']} 行，{len(fileview._indexes[next(reversed(fileview._indexes))].marks) * 8 / 1024:.0f} KB 索引")
+
+    total = info["total_lines"]
+    rnd = random.Random(2)
+    for label, kw in (("按行号跳转", lambda: {"line": rnd.randint(1, total)}),
+                      ("按偏移跳转", lambda: {"offset": rnd.randint(0, size - 1)}),
+                      ("末尾 200 行", lambda: {"tail": True})):
+        lat = []
+        for _ in range(200):
+            args = kw()
+            t = time.perf_counter()
+            info = fileview.view(path, lines=200, **args)
+            lat.append(time.perf_counter() - t)
+        print(f"{label}：p50 {_pct(lat, 0.5) * 1e3:.2f} ms  p99 {_pct(lat, 0.99) * 1e3:.2f} ms")
+    print(f"maxrss {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000_000
+    if len(sys.argv) > 2:
+        main(sys.argv[2])
+    else:
+        work = tempfile.mkdtemp(prefix="bench_view_")
+        try:
+            p = os.path.join(work, "big.log")
+            t = time.perf_counter()
+            make_log(p, n)
+            print(f"造 {n} 行：{time.perf_counter() - t:.1f} s")
+            main(p)
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
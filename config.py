@@ -3,3 +3,83 @@ import os
 
 # 你想管理的根目录（建议先用项目下 data 目录）
 FILE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "data"))
+
+# 文件管理器每页显示多少条（大目录分页）
+FILES_PAGE_SIZE = 500
+
+# 后台采样间隔（秒）：CPU/内存按这个频率刷新
+SAMPLE_INTERVAL = 1.0
+# GPU 探测比较贵（Windows 下要起 PowerShell），单独放慢
+GPU_SAMPLE_INTERVAL = 5.0
+# 网卡 / 监听端口刷新间隔
+NETWORK_SAMPLE_INTERVAL = 5.0
+
+# 公网 IP 查询服务（按顺序尝试；调试时可以换成本地的假服务）
+PUBLIC_IP_URLS = ("https://api.ipify.org", "https://ifconfig.me/ip")
+# 成功结果缓存多久（秒）；全部失败时多久后再试
+PUBLIC_IP_TTL = 600
+PUBLIC_IP_NEGATIVE_TTL = 60
+
+# Linux 下监听端口直接读 /proc/net/tcp{,6}（None = 自动，按平台决定）
+LISTENERS_USE_PROCFS = None
+
+# 目录列表缓存最多保存多少个条目（所有目录加起来）
+DIR_CACHE_MAX_ENTRIES = 200_000
+
+# 分块上传：状态文件目录、建议的分块大小、多少小时没有新分块就当作放弃（清掉 .part，0 不清）
+UPLOAD_STATE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".uploads"))
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_TTL_HOURS = 72
+
+# 批量复制 / 移动 / 删除任务：状态文件目录、同时跑几个任务、一个复制任务里并行复制几个文件
+JOB_STATE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".jobs"))
+JOB_WORKERS = 2
+JOB_COPY_THREADS = 8
+
+# 目录打包下载（zip / tar.gz）：压缩级别 0-9（0 = 只打包不压缩），并行压缩线程数（1 = 不并行）
+ARCHIVE_LEVEL = 6
+ARCHIVE_WORKERS = 4
+
+# 目录大小索引（SQLite），定时增量重扫间隔（秒）和并行线程数
+# 增量重扫只看目录 mtime，文件原地变大发现不了；每 DU_RESTAT_EVERY 轮全量 stat 一次（默认约每小时）
+DU_INDEX_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), ".index", "du.sqlite3"))
+DU_RESCAN_INTERVAL = 600
+DU_RESTAT_EVERY = 6
+DU_WORKERS = 8
+
+# 文件名搜索索引（SQLite FTS5 trigram）；盘符也一起建索引（只在 Windows 上有）
+SEARCH_INDEX_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), ".index", "search.sqlite3"))
+SEARCH_INCLUDE_DRIVES = True
+SEARCH_RESCAN_INTERVAL = 3600
+SEARCH_WORKERS = 8
+
+# 重复文件查找：哈希缓存库、算哈希的子进程数（<= 0 用线程池）、默认忽略多小的文件（字节）
+DUP_CACHE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), ".index", "hashes.sqlite3"))
+DUP_PROCESSES = 4
+DUP_MIN_SIZE = 1
+
+# 历史指标磁盘归档（None 关闭）：原值保留小时数、1 分钟汇总保留天数、目录大小上限（MB）、攒几秒写一次盘
+METRICS_ARCHIVE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".metrics"))
+METRICS_ARCHIVE_RAW_HOURS = 48
+METRICS_ARCHIVE_DAYS = 90
+METRICS_ARCHIVE_MAX_MB = 1024
+METRICS_ARCHIVE_FLUSH = 10.0
+
+# 常驻 PowerShell 进程池：进程数、单次查询超时（秒）、空闲多久关掉
+PS_WORKERS = 2
+PS_TIMEOUT = 5.0
+PS_IDLE_TIMEOUT = 600
+
+# 服务进程（python serve.py）：监听地址、worker 进程数、每个进程的线程数
+# 多于 1 个 worker 只在 Linux / macOS 上生效：主进程采集一份快照放共享内存，worker 只读
+SERVE_HOST = "0.0.0.0"
+SERVE_PORT = 8000
+SERVE_WORKERS = 1
+SERVE_THREADS = 16
+# 每个进程同时开着的 SSE 连接（实时面板 / tail -f）上限，超出返回 503；None = 线程数的一半
+# 每条 SSE 一直占一个线程，上限要小于 SERVE_THREADS，否则开满页面后普通请求全部排队
+SERVE_MAX_STREAMS = None
+# 共享快照区大小（字节）；监听端口 / 网卡特别多时调大
+SHARED_SNAPSHOT_BYTES = 4 * 1024 * 1024
+# python app.py 开发服务器是否开调试器和自动重载（调试器能执行任意代码，别对外开）
+DEBUG = False
@@ -0,0 +1,200 @@
+# dircache.py
+"""
+目录列表的 LRU 缓存，按解析后的绝对路径做键，总条目数有上限。
+
+失效策略：
+- Linux：每个缓存的目录挂一个 inotify 监视，事件只记下“哪个名字脏了”，
+  下次读的时候逐个补 stat，不用整目录重列；
+- 其它平台 / inotify 加不上：读的时候比较目录 mtime，变了就作废。
+
+写操作（新建 / 重命名 / 删除 / 上传）直接调 upsert / remove 原地改缓存。
+"""
+import bisect
+import os
+import threading
+from collections import OrderedDict
+
+import fswatch
+
+# 单个目录的脏名字攒太多就直接作废，重列更划算
+_MAX_DIRTY = 1024
+
+
+class _Listing:
+    __slots__ = ("items", "keys", "mtime_ns", "watched", "dirty", "stale")
+
+    def __init__(self, items, keys, mtime_ns, watched):
+        self.items = items
+        self.keys = keys
+        self.mtime_ns = mtime_ns
+        self.watched = watched
+        self.dirty = set()
+        self.stale = False
+
+
+class DirCache:
+    def __init__(self, key, load_item, max_entries=200_000, use_inotify=True):
+        """
+        key(item)              → 排序键（列表按它升序）
+        load_item(dir, name)   → 单个条目的行 dict；条目已不存在时返回 None
+        """
+        self.key = key
+        self.load_item = load_item
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # path -> _Listing，尾部是最近用过的
+        self._total = 0
+        self._lock = threading.RLock()
+        self._watcher = fswatch.Watcher(self._on_event) if use_inotify else None
+        self.hits = 0
+        self.misses = 0
+
+    # ---- inotify 回调（后台线程） ----
+    def _on_event(self, path, name, mask):
+        with self._lock:
+            if path is None:   # 队列溢出，不知道丢了什么
+                self.clear()
+                return
+            ent = self._entries.get(path)
+            if ent is None:
+                return
+            if mask & fswatch.GONE_MASK or name is None:
+                ent.stale = True
+                return
+            ent.dirty.add(name)
+            if len(ent.dirty) > _MAX_DIRTY:
+                ent.stale = True
+
+    # ---- 读 ----
+    def get(self, path):
+        """命中返回排好序的条目列表（调用方不要改它），否则 None。"""
+        with self._lock:
+            ent = self._entries.get(path)
+            if ent is None:
+                self.misses += 1
+                return None
+            if not ent.watched:
+                try:
+                    mtime_ns = os.stat(path).st_mtime_ns
+                except OSError:
+                    mtime_ns = None
+                if mtime_ns != ent.mtime_ns:
+                    ent.stale = True
+            if ent.stale:
+                self._drop(path)
+                self.misses += 1
+                return None
+            if ent.dirty:
+                names, ent.dirty = ent.dirty, set()
+                for name in names:
+                    self._apply(path, ent, name)
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return ent.items
+
+    # ---- 写 ----
+    def put(self, path, items, mtime_ns):
+        """
+        items 必须已按 key 排好序；mtime_ns 是开始列目录之前拿到的目录 mtime，
+        列的过程中目录被改过就不缓存（下次重列）。
+        """
+        n = len(items)
+        if n > self.max_entries // 4:
+            return False   # 单个超大目录不进缓存，免得把别的全挤掉
+        with self._lock:
+            self._drop(path)
+            watched = self._inotify() and self._watcher.watch(path)
+            try:
+                if os.stat(path).st_mtime_ns != mtime_ns:
+                    if watched:
+                        self._watcher.unwatch(path)
+                    return False
+            except OSError:
+                return False
+            self._entries[path] = _Listing(list(items), [self.key(it) for it in items], mtime_ns, watched)
+            self._total += n
+            while self._total > self.max_entries and len(self._entries) > 1:
+                old = next(iter(self._entries))
+                self._drop(old)
+            return True
+
+    def upsert(self, path, name):
+        """目录 path 里的 name 新建 / 变了：只补这一条。"""
+        with self._lock:
+            ent = self._entries.get(path)
+            if ent is None:
+                return
+            self._apply(path, ent, name)
+            self._touch_mtime(path, ent)
+
+    def remove(self, path, name):
+        with self._lock:
+            ent = self._entries.get(path)
+            if ent is None:
+                return
+            self._remove_name(ent, name)
+            self._touch_mtime(path, ent)
+
+    def invalidate(self, path, recursive=False):
+        with self._lock:
+            self._drop(path)
+            if recursive:
+                prefix = path.rstrip(os.sep) + os.sep
+                for p in [p for p in self._entries if p.startswith(prefix)]:
+                    self._drop(p)
+
+    def clear(self):
+        with self._lock:
+            for p in list(self._entries):
+                self._drop(p)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "dirs": len(self._entries),
+                "entries": self._total,
+                "max_entries": self.max_entries,
+                "watches": len(self._watcher) if self._inotify() else 0,
+                "inotify": self._inotify(),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    # ---- 内部 ----
+    def _inotify(self):
+        return self._watcher is not None and self._watcher.available
+
+    def _drop(self, path):
+        ent = self._entries.pop(path, None)
+        if ent is None:
+            return
+        self._total -= len(ent.items)
+        if ent.watched:
+            self._watcher.unwatch(path)
+
+    def _touch_mtime(self, path, ent):
+        if ent.watched:
+            return
+        try:
+            ent.mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            ent.stale = True
+
+    def _remove_name(self, ent, name):
+        for is_dir in (True, False):
+            k = self.key({"name": name, "is_dir": is_dir})
+            i = bisect.bisect_left(ent.keys, k)
+            if i < len(ent.keys) and ent.keys[i] == k:
+                del ent.keys[i]
+                del ent.items[i]
+                self._total -= 1
+
+    def _apply(self, path, ent, name):
+        self._remove_name(ent, name)
+        item = self.load_item(path, name)
+        if item is None:
+            return
+        k = self.key(item)
+        i = bisect.bisect_left(ent.keys, k)
+        ent.keys.insert(i, k)
+        ent.items.insert(i, item)
+        self._total += 1
@@ -0,0 +1,207 @@
+# downloads.py
+"""
+文件下载响应：Range / 206（含多段 multipart/byteranges）、强 ETag、
+If-None-Match / If-Modified-Since / If-Range 条件请求。
+
+整文件和读到文件末尾的单段请求（断点续传）通过 wsgi.file_wrapper 返回，
+文件指针先 seek 到起点，gunicorn 之类支持 sendfile 的服务器会走零拷贝；
+其它情况按块读。
+
+目录下载（send_archive）边遍历边打包，没有 Content-Length / Range，见 archives.py。
+"""
+import mimetypes
+import os
+import uuid
+from urllib.parse import quote
+
+from flask import Response
+from werkzeug.http import http_date, parse_date, quote_etag, parse_etags, parse_range_header
+
+import archives
+
+CHUNK = 256 * 1024
+# 多段请求最多接受几段，太碎的直接按整文件回
+MAX_RANGES = 16
+
+
+def make_etag(st) -> str:
+    """强 ETag：inode + 大小 + 纳秒 mtime，任何一个变了都算新版本。"""
+    return f"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"
+
+
+def _content_disposition(name):
+    try:
+        name.encode("latin-1")
+        return f'attachment; filename="{name}"'
+    except UnicodeEncodeError:
+        fallback = name.encode("ascii", "ignore").decode() or "download"
+        return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(name)}"
+
+
+def _not_modified(req, etag, mtime):
+    inm = req.headers.get("If-None-Match")
+    if inm:
+        return parse_etags(inm).contains_weak(etag)   # 弱比较：If-None-Match 允许 W/
+    ims = parse_date(req.headers.get("If-Modified-Since"))
+    if ims is not None:
+        return int(mtime) <= int(ims.timestamp())
+    return False
+
+
+def _if_range_ok(req, etag, mtime):
+    """If-Range 不匹配时忽略 Range，回整文件。"""
+    val = req.headers.get("If-Range")
+    if not val:
+        return True
+    val = val.strip()
+    if val.startswith('"') or val.startswith("W/"):
+        # If-Range 必须强比较
+        return not val.startswith("W/") and val == quote_etag(etag)
+    d = parse_date(val)
+    return d is not None and int(mtime) == int(d.timestamp())
+
+
+def _resolve_ranges(header, size):
+    """
+    返回：
+      None        → 没有 / 忽略 Range，回整文件
+      []          → 不可满足（416）
+      [(s, e)...] → 半开区间，已排序合并
+    """
+    rng = parse_range_header(header)
+    if rng is None or rng.units != "bytes" or len(rng.ranges) > MAX_RANGES:
+        return None
+    out = []
+    for start, stop in rng.ranges:
+        if start < 0:   # 后缀：最后 N 字节
+            start = max(0, size + start)
+            stop = size
+        else:
+            stop = size if stop is None else min(stop, size)
+        if start < stop:
+            out.append((start, stop))
+    out.sort()
+    merged = []
+    for s, e in out:
+        if merged and s <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+        else:
+            merged.append((s, e))
+    return merged
+
+
+def _read_span(f, start, length):
+    f.seek(start)
+    left = length
+    while left > 0:
+        buf = f.read(min(CHUNK, left))
+        if not buf:
+            break
+        left -= len(buf)
+        yield buf
+
+
+def _file_body(environ, f, start, length, size):
+    f.seek(start)
+    wrapper = environ.get("wsgi.file_wrapper")
+    # 只在一直读到文件末尾时交给 file_wrapper：不是所有服务器都按
+    # Content-Length 截断，中间段走 file_wrapper 可能多发数据。
+    # 断点续传（bytes=N-）和整文件都满足这个条件。
+    if wrapper is not None and start + length == size:
+        return wrapper(f, CHUNK)
+
+    def gen():
+        try:
+            yield from _read_span(f, start, length)
+        finally:
+            f.close()
+    return gen()
+
+
+def send_download(req, path, download_name=None):
+    """req 是 flask.request；path 必须已经过 _safe_join 校验并确认是文件。"""
+    path = os.fspath(path)
+    f = open(path, "rb")
+    try:
+        st = os.fstat(f.fileno())
+    except OSError:
+        f.close()
+        raise
+    size = st.st_size
+    etag = make_etag(st)
+    ctype = mimetypes.guess_type(download_name or path)[0] or "application/octet-stream"
+
+    headers = {
+        "ETag": quote_etag(etag),
+        "Last-Modified": http_date(st.st_mtime),
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": _content_disposition(download_name or os.path.basename(path)),
+    }
+
+    if _not_modified(req, etag, st.st_mtime):
+        f.close()
+        return Response(status=304, headers=headers)
+
+    ranges = None
+    if req.headers.get("Range") and _if_range_ok(req, etag, st.st_mtime):
+        ranges = _resolve_ranges(req.headers["Range"], size)
+
+    if ranges == []:
+        f.close()
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status=416, headers=headers)
+
+    if not ranges:
+        headers["Content-Length"] = str(size)
+        body = _file_body(req.environ, f, 0, size, size)
+        return Response(body, status=200, headers=headers, mimetype=ctype, direct_passthrough=True)
+
+    if len(ranges) == 1:
+        s, e = ranges[0]
+        headers["Content-Range"] = f"bytes {s}-{e - 1}/{size}"
+        headers["Content-Length"] = str(e - s)
+        body = _file_body(req.environ, f, s, e - s, size)
+        return Response(body, status=206, headers=headers, mimetype=ctype, direct_passthrough=True)
+
+    # 多段：multipart/byteranges，每段前面带一个小头
+    boundary = uuid.uuid4().hex
+    parts = []
+    total = 0
+    for s, e in ranges:
+        head = (f"\r\n--{boundary}\r\nContent-Type: {ctype}\r\n"
+                f"Content-Range: bytes {s}-{e - 1}/{size}\r\n\r\n").encode()
+        parts.append((head, s, e))
+        total += len(head) + (e - s)
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    total += len(tail)
+
+    def gen():
+        try:
+            for head, s, e in parts:
+                yield head
+                yield from _read_span(f, s, e - s)
+            yield tail
+        finally:
+            f.close()
+
+    headers["Content-Length"] = str(total)
+    return Response(gen(), status=206, headers=headers,
+                    content_type=f"multipart/byteranges; boundary={boundary}",
+                    direct_passthrough=True)
+
+
+def send_archive(path, fmt="zip", level=6, workers=1):
+    """path 必须已经过 _safe_join 校验并确认是目录；fmt 不支持时抛 ValueError。"""
+    if fmt not in archives.FORMATS:
+        raise ValueError(f"不支持的格式：{fmt}")
+    path = os.fspath(path)
+    ctype, ext = archives.FORMATS[fmt]
+    name = os.path.basename(path.rstrip("/\\")) or "root"
+    headers = {
+        "Content-Disposition": _content_disposition(name + ext),
+        "Cache-Control": "no-store",
+        # 反向代理别攒着，边打包边往外发
+        "X-Accel-Buffering": "no",
+    }
+    body = archives.stream(fmt, path, name, level=level, workers=workers)
+    return Response(body, status=200, headers=headers, mimetype=ctype, direct_passthrough=True)
@@ -0,0 +1,338 @@
+# duindex.py
+"""
+目录大小索引（类似 du），持久化在 SQLite 里。
+
+每个目录存一行：自身直接包含的文件（字节 / 个数 / 最新 mtime）+ 整个子树的汇总。
+重扫时目录 mtime 没变就直接复用上次的“自身”数据和子目录列表，只 stat 一次，
+不 scandir；mtime 变了的目录才重新读。同一层的目录丢进线程池并行处理。
+
+注意：目录 mtime 只在增删改名时变化，文件原地变大（日志、数据库文件）不会改目录 mtime。
+所以：每次扫描的起点目录本身总是重新 stat 一遍文件（写操作会 request_scan 对应目录）；
+定时重扫每 restat_every 轮（以及启动后的第一轮）做一次全量，所有目录都重新 stat 文件。
+
+多进程部署时 worker 用 remote=True 打开：不自己扫，扫描请求写进 requests 表，
+由主进程（start() 过的那个）轮询取走。
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path        TEXT PRIMARY KEY,
+    parent      TEXT,
+    mtime_ns    INTEGER,
+    own_bytes   INTEGER,
+    own_files   INTEGER,
+    own_newest  REAL,
+    bytes       INTEGER,
+    files       INTEGER,
+    newest      REAL,
+    scanned     REAL
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+CREATE TABLE IF NOT EXISTS requests (
+    path        TEXT PRIMARY KEY,
+    at          REAL
+);
+"""
+
+_COLS = "path, parent, mtime_ns, own_bytes, own_files, own_newest, bytes, files, newest, scanned"
+
+
+def _subtree_bounds(path):
+    # path/ 开头的所有键：[path + sep, path + chr(sep+1)) —— 能用上主键索引
+    sep = os.sep
+    return path.rstrip(sep) + sep, path.rstrip(sep) + chr(ord(sep) + 1)
+
+
+class _Visit:
+    __slots__ = ("mtime_ns", "own_bytes", "own_files", "own_newest", "subdirs", "rescanned")
+
+    def __init__(self, mtime_ns, own_bytes, own_files, own_newest, subdirs, rescanned):
+        self.mtime_ns = mtime_ns
+        self.own_bytes = own_bytes
+        self.own_files = own_files
+        self.own_newest = own_newest
+        self.subdirs = subdirs
+        self.rescanned = rescanned
+
+
+class DuIndex:
+    def __init__(self, db_path, workers=8, remote=False):
+        self.db_path = db_path
+        self.workers = workers
+        self.remote = remote
+        d = os.path.dirname(db_path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._restat = set()   # 排队中、要全量 stat 的路径
+        self._current = None
+        self._thread = None
+        self.last_scan = {}   # root -> {"dirs", "rescanned", "seconds", "at"}
+
+    # ---- 查询 ----
+    def _row(self, path):
+        with self._lock:
+            cur = self._db.execute(f"SELECT {_COLS} FROM dirs WHERE path = ?", (path,))
+            r = cur.fetchone()
+        return dict(zip(_COLS.split(", "), r)) if r else None
+
+    def lookup(self, path):
+        """
+        {"path", "bytes", "files", "newest", "own_bytes", "own_files", "scanned",
+         "children": [{"name", "path", "bytes", "files", "newest"}]}；没建索引返回 None
+        """
+        path = os.path.abspath(path)
+        row = self._row(path)
+        if row is None:
+            return None
+        with self._lock:
+            kids = self._db.execute(
+                "SELECT path, bytes, files, newest FROM dirs WHERE parent = ? ORDER BY bytes DESC",
+                (path,)).fetchall()
+        row["children"] = [{
+            "name": os.path.basename(p),
+            "path": p,
+            "bytes": b,
+            "files": f,
+            "newest": n,
+        } for p, b, f, n in kids]
+        row["scanning"] = self.is_scanning(path)
+        return row
+
+    def child_sizes(self, path):
+        """{子目录名: 字节数}，给文件列表补目录大小用；一条查询。"""
+        with self._lock:
+            rows = self._db.execute("SELECT path, bytes FROM dirs WHERE parent = ?",
+                                    (os.path.abspath(path),)).fetchall()
+        return {os.path.basename(p): b for p, b in rows}
+
+    # ---- 扫描 ----
+    def _visit(self, path, dev, known, known_children, restat=False):
+        try:
+            st = os.stat(path, follow_symlinks=False)
+        except OSError:
+            return None
+        if st.st_dev != dev:
+            return None   # 不跨文件系统（和 du -x 一样）
+        old = known.get(path)
+        if not restat and old is not None and old[0] == st.st_mtime_ns:
+            return _Visit(st.st_mtime_ns, old[1], old[2], old[3], known_children.get(path, []), False)
+
+        own_bytes = 0
+        own_files = 0
+        own_newest = st.st_mtime
+        subdirs = []
+        try:
+            with os.scandir(path) as it:
+                for e in it:
+                    try:
+                        if e.is_dir(follow_symlinks=False):
+                            subdirs.append(e.path)
+                            continue
+                        est = e.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    own_files += 1
+                    own_bytes += est.st_size
+                    if est.st_mtime > own_newest:
+                        own_newest = est.st_mtime
+        except OSError:
+            pass
+        # 全量 stat 时大部分目录其实没变，不标 rescanned 就不用重写那一行
+        changed = old is None or old != (st.st_mtime_ns, own_bytes, own_files, own_newest)
+        return _Visit(st.st_mtime_ns, own_bytes, own_files, own_newest, subdirs, changed)
+
+    def scan(self, root, restat=False):
+        """
+        增量扫描 root 整棵子树，并把大小变化补到已索引的祖先目录上。
+        root 自己总是重读；restat=True 时子树里 mtime 没变的目录也重新 stat 文件。
+        """
+        t0 = time.time()
+        root = os.path.abspath(root)
+        try:
+            dev = os.stat(root).st_dev
+        except OSError:
+            return None
+        lo, hi = _subtree_bounds(root)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path, parent, mtime_ns, own_bytes, own_files, own_newest, bytes, files "
+                "FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (root, lo, hi)).fetchall()
+        known = {}
+        known_children = {}
+        old_totals = {}
+        for p, parent, m, ob, of, on, b, f in rows:
+            known[p] = (m, ob, of, on)
+            old_totals[p] = (b, f)
+            known_children.setdefault(parent, []).append(p)
+
+        order = []
+        visits = {}
+        level = [root]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while level:
+                nxt = []
+                for p, v in zip(level, pool.map(
+                        lambda q: self._visit(q, dev, known, known_children, restat or q == root), level)):
+                    if v is None:
+                        continue
+                    visits[p] = v
+                    order.append(p)
+                    nxt.extend(v.subdirs)
+                level = nxt
+
+        # 自底向上汇总
+        totals = {}
+        for p in reversed(order):
+            v = visits[p]
+            b, f, n = v.own_bytes, v.own_files, v.own_newest
+            for c in v.subdirs:
+                t = totals.get(c)
+                if t:
+                    b += t[0]
+                    f += t[1]
+                    n = max(n, t[2])
+            totals[p] = (b, f, n)
+
+        now = time.time()
+        upserts = []
+        for p in order:
+            v = visits[p]
+            b, f, n = totals[p]
+            if not v.rescanned and old_totals.get(p) == (b, f):
+                continue
+            upserts.append((p, os.path.dirname(p), v.mtime_ns, v.own_bytes, v.own_files, v.own_newest, b, f, n, now))
+        gone = [p for p in known if p not in visits]
+
+        old_root = old_totals.get(root, (0, 0))
+        new_root = totals.get(root, (0, 0, 0))
+        d_bytes = new_root[0] - old_root[0]
+        d_files = new_root[1] - old_root[1]
+
+        with self._lock, self._db:
+            self._db.executemany(f"INSERT OR REPLACE INTO dirs ({_COLS}) VALUES (?,?,?,?,?,?,?,?,?,?)", upserts)
+            for p in gone:
+                lo2, hi2 = _subtree_bounds(p)
+                self._db.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (p, lo2, hi2))
+            # 祖先目录的汇总跟着变
+            if d_bytes or d_files:
+                anc = os.path.dirname(root)
+                while True:
+                    cur = self._db.execute(
+                        "UPDATE dirs SET bytes = bytes + ?, files = files + ?, newest = MAX(newest, ?) "
+                        "WHERE path = ?", (d_bytes, d_files, new_root[2], anc))
+                    if cur.rowcount == 0:
+                        break
+                    parent = os.path.dirname(anc)
+                    if parent == anc:
+                        break
+                    anc = parent
+
+        info = {"dirs": len(order), "rescanned": sum(1 for v in visits.values() if v.rescanned),
+                "seconds": round(time.time() - t0, 3), "at": now}
+        self.last_scan[root] = info
+        return info
+
+    # ---- 后台 ----
+    def request_scan(self, path, restat=False):
+        """排队扫描（去重）；已经在队列里的不会重复排，但 restat 会升级上去。"""
+        path = os.path.abspath(path)
+        if self.remote:
+            with self._lock, self._db:
+                cur = self._db.execute("INSERT OR REPLACE INTO requests (path, at) VALUES (?, ?)",
+                                       (path, time.time()))
+            return cur.rowcount > 0
+        with self._lock:
+            if restat:
+                self._restat.add(path)
+            if path in self._pending:
+                return False
+            self._pending.add(path)
+        self._queue.put(path)
+        self._ensure_thread()
+        return True
+
+    def touch(self, path):
+        """写操作之后调用：目录已经在索引里才排队重扫，没索引过的不管。"""
+        path = os.path.abspath(path)
+        if self._row(path) is not None:
+            self.request_scan(path)
+
+    def is_scanning(self, path):
+        with self._lock:
+            if self.remote:
+                return self._db.execute("SELECT 1 FROM requests WHERE path = ?", (path,)).fetchone() is not None
+            return path in self._pending or path == self._current
+
+    def _ensure_thread(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._loop, name="du-index", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while True:
+            path = self._queue.get()
+            with self._lock:
+                self._pending.discard(path)
+                restat = path in self._restat
+                self._restat.discard(path)
+                self._current = path
+            started = time.time()
+            try:
+                self.scan(path, restat=restat)
+            except Exception:
+                pass
+            finally:
+                with self._lock, self._db:
+                    self._current = None
+                    # 扫描开始之后才来的请求留着，下一轮再扫
+                    self._db.execute("DELETE FROM requests WHERE path = ? AND at <= ?", (path, started))
+
+    def _poll_requests(self):
+        """主进程：把 worker 写进 requests 表的扫描请求排进本地队列。"""
+        with self._lock:
+            paths = [r[0] for r in self._db.execute("SELECT path FROM requests")]
+            busy = self._pending | {self._current}
+        for p in paths:
+            if p not in busy:
+                self.request_scan(p)
+
+    def start(self, roots, interval=600, poll=1.0, restat_every=6):
+        """
+        定时把 roots 重新排进队列；mtime 没变的目录几乎不花时间。
+        第一轮和之后每 restat_every 轮全量 stat，补上原地变大的文件（0 = 只在第一轮）。
+        每 poll 秒取一次 worker 的请求。
+        """
+        roots = [r for r in roots if r and os.path.isdir(r)]
+
+        def tick():
+            n = 0
+            while True:
+                restat = n == 0 or bool(restat_every and n % restat_every == 0)
+                for r in roots:
+                    self.request_scan(r, restat=restat)
+                n += 1
+                time.sleep(interval)
+
+        def poll_loop():
+            while True:
+                try:
+                    self._poll_requests()
+                except sqlite3.Error:
+                    pass
+                time.sleep(poll)
+
+        threading.Thread(target=tick, name="du-index-timer", daemon=True).start()
+        threading.Thread(target=poll_loop, name="du-index-requests", daemon=True).start()
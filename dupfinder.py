@@ -0,0 +1,460 @@
+# dupfinder.py
+"""
+重复文件查找，内容哈希持久化缓存在 SQLite 里。
+
+逐轮缩小候选：
+1. 大小：遍历目录只 stat，大小不同的不可能重复；同一个 inode（硬链接）只算一份；
+2. 局部哈希：头 64 KiB + 尾 64 KiB，大小碰巧相同的文件绝大多数在这一步就分开了；
+   不超过 128 KiB 的文件这一步读的就是整个文件，局部哈希即整文件哈希；
+3. 整文件哈希：mmap 之后分段喂给 BLAKE2b。
+
+哈希在进程池里算（processes <= 0 时退回线程池：hashlib 算大块数据时会放开 GIL；
+线程池模式不用 mmap，文件被截断时 SIGBUS 会带走整个服务进程）。
+结果按 (设备, inode) 缓存，大小和纳秒 mtime 都没变才复用；
+没什么变化的目录第二次扫描基本只剩遍历目录的开销，连进程池都不用起。
+
+扫描在后台线程里跑，进度和结果写进同一个库的 scans 表，多 worker 部署时哪个进程都能查；
+取消也是往表里写标记，扫描线程每隔一会儿看一眼。
+"""
+import hashlib
+import json
+import mmap
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+PARTIAL = 64 * 1024
+MMAP_STEP = 8 * 1024 * 1024
+BATCH_FILES = 64                # 一次丢给子进程的文件数上限（小文件攒批，省 IPC）
+BATCH_BYTES = 256 * 1024 * 1024
+_SAVE_EVERY = 0.5               # 进度落库 / 检查取消标记的间隔（秒）
+_STALE_AFTER = 30               # running 状态这么久没更新，认为扫描它的进程已经没了
+_MAX_GROUPS = 5000              # 结果里最多保留多少组（按浪费空间排序）
+_MAX_ERRORS = 50
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    dev      INTEGER,
+    ino      INTEGER,
+    size     INTEGER,
+    mtime_ns INTEGER,
+    partial  BLOB,
+    full     BLOB,
+    PRIMARY KEY (dev, ino)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS scans (
+    root    TEXT PRIMARY KEY,
+    state   TEXT,
+    cancel  INTEGER DEFAULT 0,
+    updated REAL,
+    info    TEXT,
+    groups  TEXT
+);
+"""
+
+
+class Cancelled(Exception):
+    pass
+
+
+# ========= 哈希（在子进程里跑，必须是模块级函数） =========
+def _digest_partial(path, size, use_mmap):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        if size <= 2 * PARTIAL:
+            h.update(f.read(size))
+        else:
+            h.update(f.read(PARTIAL))
+            f.seek(size - PARTIAL)
+            h.update(f.read(PARTIAL))
+        st = os.fstat(f.fileno())
+    return h.digest(), st.st_size, st.st_mtime_ns
+
+
+def _digest_full(path, size, use_mmap):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        m = None
+        if use_mmap:
+            try:
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):   # 不支持 mmap 的文件系统之类
+                m = None
+        if m is None:
+            while True:
+                buf = f.read(MMAP_STEP)
+                if not buf:
+                    break
+                h.update(buf)
+        else:
+            with m:
+                if hasattr(m, "madvise"):
+                    m.madvise(mmap.MADV_SEQUENTIAL)
+                with memoryview(m) as mv:
+                    for i in range(0, len(mv), MMAP_STEP):
+                        h.update(mv[i:i + MMAP_STEP])
+        st = os.fstat(f.fileno())
+    return h.digest(), st.st_size, st.st_mtime_ns
+
+
+def _hash_batch(items, full, use_mmap):
+    """items: [(path, size)]；逐个返回 (digest, size, mtime_ns)，失败的返回错误信息字符串。"""
+    fn = _digest_full if full else _digest_partial
+    out = []
+    for path, size in items:
+        try:
+            out.append(fn(path, size, use_mmap))
+        except OSError as e:
+            out.append(f"{e.strerror or e}")
+    return out
+
+
+# ========= 扫描 =========
+class _File:
+    __slots__ = ("size", "dev", "ino", "mtime_ns", "paths", "partial", "full")
+
+    def __init__(self, size, dev, ino, mtime_ns, path):
+        self.size = size
+        self.dev = dev
+        self.ino = ino
+        self.mtime_ns = mtime_ns
+        self.paths = [path]
+        self.partial = None
+        self.full = None
+
+
+class _Scan:
+    def __init__(self, finder, root, top, min_size):
+        self.finder = finder
+        self.root = root
+        self.top = top
+        self.min_size = min_size
+        self.prefix_len = len(os.path.join(top, ""))
+        self.db = None
+        self.pool = None
+        self.last_save = 0.0
+        self.info = {
+            "root": root, "state": "running", "phase": "walk", "min_size": min_size,
+            "started": time.time(), "finished": None, "seconds": 0.0,
+            "files": 0, "bytes": 0, "candidates": 0, "hashed_files": 0, "hashed_bytes": 0,
+            "cache_hits": 0, "changed": 0, "error_count": 0, "errors": [],
+            "groups": 0, "wasted_bytes": 0, "message": "",
+        }
+
+    # ---- 进度 / 取消 ----
+    def tick(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_save < _SAVE_EVERY:
+            return
+        self.last_save = now
+        self.info["seconds"] = round(time.time() - self.info["started"], 2)
+        self.db.execute("UPDATE scans SET info = ?, updated = ? WHERE root = ?",
+                        (json.dumps(self.info, ensure_ascii=False), time.time(), self.root))
+        self.db.commit()
+        if self.info["state"] == "running":
+            row = self.db.execute("SELECT cancel FROM scans WHERE root = ?", (self.root,)).fetchone()
+            if row and row[0]:
+                raise Cancelled()
+
+    def error(self, path, msg):
+        self.info["error_count"] += 1
+        if len(self.info["errors"]) < _MAX_ERRORS:
+            self.info["errors"].append(f"{self._rel(path)}: {msg}")
+
+    def _rel(self, path):
+        sub = path[self.prefix_len:].replace(os.sep, "/")
+        return f"{self.root}/{sub}" if sub else self.root
+
+    # ---- 第 1 轮：按大小分组 ----
+    def walk(self):
+        """返回大小相同的候选文件组 [[_File, ...], ...]。"""
+        top_dev = os.stat(self.top).st_dev
+        by_size = {}   # size -> 第一个 _File，出现第二个时变成 {(dev, ino): _File}
+        stack = [self.top]
+        n = 0
+        while stack:
+            d = stack.pop()
+            try:
+                it = os.scandir(d)
+            except OSError as e:
+                self.error(d, e.strerror or e)
+                continue
+            with it:
+                for e in it:
+                    try:
+                        if e.is_dir(follow_symlinks=False):
+                            stack.append(e.path)
+                            continue
+                        if not e.is_file(follow_symlinks=False):
+                            continue
+                        st = e.stat(follow_symlinks=False)
+                        ino = e.inode()
+                    except OSError as err:
+                        self.error(e.path, err.strerror or err)
+                        continue
+                    n += 1
+                    if n % 2000 == 0:
+                        self.info["files"] = n
+                        self.tick()
+                    size = st.st_size
+                    self.info["bytes"] += size
+                    if size < self.min_size:
+                        continue
+                    # Windows 上 DirEntry.stat() 的 st_dev 恒为 0，用扫描根所在的卷
+                    dev = st.st_dev or top_dev
+                    cur = by_size.get(size)
+                    if cur is None:
+                        by_size[size] = _File(size, dev, ino, st.st_mtime_ns, e.path)
+                        continue
+                    if isinstance(cur, _File):
+                        cur = by_size[size] = {(cur.dev, cur.ino): cur}
+                    f = cur.get((dev, ino))
+                    if f is not None:
+                        f.paths.append(e.path)   # 硬链接：同一份数据，不算重复
+                    else:
+                        cur[(dev, ino)] = _File(size, dev, ino, st.st_mtime_ns, e.path)
+        self.info["files"] = n
+        return [list(b.values()) for b in by_size.values() if isinstance(b, dict) and len(b) > 1]
+
+    # ---- 缓存 ----
+    def load_cache(self, files):
+        self.db.execute("CREATE TEMP TABLE IF NOT EXISTS want (dev INTEGER, ino INTEGER, "
+                        "PRIMARY KEY (dev, ino)) WITHOUT ROWID")
+        self.db.execute("DELETE FROM want")
+        self.db.executemany("INSERT OR IGNORE INTO want VALUES (?, ?)", ((f.dev, f.ino) for f in files))
+        cached = {}
+        for dev, ino, size, mtime_ns, partial, full in self.db.execute(
+                "SELECT h.dev, h.ino, h.size, h.mtime_ns, h.partial, h.full "
+                "FROM want w JOIN hashes h ON h.dev = w.dev AND h.ino = w.ino"):
+            cached[(dev, ino)] = (size, mtime_ns, partial, full)
+        self.db.execute("DELETE FROM want")
+        for f in files:
+            c = cached.get((f.dev, f.ino))
+            if c and c[0] == f.size and c[1] == f.mtime_ns:
+                f.partial, f.full = c[2], c[3]
+
+    # ---- 第 2 / 3 轮：哈希 ----
+    def _batches(self, files, full):
+        batch, nbytes = [], 0
+        for f in files:
+            batch.append(f)
+            nbytes += f.size if full else min(f.size, 2 * PARTIAL)
+            if len(batch) >= BATCH_FILES or nbytes >= BATCH_BYTES:
+                yield batch
+                batch, nbytes = [], 0
+        if batch:
+            yield batch
+
+    def _new_pool(self):
+        n = self.finder.processes
+        if n > 0:
+            return ProcessPoolExecutor(max_workers=n, mp_context=multiprocessing.get_context("spawn"))
+        return ThreadPoolExecutor(max_workers=max(1, os.cpu_count() or 1), thread_name_prefix="dup-hash")
+
+    def hash_files(self, files, full):
+        """算 files 里还没有对应哈希的那些；结果写回 _File 和缓存。"""
+        todo = []
+        for f in files:
+            if (f.full if full else f.partial) is not None:
+                self.info["cache_hits"] += 1
+            else:
+                todo.append(f)
+        if not todo:
+            return
+        if self.pool is None:
+            self.pool = self._new_pool()
+        use_mmap = self.finder.processes > 0
+        limit = max(2, self.finder.processes) * 4
+        batches = self._batches(todo, full)
+        running = {}
+        while True:
+            while len(running) < limit:
+                batch = next(batches, None)
+                if batch is None:
+                    break
+                fut = self.pool.submit(_hash_batch, [(f.paths[0], f.size) for f in batch], full, use_mmap)
+                running[fut] = batch
+            if not running:
+                return
+            done, _ = wait(running, timeout=_SAVE_EVERY, return_when=FIRST_COMPLETED)
+            for fut in done:
+                batch = running.pop(fut)
+                try:
+                    results = fut.result()
+                except BrokenProcessPool:
+                    # 子进程挂了（比如 mmap 时文件被截断收到 SIGBUS）：这批记错，换个新池子接着跑
+                    for f in batch:
+                        self.error(f.paths[0], "哈希进程异常退出")
+                    self.pool.shutdown(wait=False, cancel_futures=True)
+                    self.pool = self._new_pool()
+                    for other in list(running):
+                        for f in running.pop(other):
+                            self.error(f.paths[0], "哈希进程异常退出")
+                    break
+                self._store(batch, results, full)
+            self.tick()
+
+    def _store(self, batch, results, full):
+        rows = []
+        for f, res in zip(batch, results):
+            if isinstance(res, str):
+                self.error(f.paths[0], res)
+                f.size = -1   # 排除出后面的分组
+                continue
+            digest, size, mtime_ns = res
+            if size != f.size or mtime_ns != f.mtime_ns:
+                self.info["changed"] += 1   # 扫描途中被改了，这次不算
+                f.size = -1
+                continue
+            self.info["hashed_files"] += 1
+            self.info["hashed_bytes"] += f.size if full else min(f.size, 2 * PARTIAL)
+            if full:
+                f.full = digest
+            else:
+                f.partial = digest
+                if f.size <= 2 * PARTIAL:
+                    f.full = digest
+            rows.append((f.dev, f.ino, f.size, f.mtime_ns, f.partial, f.full))
+        if rows:
+            self.db.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.db.commit()
+
+    # ---- 主流程 ----
+    def run(self):
+        self.db = self.finder._connect()
+        try:
+            groups = self.walk()
+            files = [f for g in groups for f in g]
+            self.info["candidates"] = len(files)
+            self.info["phase"] = "partial"
+            self.tick(force=True)
+            self.load_cache(files)
+
+            self.hash_files(files, full=False)
+            groups = _regroup(groups, "partial")
+            self.info["phase"] = "full"
+            self.tick(force=True)
+
+            self.hash_files([f for g in groups for f in g], full=True)
+            groups = _regroup(groups, "full")
+
+            result = []
+            for g in groups:
+                result.append({
+                    "size": g[0].size,
+                    "digest": g[0].full.hex(),
+                    "wasted": g[0].size * (len(g) - 1),
+                    "files": [{"path": self._rel(f.paths[0]), "links": [self._rel(p) for p in f.paths[1:]]}
+                              for f in sorted(g, key=lambda f: f.paths[0])],
+                })
+            result.sort(key=lambda r: r["wasted"], reverse=True)
+            self.info.update(state="done", phase="done", groups=len(result),
+                             wasted_bytes=sum(r["wasted"] for r in result))
+            self._finish(result[:_MAX_GROUPS])
+        except Cancelled:
+            self.info.update(state="cancelled", message="已取消")
+            self._finish(None)
+        except Exception as e:   # 后台线程，异常只能记进状态里
+            self.info.update(state="failed", message=str(e))
+            self._finish(None)
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown(wait=False, cancel_futures=True)
+            self.db.close()
+
+    def _finish(self, groups):
+        self.info["finished"] = time.time()
+        self.info["seconds"] = round(self.info["finished"] - self.info["started"], 2)
+        self.db.execute("UPDATE scans SET state = ?, info = ?, groups = ?, updated = ? WHERE root = ?",
+                        (self.info["state"], json.dumps(self.info, ensure_ascii=False),
+                         json.dumps(groups, ensure_ascii=False) if groups is not None else None,
+                         time.time(), self.root))
+        self.db.commit()
+
+
+def _regroup(groups, attr):
+    """每组再按 attr（partial / full）细分，只留下还有两个以上文件的。"""
+    out = []
+    for g in groups:
+        sub = {}
+        for f in g:
+            if f.size >= 0:
+                sub.setdefault(getattr(f, attr), []).append(f)
+        out.extend(s for s in sub.values() if len(s) > 1)
+    return out
+
+
+# ========= 对外接口 =========
+class DupFinder:
+    def __init__(self, db_path, processes=4):
+        """processes  算哈希的子进程数；<= 0 时用线程池"""
+        self.db_path = db_path
+        self.processes = processes
+        d = os.path.dirname(db_path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._db = self._connect()
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    @staticmethod
+    def _key(rel):
+        return rel.replace("\\", "/").strip("/")
+
+    def _load(self, root):
+        with self._lock:
+            row = self._db.execute("SELECT state, updated, info, groups FROM scans WHERE root = ?",
+                                   (root,)).fetchone()
+        if row is None:
+            return None, None
+        state, updated, info, groups = row
+        info = json.loads(info)
+        if state == "running" and time.time() - (updated or 0) > _STALE_AFTER:
+            info.update(state="failed", message="扫描进程已经退出，请重新扫描")
+        return info, groups
+
+    def start(self, top, rel, min_size=1):
+        """top 是已经校验过的绝对路径，rel 是它在 /files 里的写法；同一目录正在扫描时直接返回它。"""
+        root = self._key(rel)
+        info, _ = self._load(root)
+        if info is not None and info["state"] == "running":
+            return info
+        scan = _Scan(self, root, os.fspath(top), max(1, int(min_size)))
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO scans (root, state, cancel, updated, info, groups) "
+                             "VALUES (?, 'running', 0, ?, ?, NULL)",
+                             (root, time.time(), json.dumps(scan.info, ensure_ascii=False)))
+            self._db.commit()
+        threading.Thread(target=scan.run, name="dup-scan", daemon=True).start()
+        return scan.info
+
+    def status(self, rel, limit=200):
+        """最近一次扫描的进度和结果；没扫过返回 None。"""
+        info, groups = self._load(self._key(rel))
+        if info is None:
+            return None
+        groups = json.loads(groups) if groups else []
+        info["results"] = groups[:max(0, limit)]
+        return info
+
+    def cancel(self, rel):
+        with self._lock:
+            self._db.execute("UPDATE scans SET cancel = 1 WHERE root = ? AND state = 'running'",
+                             (self._key(rel),))
+            self._db.commit()
+        return self.status(rel, limit=0)
+
+    def cache_stats(self):
+        with self._lock:
+            n, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM hashes").fetchone()
+        return {"files": n, "bytes": total}
@@ -0,0 +1,379 @@
+# fileview.py
+"""
+大文件在线查看：按行号 / 字节偏移跳转，外加 tail -f。
+
+文件整个 mmap，读哪段由内核按页换入，进程内存和文件大小无关。
+行号跳转靠稀疏的换行偏移索引：每 INDEX_EVERY 行记一个起始偏移（20 GB、2 亿行的日志约 400 KB），
+按需往后扩：要跳到第 N 行才扫到第 N 行为止，每次请求最多扫 BUILD_BUDGET 秒，
+没扫完就告诉前端“索引中”，下次请求接着扫。索引建好后跳到任意一行 = 取最近的标记 + 最多
+INDEX_EVERY 次 find，几毫秒。
+
+日志只会往后追加，所以文件变大时索引接着用，只扫新增部分；
+inode 变了、变小了、或者已扫部分的末尾内容对不上，就整个重建。
+
+tail -f：inotify 监视所在目录（fswatch 只支持目录），目录里有事件就去看一眼文件；
+没有 inotify 的平台退回轮询。轮转（inode 变了）和截断都会从头开始并通知前端。
+"""
+import bisect
+import mmap
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+import fswatch
+
+INDEX_EVERY = 4096
+SCAN_CHUNK = 8 * 1024 * 1024
+SCAN_BLOCK = 64 * 1024
+BUILD_BUDGET = 2.0          # 一次请求最多花多少秒扩索引
+MAX_LINES = 2000            # 一次最多返回几行
+MAX_LINE_BYTES = 64 * 1024  # 单行显示上限，超长的截断
+MAX_BACK_SCAN = 1024 * 1024 # 往前找上一个换行最多找多远
+MAX_PUSH = 1024 * 1024      # tail 一次推多少字节
+_SIG = 64                   # 校验“已扫部分没被改写”用的末尾字节数
+_CACHE_MAX = 32
+
+
+# ========= 稀疏行索引 =========
+def _drop(mm, start, end):
+    """扫过的页从本进程的映射里摘掉（页缓存还在），RSS 不会随扫过的字节数涨。"""
+    if hasattr(mmap, "MADV_DONTNEED") and end > start:
+        start -= start % mmap.PAGESIZE
+        mm.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+
+class LineIndex:
+    def __init__(self, key):
+        self.key = key                  # (st_dev, st_ino)
+        self.marks = array("Q", [0])    # marks[i] = 第 i * INDEX_EVERY 行（从 0 数）的起始偏移
+        self.scanned = 0                # [0, scanned) 已经扫过
+        self.lines = 0                  # [0, scanned) 里的换行数
+        self.sig = b""
+        self.lock = threading.Lock()
+
+    def valid_for(self, mm, size):
+        if size < self.scanned:
+            return False
+        return mm[max(0, self.scanned - _SIG):self.scanned] == self.sig
+
+    def extend(self, mm, size, until_line=None, deadline=None):
+        """往后扫，直到换行数够 until_line、到文件末尾或超时。"""
+        pos, lines = self.scanned, self.lines
+        next_mark = len(self.marks) * INDEX_EVERY
+        while pos < size and (until_line is None or lines < until_line):
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            end = min(pos + SCAN_CHUNK, size)
+            chunk = mm[pos:end]
+            n = chunk.count(b"\n")
+            if lines + n < next_mark:
+                lines += n
+            else:
+                # 这一块里有标记：按小块数换行，标记所在的小块里再逐个 find
+                p = 0
+                while p < len(chunk):
+                    bend = min(p + SCAN_BLOCK, len(chunk))
+                    bn = chunk.count(b"\n", p, bend)
+                    while lines + bn >= next_mark:
+                        skip = next_mark - lines
+                        q = p
+                        for _ in range(skip):
+                            q = chunk.index(b"\n", q) + 1
+                        self.marks.append(pos + q)
+                        bn -= skip
+                        lines = next_mark
+                        p = q
+                        next_mark += INDEX_EVERY
+                    lines += bn
+                    p = bend
+            _drop(mm, pos, end)
+            pos = end
+        self.scanned, self.lines = pos, lines
+        self.sig = mm[max(0, pos - _SIG):pos]
+
+    def complete(self, size):
+        return self.scanned >= size
+
+    def total_lines(self, mm, size):
+        """整个文件扫完了才知道总行数；最后一行没有换行也算一行。"""
+        if not self.complete(size):
+            return None
+        return self.lines + (1 if size and mm[size - 1:size] != b"\n" else 0)
+
+    def offset_of_line(self, mm, size, line):
+        """第 line 行（从 0 数）的起始偏移；索引还没扫到返回 None，超出末尾返回 size。"""
+        if line > self.lines:
+            if self.complete(size):
+                return size
+            return None
+        i = line // INDEX_EVERY
+        off = self.marks[i]
+        for _ in range(line - i * INDEX_EVERY):
+            off = mm.find(b"\n", off, size) + 1
+        return off
+
+    def line_of_offset(self, mm, off):
+        """off 所在行的行号（从 0 数）；off 超出已扫范围返回 None。"""
+        if off > self.scanned:
+            return None
+        i = bisect.bisect_right(self.marks, off) - 1
+        line = i * INDEX_EVERY
+        pos = self.marks[i]
+        while pos < off:
+            end = min(pos + SCAN_CHUNK, off)
+            line += mm[pos:end].count(b"\n")
+            _drop(mm, pos, end)
+            pos = end
+        return line
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _index_for(st):
+    key = (st.st_dev, st.st_ino)
+    with _indexes_lock:
+        idx = _indexes.get(key)
+        if idx is None:
+            idx = _indexes[key] = LineIndex(key)
+            while len(_indexes) > _CACHE_MAX:
+                _indexes.popitem(last=False)
+        else:
+            _indexes.move_to_end(key)
+        return idx
+
+
+def _reset_index(idx):
+    with _indexes_lock:
+        fresh = _indexes[idx.key] = LineIndex(idx.key)
+    return fresh
+
+
+# ========= 读行 =========
+def _decode(raw):
+    cut = len(raw) > MAX_LINE_BYTES
+    text = raw[:MAX_LINE_BYTES].rstrip(b"\r").decode("utf-8", "replace")
+    return text + (" …" if cut else "")
+
+
+def _lines_from(mm, size, off, n):
+    """从 off 开始读 n 行（读到 size 为止），返回 (行列表, 下一行的偏移)。"""
+    out = []
+    while off < size and len(out) < n:
+        j = mm.find(b"\n", off, min(size, off + MAX_LINE_BYTES + 1))
+        if j < 0:
+            if off + MAX_LINE_BYTES + 1 < size:
+                # 超长行：显示开头，跳到真正的换行
+                j = mm.find(b"\n", off, size)
+                out.append(_decode(mm[off:off + MAX_LINE_BYTES + 1]))
+                off = size if j < 0 else j + 1
+                continue
+            j = size
+        out.append(_decode(mm[off:j]))
+        off = j + 1
+    return out, min(off, size)
+
+
+def _line_start(mm, off):
+    """off 所在行的起始偏移。"""
+    if off <= 0:
+        return 0
+    j = mm.rfind(b"\n", max(0, off - MAX_BACK_SCAN), off)
+    if j >= 0:
+        return j + 1
+    return 0 if off <= MAX_BACK_SCAN else off
+
+
+def _start_before(mm, off, n):
+    """off（行首或文件末尾）往前数 n 行的起始偏移。"""
+    for _ in range(n):
+        if off <= 0:
+            return 0
+        lo = max(0, off - 1 - MAX_BACK_SCAN)
+        j = mm.rfind(b"\n", lo, off - 1)
+        off = j + 1 if j >= 0 else (0 if lo == 0 else lo)
+    return off
+
+
+def view(path, line=None, offset=None, before=None, tail=False, lines=200):
+    """
+    四种定位方式，按优先级：line（从 1 数的行号）/ offset（字节偏移，对齐到所在行首）/
+    before（这个偏移之前的 lines 行，用来往上翻页）/ tail（最后 lines 行）；都没给就从头开始。
+
+    返回 dict；行号索引还没扫到目标时 indexing=True，前端过一会儿再请求。
+    """
+    n = max(1, min(int(lines), MAX_LINES))
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        size = st.st_size
+        info = {"size": size, "mtime": st.st_mtime, "lines": [], "offset": 0, "next_offset": 0,
+                "first_line": None, "total_lines": None, "indexing": False, "eof": True, "binary": False}
+        if size == 0:
+            info["first_line"] = 1
+            info["total_lines"] = 0
+            return info
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with mm:
+            info["binary"] = b"\0" in mm[:8192]
+            end = size
+            idx = _index_for(st)
+            idx.lock.acquire()
+            try:
+                if not idx.valid_for(mm, size):
+                    idx.lock.release()
+                    idx = _reset_index(idx)
+                    idx.lock.acquire()
+                if line is not None:
+                    target = max(0, int(line) - 1)
+                    idx.extend(mm, size, until_line=target, deadline=time.monotonic() + BUILD_BUDGET)
+                    start = idx.offset_of_line(mm, size, target)
+                    if start is None:
+                        info.update(indexing=True, eof=False, indexed_lines=idx.lines, indexed_bytes=idx.scanned)
+                        return info
+                    first = target
+                else:
+                    if offset is not None:
+                        start = _line_start(mm, min(max(0, int(offset)), size))
+                    elif before is not None:
+                        start = _start_before(mm, min(max(0, int(before)), size), n)
+                    elif tail:
+                        start = _start_before(mm, size, n)
+                    else:
+                        start = 0
+                    first = idx.line_of_offset(mm, start)
+                    if before is not None:
+                        end = min(max(0, int(before)), size)   # 往上翻页：只读到 before 为止
+                info["total_lines"] = idx.total_lines(mm, size)
+            finally:
+                idx.lock.release()
+            rows, nxt = _lines_from(mm, end, start, n)
+            info.update(lines=rows, offset=start, next_offset=nxt, eof=nxt >= size,
+                        first_line=None if first is None else first + 1)
+    return info
+
+
+# ========= tail -f =========
+class _TailHub:
+    """按目录共享 inotify 监视；目录里有事件就把该目录的版本号加一，等待者自己去看文件变没变。"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._versions = {}
+        self._refs = {}
+        self._watched = set()
+        self._watcher = None
+
+    def _on_event(self, path, name, mask):
+        with self._cond:
+            if path is None:   # 队列溢出，全部叫醒
+                for d in self._versions:
+                    self._versions[d] += 1
+            elif path in self._versions:
+                self._versions[path] += 1
+            self._cond.notify_all()
+
+    def subscribe(self, d):
+        """返回 True 表示有 inotify，False 表示只能轮询。"""
+        with self._cond:
+            self._refs[d] = self._refs.get(d, 0) + 1
+            self._versions.setdefault(d, 0)
+            if self._watcher is None:
+                self._watcher = fswatch.Watcher(self._on_event)
+            if d not in self._watched and self._watcher.watch(d):
+                self._watched.add(d)
+            return d in self._watched and self._watcher.watching(d)
+
+    def unsubscribe(self, d):
+        with self._cond:
+            self._refs[d] -= 1
+            if self._refs[d] > 0:
+                return
+            del self._refs[d]
+            self._versions.pop(d, None)
+            if d in self._watched:
+                self._watched.discard(d)
+                self._watcher.unwatch(d)
+
+    def version(self, d):
+        with self._cond:
+            return self._versions.get(d, 0)
+
+    def wait(self, d, version, timeout):
+        with self._cond:
+            self._cond.wait_for(lambda: self._versions.get(d, 0) != version, timeout)
+            return self._versions.get(d, 0)
+
+
+_hub = _TailHub()
+
+
+def follow(path, offset=None, heartbeat=15.0, poll=1.0):
+    """
+    tail -f 的事件流：产出 (event, data)。
+        start  {offset, size}                 开始跟随的位置
+        lines  {offset, next_offset, lines}   新增的完整行
+        reset  {reason}                       文件被轮转 / 截断，从头开始
+        ping   None                           心跳
+    offset 缺省或超出文件大小时从末尾开始。
+    """
+    path = os.fspath(path)
+    d = os.path.dirname(path) or "."
+    inotify = _hub.subscribe(d)
+    f = None
+    try:
+        f = open(path, "rb")
+        st = os.fstat(f.fileno())
+        ino = (st.st_dev, st.st_ino)
+        pos = st.st_size if offset is None or offset > st.st_size or offset < 0 else offset
+        yield "start", {"offset": pos, "size": st.st_size}
+        version = _hub.version(d)
+        last_beat = time.monotonic()
+        while True:
+            try:
+                cur = os.stat(path)
+            except FileNotFoundError:
+                cur = None   # 轮转的间隙：旧文件挪走了、新文件还没建
+            if cur is not None and (cur.st_dev, cur.st_ino) != ino:
+                try:
+                    nf = open(path, "rb")
+                except FileNotFoundError:
+                    version = _hub.wait(d, version, poll)
+                    continue
+                f.close()
+                f = nf
+                st = os.fstat(f.fileno())
+                ino = (st.st_dev, st.st_ino)
+                pos = 0
+                yield "reset", {"reason": "rotated"}
+            elif cur is not None and cur.st_size < pos:
+                pos = 0
+                yield "reset", {"reason": "truncated"}
+
+            size = os.fstat(f.fileno()).st_size
+            if size > pos:
+                f.seek(pos)
+                buf = f.read(min(MAX_PUSH, size - pos))
+                cut = buf.rfind(b"\n") + 1
+                if cut == 0 and len(buf) < MAX_PUSH:
+                    cut = None   # 只有半行，等换行到了再推
+                if cut is not None:
+                    chunk = buf[:cut] if cut else buf
+                    rows = [_decode(x) for x in chunk.split(b"\n")]
+                    if chunk.endswith(b"\n"):
+                        rows.pop()
+                    yield "lines", {"offset": pos, "next_offset": pos + len(chunk), "lines": rows}
+                    pos += len(chunk)
+                    last_beat = time.monotonic()
+                    continue
+            # 有 inotify 时也隔几秒自己看一眼，防止监视因为目录被挪走之类失效
+            version = _hub.wait(d, version, min(heartbeat, 5.0) if inotify else poll)
+            if time.monotonic() - last_beat >= heartbeat:
+                last_beat = time.monotonic()
+                yield "ping", None
+    finally:
+        if f is not None:
+            f.close()
+        _hub.unsubscribe(d)
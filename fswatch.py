@@ -0,0 +1,134 @@
+# fswatch.py
+"""
+Linux inotify 的极简封装（ctypes，不引第三方库）。
+
+    w = Watcher(callback)          # callback(dir_path, name, mask)
+    if w.available:
+        w.watch("/some/dir")
+
+只监视单个目录（不递归）；事件在后台线程里回调，回调要快、别抛异常。
+其它平台 available = False，调用方自己退回到 mtime 检查。
+"""
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import threading
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+# 目录内容有变化
+CHANGE_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+               | IN_CREATE | IN_DELETE)
+# 目录本身没了 / 被挪走
+GONE_MASK = IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED
+
+_EVENT = struct.Struct("iIII")
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        return libc
+    except Exception:
+        return None
+
+
+class Watcher:
+    def __init__(self, callback, mask=CHANGE_MASK | GONE_MASK):
+        self.callback = callback
+        self.mask = mask | IN_ONLYDIR
+        self._libc = _load_libc()
+        self._fd = -1
+        self._wd_to_path = {}
+        self._path_to_wd = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        if self._libc is not None:
+            fd = self._libc.inotify_init1(os.O_CLOEXEC)
+            if fd >= 0:
+                self._fd = fd
+
+    @property
+    def available(self):
+        return self._fd >= 0
+
+    def watch(self, path):
+        if not self.available:
+            return False
+        with self._lock:
+            if path in self._path_to_wd:
+                return True
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), self.mask)
+            if wd < 0:
+                return False   # 超出 max_user_watches / 没权限：调用方退回 mtime 检查
+            self._wd_to_path[wd] = path
+            self._path_to_wd[path] = wd
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="inotify", daemon=True)
+                self._thread.start()
+        return True
+
+    def unwatch(self, path):
+        with self._lock:
+            wd = self._path_to_wd.pop(path, None)
+            if wd is None:
+                return
+            self._wd_to_path.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def watching(self, path):
+        return path in self._path_to_wd
+
+    def __len__(self):
+        return len(self._path_to_wd)
+
+    def _loop(self):
+        while True:
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except InterruptedError:
+                continue
+            except OSError:
+                return
+            off = 0
+            while off + _EVENT.size <= len(buf):
+                wd, mask, _cookie, length = _EVENT.unpack_from(buf, off)
+                off += _EVENT.size
+                name = buf[off:off + length].rstrip(b"\0")
+                off += length
+                if mask & IN_Q_OVERFLOW:
+                    # 事件丢了，只能让调用方全量作废
+                    self._emit(None, None, mask)
+                    continue
+                path = self._wd_to_path.get(wd)
+                if path is None:
+                    continue
+                if mask & GONE_MASK:
+                    with self._lock:
+                        if self._path_to_wd.get(path) == wd:
+                            del self._path_to_wd[path]
+                        self._wd_to_path.pop(wd, None)
+                self._emit(path, os.fsdecode(name) if name else None, mask)
+
+    def _emit(self, path, name, mask):
+        try:
+            self.callback(path, name, mask)
+        except Exception:
+            pass
@@ -0,0 +1,207 @@
+# gpuprobe.py
+"""
+GPU 采集的两块：
+
+- StaticInventory：名称 / 厂商 / 显存 / 驱动这类不会变的信息，进程里只查一次
+  （后台线程查，查到之前返回空，不阻塞采样线程；查失败隔一阵再试）。
+- StreamProbe：一个长驻子进程持续按行输出样本（nvidia-smi -l、
+  Get-Counter -Continuous），后台线程解析，采集时直接读最新值；
+  子进程退出会自动重启。
+
+起子进程的函数（popen）和查询函数都是传进来的，Linux 上可以换成假的
+脚本 / 函数来跑，不依赖 Windows 或 N 卡。
+"""
+import csv
+import subprocess
+import threading
+import time
+
+
+class StreamProbe:
+    def __init__(self, cmd, parse, popen=subprocess.Popen, restart_delay=5.0, max_restarts=None):
+        """
+        cmd            子进程命令行（list）
+        parse(line)    → (key, value) 或 None；latest[key] = value
+        restart_delay  子进程退出后隔多久重启
+        max_restarts   连续起不来多少次就放弃（None = 一直重试）
+        """
+        self.cmd = cmd
+        self.parse = parse
+        self.popen = popen
+        self.restart_delay = restart_delay
+        self.max_restarts = max_restarts
+        self._latest = {}      # 整体替换，读者拿到的引用不会被改
+        self._updated = None
+        self._proc = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.restarts = 0
+        self.error = None
+
+    # ---- 读 ----
+    def latest(self, max_age=None):
+        """最新样本；超过 max_age 秒没更新（子进程卡住 / 挂了）返回 {}。"""
+        if max_age is not None and (self._updated is None or time.time() - self._updated > max_age):
+            return {}
+        return self._latest
+
+    @property
+    def updated_at(self):
+        return self._updated
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    # ---- 子进程 ----
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="stream-probe", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        proc = self._proc
+        if proc is not None:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def _loop(self):
+        failures = 0
+        while not self._stop.is_set():
+            got = False
+            try:
+                self._proc = self.popen(
+                    self.cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                    stdin=subprocess.DEVNULL, bufsize=1, text=True, encoding="utf-8", errors="ignore",
+                )
+                for line in self._proc.stdout:
+                    if self._stop.is_set():
+                        break
+                    try:
+                        kv = self.parse(line.rstrip("\r\n"))
+                    except Exception:
+                        kv = None
+                    if kv is None:
+                        continue
+                    latest = dict(self._latest)
+                    latest[kv[0]] = kv[1]
+                    self._latest = latest
+                    self._updated = time.time()
+                    got = True
+                self.error = f"exited with {self._proc.wait()}"
+            except Exception as e:
+                self.error = str(e)
+            finally:
+                if self._proc is not None:
+                    try:
+                        self._proc.kill()
+                    except Exception:
+                        pass
+                    self._proc = None
+            failures = 0 if got else failures + 1
+            if self.max_restarts is not None and failures > self.max_restarts:
+                return
+            self.restarts += 1
+            self._stop.wait(self.restart_delay)
+
+
+class StaticInventory:
+    def __init__(self, query, retry_after=300.0):
+        """query() → list；空列表 / 抛异常算失败，retry_after 秒后再试。"""
+        self.query = query
+        self.retry_after = retry_after
+        self._value = None
+        self._failed_at = None
+        self._loading = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        """已经查到就返回缓存；否则在后台开查并先返回 []。"""
+        if self._value is not None:
+            return self._value
+        with self._lock:
+            if self._loading or (self._failed_at and time.time() - self._failed_at < self.retry_after):
+                return []
+            self._loading = True
+        threading.Thread(target=self._load, name="gpu-inventory", daemon=True).start()
+        return []
+
+    def load(self):
+        """同步查一次（启动时 / 测试用）。"""
+        self._load()
+        return self._value or []
+
+    def _load(self):
+        try:
+            value = self.query() or []
+        except Exception:
+            value = []
+        with self._lock:
+            if value:
+                self._value = value
+            else:
+                self._failed_at = time.time()
+            self._loading = False
+
+
+# ========= nvidia-smi =========
+NVSMI_FIELDS = ("index", "uuid", "name", "driver_version", "memory.total", "memory.used",
+                "utilization.gpu", "temperature.gpu")
+
+
+def nvidia_smi_cmd(interval=2):
+    return ["nvidia-smi", "--query-gpu=" + ",".join(NVSMI_FIELDS),
+            "--format=csv,noheader,nounits", "-l", str(max(1, int(interval)))]
+
+
+def _num(s):
+    try:
+        return float(s)
+    except (TypeError, ValueError):
+        return None   # "[N/A]" / "[Not Supported]"
+
+
+def parse_nvidia_smi(line):
+    """一行 CSV → (index, {...})；字段顺序见 NVSMI_FIELDS。"""
+    row = next(csv.reader([line], skipinitialspace=True), None)
+    if not row or len(row) < len(NVSMI_FIELDS):
+        return None
+    idx, uuid, name, driver, mem_total, mem_used, util, temp = row[:len(NVSMI_FIELDS)]
+    if not idx.strip().isdigit():
+        return None
+    return int(idx), {
+        "uuid": uuid,
+        "name": name,
+        "driver": driver,
+        "memory_total_mb": _num(mem_total),
+        "memory_used_mb": _num(mem_used),
+        "load": _num(util),
+        "temperature": _num(temp),
+    }
+
+
+# ========= Windows 性能计数器 =========
+GPU_LOAD_PS = r'''
+Get-Counter '\GPU Engine(*)\Utilization Percentage' -SampleInterval {interval} -Continuous | ForEach-Object {{
+    $avg = ($_.CounterSamples | Measure-Object CookedValue -Average).Average
+    if ($avg -ne $null) {{ [Console]::Out.WriteLine([math]::Round($avg, 1)); [Console]::Out.Flush() }}
+}}
+'''
+
+
+def gpu_load_cmd(interval=2):
+    script = GPU_LOAD_PS.format(interval=max(1, int(interval)))
+    return ["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-Command", script]
+
+
+def parse_gpu_load(line):
+    v = _num(line.strip())
+    return None if v is None else ("load", v)
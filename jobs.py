@@ -0,0 +1,596 @@
+# jobs.py
+"""
+后台文件任务：批量复制 / 移动 / 递归删除。
+
+    POST /api/jobs                {kind: copy|move|delete, paths: [...], dest: "..."}  → 202 + 任务状态
+    GET  /api/jobs                最近的任务
+    GET  /api/jobs/<id>           进度
+    POST /api/jobs/<id>/cancel    取消（正在复制的文件写到下一块就停）
+
+- 请求线程只做校验和排队，任务在 JobManager 的线程池里跑；一个复制任务内部再用
+  copy_threads 个线程并行复制文件，小文件多的目录树也能把磁盘喂满。
+- 复制尽量让内核干活：先试 reflink（FICLONE，btrfs / xfs 上秒完成、不占空间），
+  再试 copy_file_range、sendfile，都不行才用户态读写。
+- 同一个设备上的移动就是一次 rename；跨设备才退化成复制 + 删除。
+- 状态写在 state_dir/<id>.json（和分块上传一样），多 worker 部署时哪个进程都能查；
+  取消也是写一个 <id>.cancel 标记文件，跑任务的进程定期看一眼。
+"""
+import errno
+import json
+import os
+import re
+import shutil
+import stat
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from backend import _safe_join, dir_cache, _notify_write
+
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+KINDS = ("copy", "move", "delete")
+CHUNK = 64 * 1024 * 1024       # 内核复制每次最多搬多少，取消检查的粒度
+USER_BLOCK = 1024 * 1024       # 用户态兜底时的缓冲
+_SAVE_EVERY = 0.5              # 进度落盘间隔（秒）
+_KEEP_JOBS = 200               # 状态目录里最多留多少个结束了的任务
+_MAX_ERRORS = 50
+
+# linux/fs.h: FICLONE = _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+# 这些错误说明“这条路走不通”，换下一种复制方式；别的错误照常抛出
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTTY,
+                    errno.EBADF, errno.EPERM, getattr(errno, "ENOTSUP", errno.EOPNOTSUPP)}
+
+
+class JobError(Exception):
+    """客户端可以看到的错误；status 是建议的 HTTP 状态码。"""
+
+    def __init__(self, msg, status=400):
+        super().__init__(msg)
+        self.status = status
+
+
+class Cancelled(Exception):
+    pass
+
+
+# ========= 复制一个文件 =========
+def _reflink(src_fd, dst_fd):
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+        return True
+    except OSError as e:
+        if e.errno in _FALLBACK_ERRNOS:
+            return False
+        raise
+
+
+def _copy_fd(src_fd, dst_fd, size, advance, check):
+    """把 src_fd 全部复制到 dst_fd（都在偏移 0）；返回用的是哪种方式。"""
+    if size and _reflink(src_fd, dst_fd):
+        advance(size)
+        return "reflink"
+
+    # copy_file_range / sendfile 返回 0 只有在已经到了 stat 出来的大小之后才算读完；
+    # procfs、sysfs 和一些 FUSE / overlay 上会在开头或中途就返回 0，这时从当前偏移换下一种方式接着搬
+    # （和 shutil 一样，最后总有逐块 read / write 兜底）
+    offset = 0
+    if hasattr(os, "copy_file_range"):
+        try:
+            while True:
+                check()
+                n = os.copy_file_range(src_fd, dst_fd, CHUNK, offset, offset)
+                if n == 0:
+                    if offset and offset >= size:
+                        return "copy_file_range"
+                    break
+                offset += n
+                advance(n)
+        except OSError as e:
+            # 已经搬了一部分再出错就是真出错了
+            if offset or e.errno not in _FALLBACK_ERRNOS:
+                raise
+
+    if hasattr(os, "sendfile") and os.name == "posix":
+        try:
+            while True:
+                check()
+                n = os.sendfile(dst_fd, src_fd, offset, CHUNK)
+                if n == 0:
+                    if offset and offset >= size:
+                        return "sendfile"
+                    break
+                offset += n
+                advance(n)
+        except OSError as e:
+            if offset or e.errno not in _FALLBACK_ERRNOS:
+                raise
+
+    buf = bytearray(USER_BLOCK)
+    view = memoryview(buf)
+    os.lseek(src_fd, offset, os.SEEK_SET)
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    while True:
+        check()
+        n = os.readv(src_fd, [buf]) if hasattr(os, "readv") else _readinto(src_fd, buf)
+        if not n:
+            return "userspace"
+        done = 0
+        while done < n:
+            done += os.write(dst_fd, view[done:n])
+        advance(n)
+
+
+def _readinto(fd, buf):
+    data = os.read(fd, len(buf))
+    buf[:len(data)] = data
+    return len(data)
+
+
+def copy_file(src, dst, advance=lambda n: None, check=lambda: None):
+    """复制内容和时间 / 权限；dst 已存在就报错，不覆盖。"""
+    flags = getattr(os, "O_BINARY", 0)
+    src_fd = os.open(src, os.O_RDONLY | flags)
+    try:
+        st = os.fstat(src_fd)
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL | flags, stat.S_IMODE(st.st_mode) | 0o200)
+        try:
+            method = _copy_fd(src_fd, dst_fd, st.st_size, advance, check)
+        except BaseException:
+            os.close(dst_fd)
+            dst_fd = None
+            try:
+                os.remove(dst)
+            except OSError:
+                pass
+            raise
+        finally:
+            if dst_fd is not None:
+                os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+    shutil.copystat(src, dst)
+    return method
+
+
+# ========= 目录树 =========
+def _walk(top):
+    """
+    (目录列表, 文件列表, 符号链接列表)，都是绝对路径，目录按先父后子的顺序。
+    文件带大小；不跟随符号链接。
+    """
+    dirs, files, links = [top], [], []
+    i = 0
+    while i < len(dirs):
+        d = dirs[i]
+        i += 1
+        try:
+            it = os.scandir(d)
+        except OSError:
+            continue
+        with it:
+            for e in it:
+                try:
+                    if e.is_symlink():
+                        links.append(e.path)
+                    elif e.is_dir(follow_symlinks=False):
+                        dirs.append(e.path)
+                    else:
+                        files.append((e.path, e.stat(follow_symlinks=False).st_size))
+                except OSError:
+                    continue
+    return dirs, files, links
+
+
+def _walk_one(path):
+    """_walk 的单个源版本：文件 / 链接自己就是一条。"""
+    if os.path.isdir(path) and not os.path.islink(path):
+        return _walk(path)
+    if os.path.islink(path):
+        return [], [], [path]
+    return [], [(path, os.path.getsize(path))], []
+
+
+def _free_name(path):
+    """path 已存在时找一个 “名字 (2).ext” 这样的空位。"""
+    if not os.path.lexists(path):
+        return path
+    base, ext = os.path.splitext(path)
+    if os.path.isdir(path):
+        base, ext = path, ""
+    n = 2
+    while os.path.lexists(f"{base} ({n}){ext}"):
+        n += 1
+    return f"{base} ({n}){ext}"
+
+
+class Job:
+    def __init__(self, manager, kind, sources, dest):
+        self.manager = manager
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.sources = sources      # 绝对路径
+        self.dest = dest            # 目标目录（绝对路径）；delete 为 None
+        self.state = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.total_files = 0
+        self.total_bytes = 0
+        self.done_files = 0
+        self.done_bytes = 0
+        self.current = None
+        self.methods = {}
+        self.errors = []
+        self.error_count = 0
+        self.message = None
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._saved = 0.0
+        self._polled = 0.0
+
+    # ---- 状态 ----
+    def to_dict(self):
+        elapsed = ((self.finished or time.time()) - self.started) if self.started else 0
+        with self._lock:   # 复制线程会同时往里加
+            methods, errors = dict(self.methods), list(self.errors)
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "sources": self.sources,
+            "dest": self.dest,
+            "state": self.state,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "total_files": self.total_files,
+            "total_bytes": self.total_bytes,
+            "done_files": self.done_files,
+            "done_bytes": self.done_bytes,
+            "percent": self._percent(),
+            "rate_bps": round(self.done_bytes / elapsed, 1) if elapsed > 0 else None,
+            "current": self.current,
+            "methods": methods,
+            "errors": errors,
+            "error_count": self.error_count,
+            "message": self.message,
+        }
+
+    def _percent(self):
+        if self.state == "done":
+            return 100.0
+        if self.total_bytes:
+            return round(self.done_bytes / self.total_bytes * 100, 1)
+        if self.total_files:
+            return round(self.done_files / self.total_files * 100, 1)
+        return 0.0
+
+    def save(self, force=False):
+        now = time.time()
+        if not force and now - self._saved < _SAVE_EVERY:
+            return
+        self._saved = now
+        self.manager._write_state(self.to_dict())
+
+    # ---- 进度 / 取消 ----
+    def advance(self, n):
+        with self._lock:
+            self.done_bytes += n
+        self.save()
+
+    def file_done(self, path, method=None):
+        with self._lock:
+            self.done_files += 1
+            self.current = path
+            if method:
+                self.methods[method] = self.methods.get(method, 0) + 1
+        self.save()
+
+    def fail(self, path, e):
+        with self._lock:
+            self.error_count += 1
+            if len(self.errors) < _MAX_ERRORS:
+                self.errors.append(f"{path}: {e}")
+
+    def cancel(self):
+        self._cancel.set()
+
+    def check(self):
+        if self._cancel.is_set():
+            raise Cancelled()
+        # 别的 worker 进程收到的取消请求：标记文件隔一会儿看一次，不是每个文件都 stat
+        now = time.time()
+        if now - self._polled >= _SAVE_EVERY:
+            self._polled = now
+            if os.path.exists(self.manager._cancel_path(self.id)):
+                self._cancel.set()
+                raise Cancelled()
+
+
+class JobManager:
+    def __init__(self, state_dir, workers=2, copy_threads=8):
+        """
+        workers       同时跑几个任务
+        copy_threads  一个复制任务里并行复制几个文件
+        """
+        self.state_dir = state_dir
+        self.copy_threads = copy_threads
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="file-job")
+        self._jobs = {}   # 本进程提交的任务
+        self._lock = threading.Lock()
+
+    # ---- 状态文件 ----
+    def _state_path(self, jid):
+        if not _ID_RE.match(jid or ""):
+            raise JobError("无效的任务 ID", 404)
+        return os.path.join(self.state_dir, jid + ".json")
+
+    def _cancel_path(self, jid):
+        return os.path.join(self.state_dir, jid + ".cancel")
+
+    def _write_state(self, info):
+        os.makedirs(self.state_dir, exist_ok=True)
+        path = self._state_path(info["id"])
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(info, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _prune(self):
+        try:
+            names = [n for n in os.listdir(self.state_dir) if n.endswith(".json")]
+        except OSError:
+            return
+        if len(names) <= _KEEP_JOBS:
+            return
+        paths = sorted((os.path.join(self.state_dir, n) for n in names), key=os.path.getmtime)
+        for p in paths[:len(paths) - _KEEP_JOBS]:
+            jid = os.path.basename(p)[:-5]
+            job = self._jobs.get(jid)
+            if job is not None and job.state in ("queued", "running"):
+                continue
+            with self._lock:
+                self._jobs.pop(jid, None)
+            for q in (p, self._cancel_path(jid)):
+                try:
+                    os.remove(q)
+                except OSError:
+                    pass
+
+    # ---- 对外 ----
+    def submit(self, root, kind, paths, dest=None):
+        if kind not in KINDS:
+            raise JobError(f"不支持的任务类型：{kind}")
+        if not paths:
+            raise JobError("没有选择文件")
+        sources = []
+        root_path = os.path.realpath(root)
+        for rel in paths:
+            p = _safe_join(root, rel)
+            if str(p) == root_path:
+                raise JobError("不能操作根目录本身", 403)
+            if not os.path.lexists(p):
+                raise JobError(f"不存在：{rel}", 404)
+            sources.append(str(p))
+        dest_dir = None
+        if kind != "delete":
+            dest_dir = str(_safe_join(root, dest or ""))
+            if not os.path.isdir(dest_dir):
+                raise JobError("目标目录不存在", 404)
+            for s in sources:
+                if os.path.isdir(s) and not os.path.islink(s):
+                    if dest_dir == s or dest_dir.startswith(s.rstrip(os.sep) + os.sep):
+                        raise JobError(f"不能把目录放进它自己里面：{os.path.basename(s)}", 409)
+                if kind == "move" and os.path.dirname(s) == dest_dir:
+                    raise JobError(f"已经在目标目录里了：{os.path.basename(s)}", 409)
+
+        job = Job(self, kind, sources, dest_dir)
+        with self._lock:
+            self._jobs[job.id] = job
+        job.save(force=True)
+        self._prune()
+        self._pool.submit(self._run, job)
+        return job.to_dict()
+
+    def get(self, jid):
+        job = self._jobs.get(jid)
+        if job is not None:
+            return job.to_dict()
+        try:
+            with open(self._state_path(jid), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise JobError("任务不存在", 404)
+
+    def list(self, limit=20):
+        try:
+            names = [n for n in os.listdir(self.state_dir) if n.endswith(".json")]
+        except OSError:
+            return []
+        paths = sorted((os.path.join(self.state_dir, n) for n in names), key=os.path.getmtime, reverse=True)
+        out = []
+        for p in paths[:limit]:
+            try:
+                out.append(self.get(os.path.basename(p)[:-5]))
+            except (JobError, ValueError):
+                continue
+        return out
+
+    def cancel(self, jid):
+        info = self.get(jid)
+        if info["state"] not in ("queued", "running"):
+            return info
+        job = self._jobs.get(jid)
+        if job is not None:
+            job.cancel()
+        else:
+            open(self._cancel_path(jid), "w").close()
+        return self.get(jid)
+
+    # ---- 执行 ----
+    def _run(self, job):
+        job.state = "running"
+        job.started = time.time()
+        job.save(force=True)
+        touched = set()
+        try:
+            job.check()
+            if job.kind == "delete":
+                self._delete(job, touched)
+            elif job.kind == "move":
+                self._move(job, touched)
+            else:
+                self._copy(job, touched)
+            job.state = "done"
+        except Cancelled:
+            job.state = "cancelled"
+        except Exception as e:
+            job.state = "failed"
+            job.message = f"{type(e).__name__}: {e}"
+        finally:
+            job.finished = time.time()
+            job.current = None
+            for d in touched:
+                dir_cache.invalidate(d, recursive=True)
+                _notify_write(d)
+            job.save(force=True)
+            try:
+                os.remove(self._cancel_path(job.id))
+            except OSError:
+                pass
+
+    def _plan(self, job, sources):
+        """统计总文件数 / 字节数，顺便把目录树列好。"""
+        plans = []
+        for s in sources:
+            job.check()
+            dirs, files, links = _walk_one(s)
+            plans.append((s, dirs, files, links))
+            job.total_files += len(files) + len(links)
+            job.total_bytes += sum(size for _, size in files)
+        job.save(force=True)
+        return plans
+
+    def _copy(self, job, touched, sources=None):
+        sources = sources or job.sources
+        plans = self._plan(job, sources)
+        touched.add(job.dest)
+        copied = []
+        with ThreadPoolExecutor(max_workers=self.copy_threads, thread_name_prefix="file-copy") as ex:
+            # 限制排队的 future 数，几十万个文件也不会一次性建出来
+            slots = threading.BoundedSemaphore(self.copy_threads * 4)
+
+            def one(src, dst):
+                try:
+                    job.check()
+                    method = copy_file(src, dst, job.advance, job.check)
+                    job.file_done(src, method)
+                except Cancelled:
+                    pass
+                except OSError as e:
+                    job.fail(src, e)
+                finally:
+                    slots.release()
+
+            for s, dirs, files, links in plans:
+                target = _free_name(os.path.join(job.dest, os.path.basename(s)))
+                copied.append((s, target))
+                base = s if dirs else os.path.dirname(s)
+                dst_base = target if dirs else os.path.dirname(target)
+
+                def dst_of(path):
+                    return target if path == s else os.path.join(dst_base, os.path.relpath(path, base))
+
+                for d in dirs:
+                    job.check()
+                    os.makedirs(dst_of(d), exist_ok=True)
+                for src, _size in files:
+                    job.check()
+                    slots.acquire()
+                    ex.submit(one, src, dst_of(src))
+                for src in links:
+                    job.check()
+                    try:
+                        os.symlink(os.readlink(src), dst_of(src))
+                        job.file_done(src, "symlink")
+                    except OSError as e:
+                        job.fail(src, e)
+        job.check()
+        # 文件都写完了再补目录的时间戳，不然会被里面的写入改掉
+        for s, dirs, _files, _links in plans:
+            base, target = s, dict(copied)[s]
+            for d in reversed(dirs):
+                try:
+                    shutil.copystat(d, target if d == base else os.path.join(target, os.path.relpath(d, base)))
+                except OSError:
+                    pass
+        return copied
+
+    def _move(self, job, touched):
+        touched.add(job.dest)
+        rest = []
+        for s in job.sources:
+            job.check()
+            target = _free_name(os.path.join(job.dest, os.path.basename(s)))
+            try:
+                os.rename(s, target)   # 同一个设备：一次 rename 就完了，多大的目录都一样
+                touched.add(os.path.dirname(s))
+                job.file_done(s, "rename")
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    job.fail(s, e)
+                    continue
+                rest.append(s)
+        if not rest:
+            return
+        # 跨设备：复制过去，全部成功的源再删掉
+        errors_before = job.error_count
+        copied = self._copy(job, touched, rest)
+        if job.error_count != errors_before:
+            job.message = "部分文件复制失败，源文件已保留"
+            return
+        for s, _target in copied:
+            self._remove_tree(job, *_walk_one(s), count=False)
+            touched.add(os.path.dirname(s))
+
+    def _delete(self, job, touched):
+        plans = self._plan(job, job.sources)
+        job.total_bytes = 0   # 删除按条目数算进度
+        job.total_files = sum(len(d) + len(f) + len(ln) for _, d, f, ln in plans)
+        for s, dirs, files, links in plans:
+            self._remove_tree(job, dirs, files, links)
+            touched.add(os.path.dirname(s))
+
+    def _remove_tree(self, job, dirs, files, links, count=True):
+        """按 _walk 的结果删：先删文件和链接，再从最深的目录往上 rmdir。"""
+        for f in [p for p, _ in files] + links:
+            job.check()
+            try:
+                os.remove(f)
+                if count:
+                    job.file_done(f)
+            except OSError as e:
+                if e.errno == errno.EACCES and os.name == "nt":
+                    # Windows 上只读文件要先去掉只读属性才能删
+                    try:
+                        os.chmod(f, stat.S_IWRITE)
+                        os.remove(f)
+                        if count:
+                            job.file_done(f)
+                        continue
+                    except OSError as e2:
+                        e = e2
+                job.fail(f, e)
+        for d in reversed(dirs):
+            job.check()
+            try:
+                os.rmdir(d)
+                if count:
+                    job.file_done(d)
+            except OSError as e:
+                job.fail(d, e)
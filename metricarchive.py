@@ -0,0 +1,517 @@
+# metricarchive.py
+"""
+历史指标的磁盘归档：进程重启后曲线还在，能看比内存里更长的时间。
+
+存储是一个目录下的一堆段文件（segment），只追加，定长记录：
+    头部   8 字节 magic + 4 字节 JSON 长度 + JSON {"tier", "base", "step", "metrics", "merged"}
+    记录   u32 时间偏移（相对段的 base，秒）+ 每个指标一个 float32（缺失为 NaN），小端
+定长记录可以直接 mmap，按时间二分定位，再用 array 的步长切片取一列，不用逐条解析。
+时间存相对偏移、数值存 float32，一条记录比 (float64 时间戳, float64 值...) 小一半。
+
+两层：
+    raw  采样原值，每小时一个段，默认留 48 小时；
+    1m   每分钟平均，每天一个段，默认留 90 天；长时间范围只读这一层。
+段里的指标列表固定，出现新指标（比如插了块新盘）就提前切一个新段。
+
+写入：采样线程只往内存列表里追加（微秒级，不碰磁盘）；后台线程每 flush_interval 秒
+把攒的记录一次写进段文件并 fsync。进程崩溃最多丢这么多秒。
+维护（启动时和之后每小时）：按时间删过期段，超出 max_bytes 先删最老的 raw 再删最老的 1m；
+同一小时 / 同一天里因为重启或换指标切出来的多个段合并成一个（先写临时文件再 rename，
+新段头里记着合并了哪些源文件，合并中途崩了下次启动接着删源文件）。
+
+没有用 Gorilla 那种按位打包的 XOR 压缩：变长编码没法 mmap 后二分定位，纯 Python 逐位解码
+也撑不住“30 天范围几十毫秒”；体积靠 float32 + 时间偏移 + 1m 汇总层 + 过期删除来控制。
+"""
+import bisect
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from array import array
+
+from timeseries import downsample
+
+MAGIC = b"LHMA\x01\x00\x00\x00"
+_HEAD = struct.Struct("<8sI")
+_TS = struct.Struct("<I")
+_NAME_RE = re.compile(r"^(raw|1m)-(\d+)(?:-(\d+))?\.seg$")
+_MAX_PENDING = 100_000       # 写盘一直失败时内存里最多攒这么多条，再多丢最老的
+_MAINTAIN_EVERY = 3600
+NAN = float("nan")
+
+
+# ========= 段文件 =========
+class _Segment:
+    """一个段文件的头部信息（不可变，合并会生成新文件）。"""
+
+    def __init__(self, path, header, data_off):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.tier = header["tier"]
+        self.base = header["base"]
+        self.step = header["step"]
+        self.metrics = header["metrics"]
+        self.merged = header.get("merged", [])
+        self.col = {m: i for i, m in enumerate(self.metrics)}
+        self.words = 1 + len(self.metrics)
+        self.width = 4 * self.words
+        self.data_off = data_off
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            head = f.read(_HEAD.size)
+            if len(head) < _HEAD.size:
+                raise ValueError("段文件头不完整")
+            magic, n = _HEAD.unpack(head)
+            if magic != MAGIC:
+                raise ValueError("不是指标段文件")
+            header = json.loads(f.read(n))
+        return cls(path, header, _HEAD.size + n)
+
+    @staticmethod
+    def header_bytes(tier, base, step, metrics, merged=()):
+        body = json.dumps({"tier": tier, "base": base, "step": step, "metrics": list(metrics),
+                           "merged": list(merged)}, ensure_ascii=False).encode("utf-8")
+        return _HEAD.pack(MAGIC, len(body)) + body
+
+    def count(self, size):
+        return max(0, (size - self.data_off) // self.width)   # 末尾写了一半的记录不算
+
+    def _rows(self, mm, i0, i1):
+        buf = mm[self.data_off + i0 * self.width:self.data_off + i1 * self.width]
+        ts = array("I")
+        vals = array("f")
+        ts.frombytes(buf)
+        vals.frombytes(buf)
+        if sys.byteorder != "little":
+            ts.byteswap()
+            vals.byteswap()
+        return ts, vals
+
+    def read(self, metric, start, end):
+        """[start, end] 里 metric 的 (ts, value)；按时间二分定位，只取需要的那段。"""
+        c = self.col.get(metric)
+        if c is None:
+            return []
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            n = self.count(size)
+            if n == 0:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                offs = _Offsets(mm, self, n)
+                i0 = bisect.bisect_left(offs, start - self.base)
+                i1 = bisect.bisect_right(offs, end - self.base)
+                if i0 >= i1:
+                    return []
+                ts, vals = self._rows(mm, i0, i1)
+        k = self.words
+        base = self.base
+        return [(base + t, v) for t, v in zip(ts[0::k], vals[c + 1::k]) if v == v]
+
+    def read_all(self):
+        """合并用：返回 [(ts, {metric: value})]。"""
+        with open(self.path, "rb") as f:
+            n = self.count(os.fstat(f.fileno()).st_size)
+            if n == 0:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                ts, vals = self._rows(mm, 0, n)
+        k = self.words
+        out = []
+        for i in range(n):
+            row = vals[i * k + 1:(i + 1) * k]
+            out.append((self.base + ts[i * k], {m: v for m, v in zip(self.metrics, row) if v == v}))
+        return out
+
+
+class _Offsets:
+    """把 mmap 里每条记录的时间偏移包装成序列，给 bisect 用。"""
+
+    def __init__(self, mm, seg, n):
+        self.mm = mm
+        self.seg = seg
+        self.n = n
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        return _TS.unpack_from(self.mm, self.seg.data_off + i * self.seg.width)[0]
+
+
+class _Appender:
+    """某一层当前在写的段；跨过 rotate 秒的边界或出现新指标时换新段。"""
+
+    def __init__(self, archive, tier, step, rotate):
+        self.archive = archive
+        self.tier = tier
+        self.step = step
+        self.rotate = rotate
+        self.f = None
+        self.name = None
+        self.base = None
+        self.metrics = []
+        self.col = {}
+        self.pack = None
+        self.until = 0
+        self.last_ts = -1
+        self.seen = set()   # 本段里真有过值的指标
+
+    def _open(self, ts, metrics):
+        self.close()
+        base = int(ts)
+        d = self.archive.dir
+        name = f"{self.tier}-{base}.seg"
+        n = 1
+        while os.path.exists(os.path.join(d, name)):
+            name = f"{self.tier}-{base}-{n}.seg"
+            n += 1
+        self.f = open(os.path.join(d, name), "xb")
+        self.f.write(_Segment.header_bytes(self.tier, base, self.step, metrics))
+        self.name = name
+        self.base = base
+        self.metrics = list(metrics)
+        self.col = {m: i for i, m in enumerate(self.metrics)}
+        self.pack = struct.Struct(f"<I{len(self.metrics)}f").pack
+        self.until = (base // self.rotate + 1) * self.rotate
+        self.seen = set()
+
+    def write(self, rows):
+        """rows: [(ts, {metric: value})]，按时间顺序；时钟回拨的行丢掉（段内时间必须单调才能二分）。"""
+        out = []
+        for ts, values in rows:
+            ts = int(ts)
+            if ts < self.last_ts:
+                continue
+            new = [m for m in values if m not in self.col]
+            if self.f is None or ts >= self.until or new:
+                if out:
+                    self.f.write(b"".join(out))
+                    out = []
+                # 段内因新指标切段时沿用旧段的指标列表再加上新出现的，免得指标时有时无时反复切段；
+                # 跨过时间边界时只带上一段里真有过值的，拔掉的 U 盘、删掉的 loop 设备就不再占列
+                keep = self.metrics if ts < self.until else [m for m in self.metrics if m in self.seen]
+                self._open(ts, keep + sorted(new))
+            self.last_ts = ts
+            self.seen.update(values)
+            vals = [NAN] * len(self.metrics)
+            for m, v in values.items():
+                vals[self.col[m]] = v
+            out.append(self.pack(ts - self.base, *vals))
+        if out:
+            self.f.write(b"".join(out))
+
+    def sync(self):
+        if self.f is not None:
+            self.f.flush()
+            os.fsync(self.f.fileno())
+
+    def close(self):
+        if self.f is None:
+            return
+        try:
+            self.f.flush()
+            os.fsync(self.f.fileno())
+        except OSError:
+            pass   # 盘满之类：能写进去多少算多少，读的时候会忽略写了一半的记录
+        finally:
+            self.f.close()
+            self.f = None
+            self.name = None
+
+
+class _Rollup:
+    """按 step 秒求平均，桶满一个就吐一行。"""
+
+    def __init__(self, step):
+        self.step = step
+        self.slot = None
+        self.sums = {}
+        self.counts = {}
+
+    def feed(self, rows):
+        out = []
+        for ts, values in rows:
+            slot = int(ts // self.step)
+            if self.slot is not None and slot < self.slot:
+                continue
+            if slot != self.slot:
+                out.extend(self.flush())
+                self.slot = slot
+            for m, v in values.items():
+                self.sums[m] = self.sums.get(m, 0.0) + v
+                self.counts[m] = self.counts.get(m, 0) + 1
+        return out
+
+    def flush(self):
+        if self.slot is None or not self.counts:
+            return []
+        row = (self.slot * self.step, {m: self.sums[m] / n for m, n in self.counts.items()})
+        self.sums, self.counts = {}, {}
+        return [row]
+
+
+# ========= 对外接口 =========
+class MetricArchive:
+    def __init__(self, path, raw_hours=48, days=90, max_bytes=None, flush_interval=10.0,
+                 raw_rotate=3600, rollup_step=60, raw_query_span=6 * 3600):
+        """
+        raw_hours       原值保留多少小时
+        days            1 分钟汇总保留多少天
+        max_bytes       整个目录的大小上限（None 不限）
+        flush_interval  攒多少秒写一次盘
+        raw_query_span  查询范围不超过这个秒数、且在原值保留期内时读 raw 层
+        """
+        self.dir = path
+        self.raw_hours = raw_hours
+        self.days = days
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.raw_query_span = raw_query_span
+        self.rollup_step = rollup_step
+        os.makedirs(path, exist_ok=True)
+        self._raw = _Appender(self, "raw", 1, raw_rotate)
+        self._rollup_out = _Appender(self, "1m", rollup_step, 86400)
+        self._rollup = _Rollup(rollup_step)
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._headers = {}     # (name, ino) -> _Segment
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_maintain = 0.0
+        self.stats = {"flushes": 0, "rows": 0, "dropped": 0, "last_flush_ms": None,
+                      "errors": 0, "last_error": None, "compacted": 0, "deleted": 0}
+
+    # ---- 写 ----
+    def add(self, ts, values):
+        """采样线程调用：只进内存列表，不碰磁盘。"""
+        row = (ts, {m: float(v) for m, v in values.items() if v is not None})
+        with self._pending_lock:
+            self._pending.append(row)
+            if len(self._pending) > _MAX_PENDING:
+                del self._pending[:len(self._pending) - _MAX_PENDING]
+                self.stats["dropped"] += 1
+
+    def flush(self):
+        with self._pending_lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return
+        t = time.perf_counter()
+        with self._write_lock:
+            try:
+                self._raw.write(rows)
+                self._rollup_out.write(self._rollup.feed(rows))
+                self._raw.sync()
+                self._rollup_out.sync()
+            except OSError as e:
+                self.stats["errors"] += 1
+                self.stats["last_error"] = str(e)
+                self._raw.close()
+                self._rollup_out.close()
+                return
+        self.stats["flushes"] += 1
+        self.stats["rows"] += len(rows)
+        self.stats["last_flush_ms"] = round((time.perf_counter() - t) * 1000, 2)
+
+    def start(self):
+        """启动后台写盘 + 维护线程（只在采集进程里调用）。"""
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._loop, name="metric-archive", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+        with self._write_lock:
+            self._rollup_out.write(self._rollup.flush())
+            self._raw.close()
+            self._rollup_out.close()
+
+    def _loop(self):
+        while True:
+            if time.time() - self._last_maintain >= _MAINTAIN_EVERY:
+                self._last_maintain = time.time()
+                try:
+                    self.maintain()
+                except OSError as e:
+                    self.stats["errors"] += 1
+                    self.stats["last_error"] = str(e)
+            if self._stop.wait(self.flush_interval):
+                return
+            self.flush()
+
+    # ---- 段列表 ----
+    def _segments(self, tier=None):
+        """按 (base, 文件名) 排序的段列表；头部按 (文件名, inode) 缓存。"""
+        out = []
+        seen = set()
+        try:
+            entries = list(os.scandir(self.dir))
+        except FileNotFoundError:
+            return []
+        for e in entries:
+            m = _NAME_RE.match(e.name)
+            if not m or (tier and m.group(1) != tier):
+                continue
+            try:
+                key = (e.name, e.inode())
+                seg = self._headers.get(key)
+                if seg is None:
+                    seg = self._headers[key] = _Segment.load(e.path)
+            except (OSError, ValueError):
+                continue
+            seen.add(key)
+            out.append(seg)
+        for key in list(self._headers):
+            if key not in seen and (not tier or key[0].startswith(tier + "-")):
+                self._headers.pop(key, None)
+        out.sort(key=lambda s: (s.base, s.name))
+        return out
+
+    # ---- 读 ----
+    def metrics(self):
+        names = set()
+        for seg in self._segments():
+            names.update(seg.metrics)
+        return sorted(names)
+
+    def query(self, metric, start, end, max_points=None):
+        """和 MetricStore.query 一样返回 {"step", "points"}；范围短且在原值保留期内读 raw，否则读 1m。"""
+        now = time.time()
+        raw = end - start <= self.raw_query_span and start >= now - self.raw_hours * 3600
+        tier = "raw" if raw else "1m"
+        # 采集进程的 maintain() 随时可能合并 / 删掉段：读到一半发现段没了就重新列一遍再读，
+        # 第二遍还有消失的（刚好又过期）就跳过那一段
+        for attempt in (0, 1):
+            try:
+                pts = self._read_tier(tier, metric, start, end, skip_missing=attempt > 0)
+                break
+            except FileNotFoundError:
+                continue
+        if raw:
+            with self._pending_lock:
+                pending = [(ts, v[metric]) for ts, v in self._pending
+                           if metric in v and start <= ts <= end]
+            pts.extend((int(ts), v) for ts, v in pending)
+        step = 1 if raw else self.rollup_step
+        pts, step = downsample(pts, max_points, step)
+        return {"step": step, "points": [[t, round(v, 3)] for t, v in pts]}
+
+    def _read_tier(self, tier, metric, start, end, skip_missing=False):
+        segs = self._segments(tier)
+        pts = []
+        for i, seg in enumerate(segs):
+            if seg.base > end:
+                break
+            if i + 1 < len(segs) and segs[i + 1].base <= start:
+                continue   # 下一段开始得比 start 还早，这一段整个在范围之前
+            try:
+                pts.extend(seg.read(metric, start, end))
+            except FileNotFoundError:
+                if not skip_missing:
+                    raise
+        return pts
+
+    # ---- 维护：过期、限额、合并 ----
+    def _active(self):
+        return {self._raw.name, self._rollup_out.name}
+
+    def _delete(self, seg):
+        try:
+            os.unlink(seg.path)
+            self.stats["deleted"] += 1
+        except FileNotFoundError:
+            pass
+
+    def maintain(self):
+        with self._write_lock:
+            active = self._active()
+        # 上次合并到一半：新段已经 rename 好了，源文件还在
+        segs = self._segments()
+        names = {s.name for s in segs}
+        for seg in segs:
+            for src in seg.merged:
+                if src in names and src not in active and src != seg.name:
+                    self._delete(next(s for s in segs if s.name == src))
+        for e in os.scandir(self.dir):
+            if e.name.endswith(".tmp"):
+                os.unlink(e.path)
+
+        now = time.time()
+        limits = {"raw": now - self.raw_hours * 3600, "1m": now - self.days * 86400}
+        for tier, bucket in (("raw", self._raw.rotate), ("1m", self._rollup_out.rotate)):
+            segs = self._segments(tier)
+            # 过期：段的结束时间不晚于下一段的开始；最后一段按满一个周期算
+            for i, seg in enumerate(segs):
+                end = segs[i + 1].base if i + 1 < len(segs) else (seg.base // bucket + 1) * bucket
+                if end <= limits[tier] and seg.name not in active:
+                    self._delete(seg)
+            # 合并：同一个周期里有多个已经写完的段
+            groups = {}
+            for seg in self._segments(tier):
+                if seg.name not in active:
+                    groups.setdefault(seg.base // bucket, []).append(seg)
+            for group in groups.values():
+                if len(group) > 1:
+                    self._merge(tier, group)
+
+        if self.max_bytes:
+            self._enforce_size(active)
+
+    def _merge(self, tier, group):
+        group.sort(key=lambda s: (s.base, s.name))
+        rows = []
+        metrics = set()
+        for seg in group:
+            metrics.update(seg.metrics)
+            rows.extend(seg.read_all())
+        rows.sort(key=lambda r: r[0])
+        metrics = sorted(metrics)
+        col = {m: i for i, m in enumerate(metrics)}
+        base = group[0].base
+        pack = struct.Struct(f"<I{len(metrics)}f").pack
+        target = group[0].path
+        tmp = target + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_Segment.header_bytes(tier, base, group[0].step, metrics, [s.name for s in group[1:]]))
+            buf = []
+            for ts, values in rows:
+                vals = [NAN] * len(metrics)
+                for m, v in values.items():
+                    vals[col[m]] = v
+                buf.append(pack(ts - base, *vals))
+            f.write(b"".join(buf))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, target)
+        for seg in group[1:]:
+            self._delete(seg)
+        self.stats["compacted"] += 1
+
+    def _enforce_size(self, active):
+        segs = [(s, os.path.getsize(s.path)) for s in self._segments()]
+        total = sum(n for _, n in segs)
+        # 先删最老的 raw（有 1m 汇总兜底），再删最老的 1m
+        order = sorted((x for x in segs if x[0].name not in active),
+                       key=lambda x: (x[0].tier != "raw", x[0].base))
+        for seg, n in order:
+            if total <= self.max_bytes:
+                break
+            self._delete(seg)
+            total -= n
+
+    def disk_usage(self):
+        segs = self._segments()
+        return {"segments": len(segs), "bytes": sum(os.path.getsize(s.path) for s in segs)}
@@ -0,0 +1,152 @@
+# metrics.py
+"""
+/metrics：Prometheus 文本格式 / OpenMetrics 导出。
+
+数据全部来自采样器快照。渲染结果按快照版本号缓存（连同 gzip 过的版本），
+同一版本内的抓取只是把缓存的 bytes 发出去，不重新拼字符串、不重新压缩。
+"""
+import gzip
+import threading
+
+PREFIX = "localhub_"
+
+CONTENT_TYPE_TEXT = "text/plain; version=0.0.4; charset=utf-8"
+CONTENT_TYPE_OPENMETRICS = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _esc(v):
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(v):
+    if v is True:
+        return "1"
+    if v is False:
+        return "0"
+    if isinstance(v, int):
+        return str(v)
+    return repr(float(v))
+
+
+class _Family:
+    __slots__ = ("name", "kind", "help", "samples")
+
+    def __init__(self, name, kind, help_text):
+        self.name = name          # counter 不带 _total
+        self.kind = kind
+        self.help = help_text
+        self.samples = []         # [(labels tuple, value)]
+
+    def add(self, value, **labels):
+        if value is None:
+            return
+        self.samples.append((tuple(labels.items()), value))
+
+
+def _families(snap):
+    fam = {}
+
+    def f(name, kind, help_text):
+        if name not in fam:
+            fam[name] = _Family(PREFIX + name, kind, help_text)
+        return fam[name]
+
+    cpu = snap.get("cpu") or {}
+    f("cpu_usage_percent", "gauge", "CPU usage across all cores").add(cpu.get("usage_percent"))
+    for i, v in enumerate(cpu.get("per_core") or []):
+        f("cpu_core_usage_percent", "gauge", "CPU usage per logical core").add(v, core=i)
+    f("cpu_logical_cores", "gauge", "Logical CPU count").add(cpu.get("logical"))
+    f("cpu_frequency_mhz", "gauge", "Current CPU frequency").add(cpu.get("freq_current"))
+
+    mem = snap.get("memory") or {}
+    f("memory_total_bytes", "gauge", "Physical memory").add(mem.get("total_bytes"))
+    f("memory_available_bytes", "gauge", "Available memory").add(mem.get("available_bytes"))
+    f("memory_used_bytes", "gauge", "Used memory").add(mem.get("used_bytes"))
+    f("memory_usage_percent", "gauge", "Memory usage").add(mem.get("percent"))
+
+    for d in snap.get("disks") or []:
+        lbl = {"device": d.get("device"), "mountpoint": d.get("mount"), "fstype": d.get("fstype")}
+        f("disk_total_bytes", "gauge", "Partition size").add(d.get("total_bytes"), **lbl)
+        f("disk_used_bytes", "gauge", "Partition used space").add(d.get("used_bytes"), **lbl)
+        f("disk_free_bytes", "gauge", "Partition free space").add(d.get("free_bytes"), **lbl)
+
+    for nic, c in sorted((snap.get("netio") or {}).items()):
+        f("network_receive_bytes", "counter", "Bytes received").add(c["bytes_recv"], interface=nic)
+        f("network_transmit_bytes", "counter", "Bytes sent").add(c["bytes_sent"], interface=nic)
+        f("network_receive_packets", "counter", "Packets received").add(c["packets_recv"], interface=nic)
+        f("network_transmit_packets", "counter", "Packets sent").add(c["packets_sent"], interface=nic)
+        f("network_receive_errors", "counter", "Receive errors").add(c["errin"], interface=nic)
+        f("network_transmit_errors", "counter", "Transmit errors").add(c["errout"], interface=nic)
+        f("network_receive_drop", "counter", "Inbound packets dropped").add(c["dropin"], interface=nic)
+        f("network_transmit_drop", "counter", "Outbound packets dropped").add(c["dropout"], interface=nic)
+
+    net = snap.get("network") or {}
+    for i in net.get("interfaces") or []:
+        f("network_up", "gauge", "Interface is up").add(i.get("is_up"), interface=i.get("name"))
+        f("network_speed_mbps", "gauge", "Link speed").add(i.get("speed"), interface=i.get("name"))
+    if "listeners" in net:
+        f("listeners", "gauge", "Listening sockets").add(len(net["listeners"]))
+
+    for i, g in enumerate(snap.get("gpus") or []):
+        lbl = {"index": i, "name": g.get("name"), "vendor": g.get("vendor")}
+        f("gpu_load_percent", "gauge", "GPU utilization").add(g.get("load_percent"), **lbl)
+        f("gpu_memory_used_bytes", "gauge", "GPU memory used").add(g.get("memory_used_bytes"), **lbl)
+        f("gpu_memory_total_bytes", "gauge", "GPU memory total").add(g.get("memory_total_bytes"), **lbl)
+        f("gpu_temperature_celsius", "gauge", "GPU temperature").add(g.get("temperature"), **lbl)
+
+    return fam.values()
+
+
+def render(snap, providers=(), openmetrics=False):
+    lines = []
+    families = list(_families(snap))
+    prov = _Family(PREFIX + "provider_duration_seconds", "gauge", "Last run time of each sampler provider")
+    for p in providers:
+        if p.get("last_ms") is not None:
+            prov.add(round(p["last_ms"] / 1000, 6), provider=p["name"])
+    families.append(prov)
+
+    for fam in families:
+        if not fam.samples:
+            continue
+        lines.append(f"# HELP {fam.name} {fam.help}")
+        lines.append(f"# TYPE {fam.name} {fam.kind}")
+        suffix = "_total" if fam.kind == "counter" else ""
+        for labels, value in fam.samples:
+            lbl = ",".join(f'{k}="{_esc(v)}"' for k, v in labels)
+            lines.append(f"{fam.name}{suffix}{{{lbl}}} {_num(value)}" if lbl
+                         else f"{fam.name}{suffix} {_num(value)}")
+    if openmetrics:
+        lines.append("# EOF")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class Exporter:
+    def __init__(self, sampler):
+        self.sampler = sampler
+        self._cache = {}      # (openmetrics, gzip) -> (version, bytes)
+        self._lock = threading.Lock()
+        self.renders = 0
+
+    def body(self, openmetrics=False, gzipped=False):
+        """当前快照版本对应的 /metrics 正文；同一版本只渲染 / 压缩一次。"""
+        version = self.sampler.version
+        key = (openmetrics, gzipped)
+        hit = self._cache.get(key)
+        if hit and hit[0] == version:
+            return hit[1]
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit and hit[0] == version:
+                return hit[1]
+            plain = self._cache.get((openmetrics, False))
+            if plain and plain[0] == version:
+                data = plain[1]
+            else:
+                data = render(self.sampler.snapshot(), self.sampler.providers(), openmetrics)
+                self.renders += 1
+                self._cache[(openmetrics, False)] = (version, data)
+            if gzipped:
+                data = gzip.compress(data, compresslevel=5)
+                self._cache[key] = (version, data)
+            return data
@@ -0,0 +1,192 @@
+# proctable.py
+"""
+进程表：两次刷新之间保留每个进程的条目，只做增量。
+
+- pid 列表和上一轮做差：新进程才读一次静态字段（名称 / 命令行 / 用户 / 启动时间），
+  退出的直接丢掉；启动时间变了说明 pid 被复用，当新进程处理。
+- 每轮只读会变的字段：CPU 时间、常驻内存、线程数、状态。
+  Linux 上一个进程只读一次 /proc/<pid>/stat，自己解析；
+  其他平台保留 psutil.Process 对象，在 oneshot() 里一次取完。
+- CPU% = 两轮之间 CPU 时间的增量 / 墙钟时间，和 top 一样按单核计（多线程可以超过 100）。
+- top(n) 用堆取前 N，不对全表排序。
+
+刷新是按需的：min_interval 内的重复请求直接用上一轮的结果，多个页面共享一次刷新。
+"""
+import heapq
+import os
+import sys
+import threading
+import time
+
+import psutil
+
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# 排序键 → (取值函数, 是否从大到小)
+SORT_KEYS = {
+    "cpu": (lambda e: e["cpu_percent"], True),
+    "memory": (lambda e: e["rss"], True),
+    "threads": (lambda e: e["threads"], True),
+    "pid": (lambda e: e["pid"], False),
+    "name": (lambda e: e["name"].lower(), False),
+}
+
+_STATUS = {"R": "running", "S": "sleeping", "D": "disk-sleep", "Z": "zombie", "T": "stopped",
+           "t": "tracing-stop", "I": "idle", "X": "dead", "W": "waking", "P": "parked"}
+
+
+def _read_stat(pid):
+    """/proc/<pid>/stat → (state, cpu 秒, rss 字节, 线程数, starttime 节拍)；comm 里可能有空格和括号。"""
+    fd = os.open(f"/proc/{pid}/stat", os.O_RDONLY)   # 不走 io.open，省掉缓冲文件对象
+    try:
+        data = os.read(fd, 4096)
+    finally:
+        os.close(fd)
+    rpar = data.rindex(b")")
+    fields = data[rpar + 2:].split()
+    # fields[0] 是原文第 3 列 state
+    utime, stime = int(fields[11]), int(fields[12])
+    return (fields[0].decode(), (utime + stime) / _CLK_TCK, int(fields[21]) * _PAGE,
+            int(fields[17]), int(fields[19]))
+
+
+def _read_static_procfs(pid):
+    with open(f"/proc/{pid}/stat", "rb") as f:
+        data = f.read()
+    name = data[data.index(b"(") + 1:data.rindex(b")")].decode("utf-8", "replace")
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            cmd = f.read().rstrip(b"\0").replace(b"\0", b" ").decode("utf-8", "replace")
+    except OSError:
+        cmd = ""
+    try:
+        uid = os.stat(f"/proc/{pid}").st_uid
+    except OSError:
+        uid = None
+    return name, cmd, uid
+
+
+class ProcessTable:
+    def __init__(self, min_interval=1.0, use_procfs=None):
+        self.min_interval = min_interval
+        self.use_procfs = sys.platform.startswith("linux") if use_procfs is None else use_procfs
+        self._entries = {}     # pid -> 条目 dict（对外的字段 + 内部的 _cpu / _start / _proc）
+        self._users = {}       # uid -> 用户名
+        self._at = None        # 上一轮的 monotonic 时间
+        self._lock = threading.Lock()
+        self.last_ms = None
+        self.stats = {"count": 0, "added": 0, "removed": 0}
+
+    # ---- 静态字段 ----
+    def _user(self, uid):
+        if uid is None:
+            return ""
+        name = self._users.get(uid)
+        if name is None:
+            try:
+                import pwd
+                name = pwd.getpwuid(uid).pw_name
+            except (ImportError, KeyError):
+                name = str(uid)
+            self._users[uid] = name
+        return name
+
+    def _new_procfs(self, pid, start):
+        name, cmd, uid = _read_static_procfs(pid)
+        return {"pid": pid, "name": name, "cmdline": cmd, "username": self._user(uid),
+                "_start": start, "_cpu": None}
+
+    def _new_psutil(self, pid):
+        p = psutil.Process(pid)
+        with p.oneshot():
+            name = p.name()
+            start = p.create_time()
+            try:
+                cmd = " ".join(p.cmdline())
+            except (psutil.AccessDenied, psutil.ZombieProcess):
+                cmd = ""
+            try:
+                user = p.username()
+            except (psutil.AccessDenied, KeyError):
+                user = ""
+        return {"pid": pid, "name": name, "cmdline": cmd, "username": user,
+                "_start": start, "_cpu": None, "_proc": p}
+
+    # ---- 每轮 ----
+    def _tick_procfs(self, pid, old):
+        state, cpu, rss, threads, start = _read_stat(pid)
+        e = old if old is not None and old["_start"] == start else self._new_procfs(pid, start)
+        return e, cpu, rss, threads, _STATUS.get(state, state)
+
+    def _tick_psutil(self, pid, old):
+        e = old
+        # psutil 的读方法不检查 pid 复用，Process.create_time() 又是缓存值；
+        # is_running() 会重新读这个 pid 的启动时间来比，变了就是别的进程，重建条目
+        if e is not None and not e["_proc"].is_running():
+            e = None
+        if e is None:
+            e = self._new_psutil(pid)
+        p = e["_proc"]
+        with p.oneshot():
+            t = p.cpu_times()
+            rss = p.memory_info().rss
+            threads = p.num_threads()
+            status = p.status()
+        return e, t.user + t.system, rss, threads, status
+
+    def refresh(self, force=False):
+        """按需刷新；min_interval 内重复调用直接返回。"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._at is not None and now - self._at < self.min_interval:
+                return
+            t0 = time.perf_counter()
+            dt = now - self._at if self._at is not None else None
+            tick = self._tick_procfs if self.use_procfs else self._tick_psutil
+            old_entries = self._entries
+            entries = {}
+            added = 0
+            for pid in psutil.pids():
+                old = old_entries.get(pid)
+                try:
+                    e, cpu, rss, threads, status = tick(pid, old)
+                except (OSError, ValueError, IndexError, psutil.Error):
+                    continue   # 刚退出 / 没权限
+                if e is not old:
+                    added += 1
+                prev = e["_cpu"]
+                e["cpu_percent"] = max(0.0, cpu - prev) / dt * 100 if prev is not None and dt else 0.0
+                e["_cpu"] = cpu
+                e["rss"] = rss
+                e["threads"] = threads
+                e["status"] = status
+                entries[pid] = e
+            self._entries = entries
+            self._at = now
+            self.last_ms = round((time.perf_counter() - t0) * 1000, 1)
+            self.stats = {"count": len(entries), "added": added,
+                          "removed": sum(1 for pid in old_entries if pid not in entries)}
+
+    def top(self, sort="cpu", n=50):
+        """前 n 个进程（只含对外字段）；第一次调用会先打底再隔一小会儿算 CPU%。"""
+        if sort not in SORT_KEYS:
+            raise ValueError(f"不支持的排序：{sort}")
+        if self._at is None:
+            self.refresh(force=True)
+            time.sleep(0.2)
+            # 打底后立刻再采一次；不 force 会被 min_interval 挡掉，第一次全是 0%
+            self.refresh(force=True)
+        else:
+            self.refresh()
+        key, desc = SORT_KEYS[sort]
+        rows = list(self._entries.values())
+        picked = heapq.nlargest(n, rows, key=key) if desc else heapq.nsmallest(n, rows, key=key)
+        total_mem = psutil.virtual_memory().total or 1
+        # 取整 / 内存占比只对选中的 n 条算，不在每轮的全表循环里做
+        return [{
+            "pid": e["pid"], "name": e["name"], "username": e["username"], "cmdline": e["cmdline"],
+            "status": e["status"], "threads": e["threads"], "rss": e["rss"],
+            "cpu_percent": round(e["cpu_percent"], 1),
+            "memory_percent": round(e["rss"] / total_mem * 100, 2),
+        } for e in picked]
@@ -0,0 +1,212 @@
+# psworker.py
+"""
+常驻的 PowerShell 工作进程池，代替每次查询都起一个 powershell -NoProfile。
+
+协议（一问一答，按行）：
+    请求  {"id": 1, "script": "..."}\n                      写到 stdin，纯 ASCII JSON
+    响应  \x1e{"id": 1, "ok": true, "out": "..."}\n         stdout 里以 \x1e 开头的行
+          \x1e{"id": 1, "ok": false, "error": "..."}\n
+不带 \x1e 的行（脚本自己的杂散输出）直接忽略。
+
+解释器只要实现这个循环就能用：PowerShell 用下面的 BOOTSTRAP；
+Linux 上可以换成 pwsh，或者一个几行的 Python 回显服务来测超时 / 崩溃重启。
+
+超时的脚本没法单独取消，直接杀掉那个进程，下次调用时重启；
+进程中途退出（崩溃）时，正在等的调用立刻失败，不用等到超时。
+"""
+import base64
+import itertools
+import json
+import queue
+import subprocess
+import threading
+import time
+
+MARK = "\x1e"
+
+BOOTSTRAP = r'''
+$ErrorActionPreference = 'Stop'
+$ProgressPreference = 'SilentlyContinue'
+[Console]::OutputEncoding = [Text.Encoding]::UTF8
+while ($true) {
+    $line = [Console]::In.ReadLine()
+    if ($line -eq $null) { break }
+    if (-not $line.Trim()) { continue }
+    $req = $line | ConvertFrom-Json
+    try {
+        $out = (Invoke-Expression $req.script | Out-String)
+        $resp = @{ id = $req.id; ok = $true; out = $out }
+    } catch {
+        $resp = @{ id = $req.id; ok = $false; error = $_.Exception.Message }
+    }
+    [Console]::Out.WriteLine([char]30 + ($resp | ConvertTo-Json -Compress))
+    [Console]::Out.Flush()
+}
+'''
+
+
+def powershell_argv(exe="powershell"):
+    """exe 可以是 powershell / pwsh；脚本用 -EncodedCommand 传，免得引号转义出问题。"""
+    enc = base64.b64encode(BOOTSTRAP.encode("utf-16-le")).decode("ascii")
+    return [exe, "-NoLogo", "-NoProfile", "-NonInteractive", "-ExecutionPolicy", "Bypass",
+            "-EncodedCommand", enc]
+
+
+class ShellError(Exception):
+    """脚本报错 / 超时 / 进程起不来；调用方自己决定降级成什么。"""
+
+
+class ShellWorker:
+    def __init__(self, argv, popen=subprocess.Popen):
+        self.argv = argv
+        self.popen = popen
+        self._proc = None
+        self._responses = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()   # 一个进程同一时间只跑一个脚本
+        self.last_used = 0.0
+        self.starts = 0
+
+    @property
+    def alive(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def _start(self):
+        self._proc = self.popen(
+            self.argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            bufsize=1, text=True, encoding="utf-8", errors="replace",
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+        )
+        self._responses = queue.Queue()
+        self.starts += 1
+        threading.Thread(target=self._read, args=(self._proc, self._responses),
+                         name="ps-worker-reader", daemon=True).start()
+
+    @staticmethod
+    def _read(proc, responses):
+        try:
+            for line in proc.stdout:
+                if not line.startswith(MARK):
+                    continue
+                try:
+                    responses.put(json.loads(line[1:]))
+                except ValueError:
+                    continue
+        except Exception:
+            pass
+        responses.put(None)   # EOF：进程没了
+
+    def kill(self):
+        proc, self._proc = self._proc, None
+        if proc is not None:
+            try:
+                proc.kill()
+                proc.wait(timeout=2)
+            except Exception:
+                pass
+
+    def run(self, script, timeout):
+        with self._lock:
+            if not self.alive:
+                self.kill()
+                try:
+                    self._start()
+                except OSError as e:
+                    raise ShellError(f"启动失败：{e}")
+            rid = next(self._ids)
+            try:
+                self._proc.stdin.write(json.dumps({"id": rid, "script": script}) + "\n")
+                self._proc.stdin.flush()
+            except (OSError, ValueError):
+                self.kill()
+                raise ShellError("工作进程已退出")
+            self.last_used = time.time()
+            deadline = time.time() + timeout
+            while True:
+                left = deadline - time.time()
+                try:
+                    resp = self._responses.get(timeout=max(0.0, left))
+                except queue.Empty:
+                    self.kill()   # 脚本卡住了，没法单独取消
+                    raise ShellError("超时")
+                if resp is None:
+                    self.kill()
+                    raise ShellError("工作进程崩溃")
+                if resp.get("id") != rid:
+                    continue      # 上一个调用迟到的响应
+                if not resp.get("ok"):
+                    raise ShellError(resp.get("error") or "脚本出错")
+                return resp.get("out") or ""
+
+
+class ShellPool:
+    def __init__(self, argv, size=2, timeout=5.0, idle_timeout=600.0, popen=subprocess.Popen):
+        """
+        size          最多几个常驻进程（并发查询数）
+        idle_timeout  多久没用就关掉省内存，下次用到再起
+        """
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._workers = [ShellWorker(argv, popen) for _ in range(size)]
+        self._idle = queue.LifoQueue()   # 后进先出：尽量复用刚用过的热进程
+        for w in self._workers:
+            self._idle.put(w)
+        self._reaper = None
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.last_ms = None
+
+    def run(self, script, timeout=None):
+        """返回脚本的文本输出；出错抛 ShellError。"""
+        timeout = timeout or self.timeout
+        t0 = time.perf_counter()
+        try:
+            w = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            self.timeouts += 1
+            raise ShellError("没有空闲的工作进程")
+        try:
+            out = w.run(script, max(0.1, timeout - (time.perf_counter() - t0)))
+        except ShellError as e:
+            self.errors += 1
+            if str(e) == "超时":
+                self.timeouts += 1
+            raise
+        finally:
+            self._idle.put(w)
+            self.calls += 1
+            self.last_ms = round((time.perf_counter() - t0) * 1000, 1)
+            self._ensure_reaper()
+        return out
+
+    def _ensure_reaper(self):
+        if self._reaper is not None or not self.idle_timeout:
+            return
+        self._reaper = threading.Thread(target=self._reap, name="ps-worker-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap(self):
+        while True:
+            time.sleep(min(30.0, self.idle_timeout))
+            for w in self._workers:
+                if w.alive and time.time() - w.last_used > self.idle_timeout and w._lock.acquire(blocking=False):
+                    try:
+                        w.kill()
+                    finally:
+                        w._lock.release()
+
+    def close(self):
+        for w in self._workers:
+            w.kill()
+
+    def stats(self):
+        return {
+            "workers": len(self._workers),
+            "alive": sum(1 for w in self._workers if w.alive),
+            "starts": sum(w.starts for w in self._workers),
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "last_ms": self.last_ms,
+        }
@@ -0,0 +1,333 @@
+# sampler.py
+"""
+后台采样器：一个守护线程按各自的间隔调用采集函数（provider），把结果放进共享快照。
+路由只读快照（O(1)），不再在请求里 sleep / 起子进程。
+
+每个 provider 声明刷新间隔、适用平台，以及是否“慢”；调度器记录每次耗时：
+- 慢的（声明过或实测超过 slow_after）丢给线程池跑，主循环不等它，
+  上一次还没跑完就跳过这一轮，一个卡住的探测拖不住别的；
+- 每个 provider 有耗时预算（占墙钟时间的比例），实测越贵，实际间隔拉得越长。
+
+多进程部署时只有一个进程真正采集（publish_to 把每次更新写出去），
+其它进程 follow 一个快照源：普通 provider 不再跑，值从快照源拿；
+标了 local 的 provider（只从快照派生，比如历史曲线）仍然每个进程自己跑。
+"""
+import platform
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 耗时按指数滑动平均，新样本权重
+_COST_ALPHA = 0.3
+
+
+class Sampler:
+    def __init__(self, interval=1.0, budget=0.05, slow_after=0.05, workers=4):
+        """
+        budget      默认耗时预算：单个 provider 最多占用这么大比例的时间
+        slow_after  实测平均耗时超过这么多秒，就改到线程池里跑
+        """
+        self.interval = interval
+        self.budget = budget
+        self.slow_after = slow_after
+        self._tasks = {}       # name -> provider 状态（见 add）
+        self._snapshot = {}    # name -> 最近一次采集结果（整体替换，读者拿到的引用不会被改）
+        self._updated = {}     # name -> 采集完成时间戳
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._version = 0      # 每轮有任务跑过就 +1，推送端靠它等新数据
+        self._stop = threading.Event()
+        self._thread = None
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sampler-slow")
+        self._system = platform.system()
+        self._sinks = []       # publish_to 注册的回调
+        self._source = None    # follow 的快照源
+        self._remote = {}      # follow 时快照源那边的 provider 状态
+        self._follow_thread = None
+
+    def add(self, name, fn, every=None, platforms=None, slow=False, budget=None, local=False):
+        """
+        注册一个 provider；every 为刷新间隔（秒），默认用全局 interval。
+        platforms 是 platform.system() 的取值（"Windows" / "Linux" / "Darwin"），
+        不在其中的 provider 只登记不运行，它依赖的模块也就不会被导入。
+        local 表示只读快照、不碰系统，follow 别的进程时也在本进程跑。
+        """
+        old = self._tasks.get(name, {})
+        self._tasks[name] = {
+            "fn": fn,
+            "every": every or self.interval,
+            "due": 0.0,
+            "platforms": tuple(platforms) if platforms else None,
+            "enabled": not platforms or self._system in platforms,
+            "slow": slow,
+            "local": local,
+            "budget": budget or self.budget,
+            "running": False,
+            "cost": old.get("cost"),
+            "last_ms": old.get("last_ms"),
+            "max_ms": old.get("max_ms", 0.0),
+            "runs": old.get("runs", 0),
+            "errors": old.get("errors", 0),
+            "last_error": old.get("last_error"),
+            "last_run": old.get("last_run"),
+        }
+
+    def set_every(self, name, every):
+        if name in self._tasks and every:
+            self._tasks[name]["every"] = every
+
+    def set_interval(self, interval):
+        for t in self._tasks.values():
+            if t["every"] == self.interval:
+                t["every"] = interval
+        self.interval = interval
+
+    # ---- 读 ----
+    def snapshot(self):
+        return self._snapshot
+
+    def get(self, name, default=None):
+        return self._snapshot.get(name, default)
+
+    def updated_at(self, name):
+        return self._updated.get(name)
+
+    @property
+    def version(self):
+        return self._version
+
+    def wait(self, version, timeout=None):
+        """阻塞到快照版本号超过 version（或超时），返回当前版本号。"""
+        with self._changed:
+            if self._version <= version:
+                self._changed.wait(timeout)
+            return self._version
+
+    def providers(self):
+        """每个 provider 的配置和最近的耗时，给 /api/providers 用。"""
+        out = []
+        for name, t in self._tasks.items():
+            if not self._runnable(t) and name in self._remote:
+                out.append(self._remote[name])
+                continue
+            out.append({
+                "name": name,
+                "platforms": list(t["platforms"]) if t["platforms"] else None,
+                "enabled": t["enabled"],
+                "every": t["every"],
+                "effective_every": round(self._every(t), 3),
+                "offloaded": self._offload(t),
+                "budget": t["budget"],
+                "cost_ms": round(t["cost"] * 1000, 2) if t["cost"] is not None else None,
+                "last_ms": t["last_ms"],
+                "max_ms": t["max_ms"],
+                "runs": t["runs"],
+                "errors": t["errors"],
+                "last_error": t["last_error"],
+                "last_run": t["last_run"],
+                "running": t["running"],
+            })
+        return out
+
+    # ---- 调度 ----
+    def _runnable(self, t):
+        return t["enabled"] and (self._source is None or t["local"])
+
+    def _every(self, t):
+        # 实测耗时 / 预算：一次要 1 秒、预算 5% 的，至少 20 秒跑一次
+        if t["cost"] is None:
+            return t["every"]
+        return max(t["every"], t["cost"] / t["budget"])
+
+    def _offload(self, t):
+        return t["slow"] or (t["cost"] is not None and t["cost"] > self.slow_after)
+
+    def _execute(self, name, t):
+        t0 = time.perf_counter()
+        try:
+            value = t["fn"]()
+            t["last_error"] = None
+        except Exception as e:
+            value = self._snapshot.get(name)
+            t["errors"] += 1
+            t["last_error"] = f"{type(e).__name__}: {e}"
+        dt = time.perf_counter() - t0
+        # 第一次跑带着延迟导入 / 预热（比如 cpu_percent 打底），不计入平均耗时
+        if t["runs"] > 0:
+            t["cost"] = dt if t["cost"] is None else (1 - _COST_ALPHA) * t["cost"] + _COST_ALPHA * dt
+        t["last_ms"] = round(dt * 1000, 2)
+        t["max_ms"] = max(t["max_ms"], t["last_ms"])
+        t["runs"] += 1
+        t["last_run"] = time.time()
+        return value
+
+    def _publish(self, values):
+        with self._lock:
+            snap = dict(self._snapshot)
+            snap.update(values)
+            self._snapshot = snap
+            now = time.time()
+            for name in values:
+                self._updated[name] = now
+                self._tasks[name]["running"] = False
+        with self._changed:
+            self._version += 1
+            self._changed.notify_all()
+        for sink in self._sinks:
+            try:
+                sink(self)
+            except Exception:
+                pass
+
+    def _run_slow(self, name, t):
+        try:
+            value = self._execute(name, t)
+        except BaseException:
+            t["running"] = False
+            raise
+        self._publish({name: value})
+
+    def run_once(self, names=None):
+        """
+        执行到期的 provider（names 给定时不管到没到期，只跑这些）；
+        没启动线程时也可以同步调用。慢的丢进线程池，不在这里等。
+        """
+        inline = []
+        with self._lock:
+            now = time.time()
+            for name, t in self._tasks.items():
+                if not self._runnable(t) or t["running"]:
+                    continue
+                if names is None and t["due"] > now:
+                    continue
+                if names is not None and name not in names:
+                    continue
+                t["running"] = True
+                t["due"] = now + self._every(t)
+                if self._offload(t):
+                    try:
+                        self._pool.submit(self._run_slow, name, t)
+                    except RuntimeError:   # 解释器退出时线程池已关
+                        t["running"] = False
+                        self._stop.set()
+                else:
+                    inline.append((name, t))
+        if inline:
+            self._publish({name: self._execute(name, t) for name, t in inline})
+
+    def ensure(self, *names, timeout=None):
+        """
+        快照里还没有这些键（线程没起来或第一轮没跑完）时补采一次；
+        快的同步跑完，慢的最多再等 timeout 秒（None = 等到有为止），没等到就先缺着。
+        """
+        missing = [n for n in names if n not in self._snapshot and self._tasks.get(n, {}).get("enabled")]
+        if not missing:
+            return self._snapshot
+        self.run_once(missing)
+        deadline = None if timeout is None else time.time() + timeout
+        with self._changed:
+            while any(n not in self._snapshot for n in missing):
+                left = None if deadline is None else deadline - time.time()
+                if left is not None and left <= 0:
+                    break
+                self._changed.wait(left)
+        return self._snapshot
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_once()
+            tasks = [t for t in self._tasks.values() if self._runnable(t)]
+            if not tasks:
+                self._stop.wait(self.interval)
+                continue
+            next_due = min(t["due"] for t in tasks)
+            self._stop.wait(max(0.05, next_due - time.time()))
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="metrics-sampler", daemon=True)
+        self._thread.start()
+        if self._source is not None:
+            self._follow_thread = threading.Thread(target=self._follow_loop, name="metrics-follow", daemon=True)
+            self._follow_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for th in (self._thread, self._follow_thread):
+            if th:
+                th.join(timeout=5)
+        self._thread = self._follow_thread = None
+
+    # ---- 多进程 ----
+    def export(self):
+        """写进共享快照的内容：本进程采集的值、完成时间和 provider 状态（local 的不带）。"""
+        local = {n for n, t in self._tasks.items() if t["local"]}
+        snap, updated = self._snapshot, dict(self._updated)
+        return {
+            "snapshot": {k: v for k, v in snap.items() if k not in local},
+            "updated": {k: v for k, v in updated.items() if k not in local},
+            "providers": [p for p in self.providers() if p["name"] not in local],
+        }
+
+    def publish_to(self, sink):
+        """每次快照更新后调用 sink(self)，比如把 export() 写进共享内存。"""
+        self._sinks.append(sink)
+
+    def follow(self, source, poll=0.05):
+        """
+        只从 source 读快照（source.read() → export() 的结果，没有新数据返回 None），
+        本进程只跑 local provider。要在 start() 之前调用。
+        """
+        self._source = source
+        self._poll = poll
+
+    def _follow_loop(self):
+        while not self._stop.is_set():
+            try:
+                payload = self._source.read()
+            except Exception:
+                payload = None
+            if payload:
+                with self._lock:
+                    snap = dict(self._snapshot)
+                    snap.update(payload["snapshot"])
+                    self._snapshot = snap
+                    self._updated.update(payload["updated"])
+                    self._remote = {p["name"]: p for p in payload["providers"]}
+                with self._changed:
+                    self._version += 1
+                    self._changed.notify_all()
+            self._stop.wait(self._poll)
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+
+def diff(old, new):
+    """
+    两份快照的增量：只保留变化的字段（dict 递归比较，list 等其它值整体替换），
+    被删掉的键记为 None。没有变化时返回 {}。
+    """
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return new
+    out = {}
+    for k, v in new.items():
+        if k not in old:
+            out[k] = v
+            continue
+        ov = old[k]
+        if ov is v:
+            continue
+        if isinstance(v, dict) and isinstance(ov, dict):
+            d = diff(ov, v)
+            if d:
+                out[k] = d
+        elif ov != v:
+            out[k] = v
+    for k in old:
+        if k not in new:
+            out[k] = None
+    return out
@@ -0,0 +1,421 @@
+# searchindex.py
+"""
+文件名搜索索引（SQLite + FTS5 trigram）。
+
+    dirs(id, path, mtime_ns)                      每个目录一行
+    entries(id, dir_id, name, lname, is_dir, size, mtime)
+    names(lname)                                  entries.lname 的 trigram 全文索引
+
+三种查询：
+    prefix     名字以 q 开头       → entries.lname 上的 B 树范围扫描
+    substring  名字包含 q          → trigram MATCH（q 少于 3 个字符时退回 LIKE）
+    glob       *.log / img_????.jpg → trigram 加速的 GLOB
+名字统一转小写存在 lname 里，三种查询都不区分大小写。
+
+爬取和 DuIndex 一样按层并行、按目录 mtime 增量；之后靠 inotify（加不上就靠
+写操作回调 + 定时重扫）把变化的目录标脏，后台线程只重列脏目录。
+查询走每个线程自己的只读连接（WAL），不会被后台写入挡住。
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fswatch
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    id        INTEGER PRIMARY KEY,
+    path      TEXT UNIQUE NOT NULL,
+    mtime_ns  INTEGER
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id      INTEGER PRIMARY KEY,
+    dir_id  INTEGER NOT NULL,
+    name    TEXT NOT NULL,
+    lname   TEXT NOT NULL,
+    is_dir  INTEGER NOT NULL,
+    size    INTEGER,
+    mtime   REAL
+);
+CREATE INDEX IF NOT EXISTS entries_dir ON entries(dir_id);
+CREATE INDEX IF NOT EXISTS entries_lname ON entries(lname);
+CREATE VIRTUAL TABLE IF NOT EXISTS names USING fts5(
+    lname, content='entries', content_rowid='id', tokenize='trigram case_sensitive 1'
+);
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO names(rowid, lname) VALUES (new.id, new.lname);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO names(names, rowid, lname) VALUES ('delete', old.id, old.lname);
+END;
+"""
+
+_SELECT = ("SELECT e.name, d.path, e.is_dir, e.size, e.mtime "
+           "FROM entries e JOIN dirs d ON d.id = e.dir_id ")
+
+# 没有 3 个连续字面字符的 glob / 太短的子串只能全表扫，超时就返回已经找到的
+QUERY_TIMEOUT = 2.0
+# 脏目录攒一会儿再处理，连续写入只重列一次
+_DEBOUNCE = 1.0
+
+
+def _subtree_bounds(path):
+    sep = os.sep
+    return path.rstrip(sep) + sep, path.rstrip(sep) + chr(ord(sep) + 1)
+
+
+def _like_escape(s):
+    return s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _list(path):
+    """scandir 一个目录 → (mtime_ns, [(name, is_dir, size, mtime)])；目录没了返回 None。"""
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    rows = []
+    try:
+        with os.scandir(path) as it:
+            for e in it:
+                try:
+                    is_dir = e.is_dir(follow_symlinks=False)
+                    st = None if is_dir else e.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                rows.append((e.name, is_dir, None if is_dir else st.st_size,
+                             None if is_dir else st.st_mtime))
+    except OSError:
+        pass
+    return mtime_ns, rows
+
+
+class SearchIndex:
+    def __init__(self, db_path, workers=8, use_inotify=True):
+        self.db_path = db_path
+        self.workers = workers
+        d = os.path.dirname(db_path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+        self._wlock = threading.Lock()
+        self._local = threading.local()
+        self._roots = []   # [(绝对路径, 对外的相对路径前缀)]
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._current = None
+        self._thread = None
+        self._dirty = set()
+        self._dirty_lock = threading.Lock()
+        self._watcher = fswatch.Watcher(self._on_event) if use_inotify else None
+        self.last_scan = {}
+        self._counts = None
+
+    # ---- 连接 ----
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA query_only=1")
+            self._local.conn = conn
+        return conn
+
+    # ---- 路径 ----
+    def add_root(self, path, prefix=""):
+        """prefix 是这个根在 /files 里的路径：FILE_ROOT 是 ""，盘符是 "C:"。"""
+        path = os.path.abspath(path)
+        self._roots.append((path, prefix))
+        self._roots.sort(key=lambda r: -len(r[0]))
+        return path
+
+    def _rel(self, dir_path, name):
+        for root, prefix in self._roots:
+            if dir_path == root or dir_path.startswith(root.rstrip(os.sep) + os.sep):
+                rest = os.path.relpath(dir_path, root).replace(os.sep, "/")
+                parts = [x for x in (prefix, "" if rest == "." else rest, name) if x]
+                return "/".join(parts)
+        return None
+
+    # ---- 查询 ----
+    def search(self, q, mode="auto", limit=100, timeout=QUERY_TIMEOUT):
+        """
+        返回 {"mode", "results": [{"name", "path", "is_dir", "size", "mtime"}], "truncated", "took_ms"}；
+        path 是 /files?path= 能直接用的相对路径。
+        """
+        t0 = time.perf_counter()
+        q = (q or "").strip()
+        if mode == "auto":
+            mode = "glob" if any(c in q for c in "*?[") else "substring"
+        lq = q.lower()
+        if not lq:
+            return {"mode": mode, "results": [], "truncated": False, "took_ms": 0}
+
+        if mode == "prefix":
+            sql = _SELECT + "WHERE e.lname >= ? AND e.lname < ? LIMIT ?"
+            args = (lq, lq + "\U0010ffff", limit + 1)
+        elif mode == "glob":
+            sql = _SELECT + "JOIN names n ON n.rowid = e.id WHERE n.lname GLOB ? LIMIT ?"
+            args = (lq, limit + 1)
+        elif mode == "substring" and len(lq) >= 3:
+            sql = _SELECT + "JOIN names n ON n.rowid = e.id WHERE names MATCH ? LIMIT ?"
+            args = ('"' + lq.replace('"', '""') + '"', limit + 1)
+        elif mode == "substring":
+            sql = _SELECT + "WHERE e.lname LIKE ? ESCAPE '\\' LIMIT ?"
+            args = ("%" + _like_escape(lq) + "%", limit + 1)
+        else:
+            raise ValueError("未知的搜索模式")
+
+        conn = self._reader()
+        deadline = time.perf_counter() + timeout
+        conn.set_progress_handler(lambda: time.perf_counter() > deadline, 10000)
+        rows = []
+        timed_out = False
+        try:
+            cur = conn.execute(sql, args)
+            while True:
+                batch = cur.fetchmany(64)
+                if not batch:
+                    break
+                rows.extend(batch)
+        except sqlite3.OperationalError as e:
+            if "interrupt" not in str(e):
+                raise
+            timed_out = True
+        finally:
+            conn.set_progress_handler(None, 0)
+
+        results = []
+        for name, dir_path, is_dir, size, mtime in rows[:limit]:
+            rel = self._rel(dir_path, name)
+            if rel is None:
+                continue
+            results.append({"name": name, "path": rel, "is_dir": bool(is_dir), "size": size, "mtime": mtime})
+        results.sort(key=lambda r: (len(r["name"]), r["name"].lower()))
+        return {
+            "mode": mode,
+            "results": results,
+            "truncated": timed_out or len(rows) > limit,
+            "timed_out": timed_out,
+            "took_ms": round((time.perf_counter() - t0) * 1000, 1),
+        }
+
+    # ---- 写 ----
+    def _dir_id(self, path, mtime_ns):
+        cur = self._db.execute("SELECT id FROM dirs WHERE path = ?", (path,))
+        r = cur.fetchone()
+        if r:
+            self._db.execute("UPDATE dirs SET mtime_ns = ? WHERE id = ?", (mtime_ns, r[0]))
+            return r[0]
+        return self._db.execute("INSERT INTO dirs (path, mtime_ns) VALUES (?, ?)", (path, mtime_ns)).lastrowid
+
+    def _apply(self, path, mtime_ns, rows):
+        """把一个目录的新列表写进库：只增删改有变化的条目。"""
+        did = self._dir_id(path, mtime_ns)
+        old = {name: (eid, is_dir, size, mtime) for eid, name, is_dir, size, mtime in self._db.execute(
+            "SELECT id, name, is_dir, size, mtime FROM entries WHERE dir_id = ?", (did,))}
+        ins = []
+        upd = []
+        for name, is_dir, size, mtime in rows:
+            o = old.pop(name, None)
+            if o is None:
+                ins.append((did, name, name.lower(), int(is_dir), size, mtime))
+            elif o[1] != int(is_dir):
+                self._db.execute("DELETE FROM entries WHERE id = ?", (o[0],))
+                ins.append((did, name, name.lower(), int(is_dir), size, mtime))
+            elif (o[2], o[3]) != (size, mtime):
+                upd.append((size, mtime, o[0]))
+        if ins:
+            self._db.executemany(
+                "INSERT INTO entries (dir_id, name, lname, is_dir, size, mtime) VALUES (?,?,?,?,?,?)", ins)
+        if upd:
+            self._db.executemany("UPDATE entries SET size = ?, mtime = ? WHERE id = ?", upd)
+        for name, (eid, is_dir, _s, _m) in old.items():
+            self._db.execute("DELETE FROM entries WHERE id = ?", (eid,))
+            if is_dir:
+                self._drop_tree(os.path.join(path, name))
+
+    def _drop_tree(self, path):
+        lo, hi = _subtree_bounds(path)
+        rows = self._db.execute(
+            "SELECT id, path FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (path, lo, hi)).fetchall()
+        for did, p in rows:
+            self._db.execute("DELETE FROM entries WHERE dir_id = ?", (did,))
+            if self._inotify():
+                self._watcher.unwatch(p)
+        self._db.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (path, lo, hi))
+
+    # ---- 扫描 ----
+    def scan(self, root, only_new=False):
+        """
+        增量扫描 root 的子树。only_new=True 时只重列 root 本身，
+        往下只进索引里还没有的目录（inotify 事件 / 写操作回调用这个）。
+        """
+        t0 = time.time()
+        root = os.path.abspath(root)
+        conn = self._reader()
+        lo, hi = _subtree_bounds(root)
+        if only_new:
+            known = {p: (i, m) for i, p, m in conn.execute(
+                "SELECT id, path, mtime_ns FROM dirs WHERE path = ?", (root,))}
+        else:
+            known = {p: (i, m) for i, p, m in conn.execute(
+                "SELECT id, path, mtime_ns FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (root, lo, hi))}
+
+        def visit(path):
+            old = known.get(path)
+            if old is not None:
+                try:
+                    mtime_ns = os.stat(path).st_mtime_ns
+                except OSError:
+                    return path, None, None
+                if mtime_ns == old[1]:
+                    # 没变：子目录从库里拿，不用 scandir
+                    subs = [os.path.join(path, n) for (n,) in self._reader().execute(
+                        "SELECT name FROM entries WHERE dir_id = ? AND is_dir = 1", (old[0],))]
+                    return path, False, subs
+            listed = _list(path)
+            if listed is None:
+                return path, None, None
+            return path, listed, [os.path.join(path, n) for n, is_dir, _s, _m in listed[1] if is_dir]
+
+        if root in known and only_new:
+            known[root] = (known[root][0], None)   # 强制重列 root
+
+        dirs = 0
+        rescanned = 0
+        level = [root]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while level:
+                nxt = []
+                results = list(pool.map(visit, level))
+                with self._wlock, self._db:
+                    for path, listed, subs in results:
+                        if subs is None:
+                            if path == root:
+                                self._drop_tree(path)
+                            continue
+                        dirs += 1
+                        if listed:
+                            rescanned += 1
+                            self._apply(path, listed[0], listed[1])
+                        nxt.extend(subs)
+                for path, _listed, subs in results:
+                    if subs is not None and self._inotify():
+                        self._watcher.watch(path)   # 加不上（超出 max_user_watches）就只靠定时重扫
+                if only_new:
+                    nxt = [p for p in nxt if not self._known(p)]
+                level = nxt
+
+        # 被删 / 挪走的子目录不用单独找：父目录 mtime 会变，重列时 _apply 顺手删掉整棵子树
+        self._counts = None
+        info = {"dirs": dirs, "rescanned": rescanned, "seconds": round(time.time() - t0, 3), "at": time.time()}
+        if not only_new:
+            self.last_scan[root] = info
+        return info
+
+    def _known(self, path):
+        return self._reader().execute("SELECT 1 FROM dirs WHERE path = ?", (path,)).fetchone() is not None
+
+    # ---- 变化通知 ----
+    def _inotify(self):
+        return self._watcher is not None and self._watcher.available
+
+    def _on_event(self, path, name, mask):
+        if path is None:   # inotify 队列溢出：整体重扫
+            for root, _prefix in self._roots:
+                self.request_scan(root)
+            return
+        if mask & fswatch.GONE_MASK:
+            path = os.path.dirname(path)
+        self.mark_dirty(path)
+
+    def mark_dirty(self, path):
+        """目录内容变了（inotify 事件 / 写操作回调）；攒一会儿后只重列这一层。"""
+        with self._dirty_lock:
+            self._dirty.add(os.path.abspath(str(path)))
+
+    def _flush_dirty(self):
+        while True:
+            time.sleep(_DEBOUNCE)
+            with self._dirty_lock:
+                dirty, self._dirty = self._dirty, set()
+            for p in dirty:
+                if self._known(p):
+                    self.request_scan(p, only_new=True)
+
+    # ---- 后台 ----
+    def request_scan(self, path, only_new=False):
+        key = (os.path.abspath(path), only_new)
+        with self._wlock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+        self._queue.put(key)
+        self._ensure_thread()
+        return True
+
+    def _ensure_thread(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._loop, name="search-index", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while True:
+            key = self._queue.get()
+            with self._wlock:
+                self._pending.discard(key)
+                self._current = key[0]
+            try:
+                self.scan(*key)
+            except Exception:
+                pass
+            finally:
+                with self._wlock:
+                    self._current = None
+
+    def start(self, interval=3600):
+        """定时全量增量重扫所有根；平时靠 inotify / 写回调只重列变化的目录。"""
+        def tick():
+            while True:
+                for root, _prefix in list(self._roots):
+                    if os.path.isdir(root):
+                        self.request_scan(root)
+                time.sleep(interval)
+
+        threading.Thread(target=tick, name="search-index-timer", daemon=True).start()
+        threading.Thread(target=self._flush_dirty, name="search-index-dirty", daemon=True).start()
+
+    def stats(self):
+        """条目数、库文件大小、页缓存上限、inotify 监视数，给 /api/files/search/stats 用。"""
+        if self._counts is None:
+            conn = self._reader()
+            self._counts = (conn.execute("SELECT count(*) FROM entries").fetchone()[0],
+                            conn.execute("SELECT count(*) FROM dirs").fetchone()[0])
+        db_bytes = 0
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                db_bytes += os.path.getsize(self.db_path + suffix)
+            except OSError:
+                pass
+        cache = self._reader().execute("PRAGMA cache_size").fetchone()[0]
+        page = self._reader().execute("PRAGMA page_size").fetchone()[0]
+        return {
+            "entries": self._counts[0],
+            "dirs": self._counts[1],
+            "db_bytes": db_bytes,
+            # cache_size 为负数时单位是 KiB；每个连接各有一份
+            "page_cache_limit_bytes": -cache * 1024 if cache < 0 else cache * page,
+            "watches": len(self._watcher) if self._inotify() else 0,
+            "inotify": self._inotify(),
+            "scanning": self._current,
+            "pending": len(self._pending),
+            "last_scan": self.last_scan,
+        }
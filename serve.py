@@ -0,0 +1,154 @@
+# serve.py
+"""
+正式部署入口，代替 python app.py（开发服务器 + 调试器）：
+
+    python serve.py                         # 单进程多线程（Windows 上只能这样）
+    python serve.py --workers 4 --threads 8 # 多进程
+    python serve.py --port 9000
+
+单进程：create_app() 之后交给 waitress（装了的话，固定大小的线程池）或
+werkzeug 的多线程服务器，没有调试器、没有自动重载。
+
+SSE（/api/stream、/api/files/tail）每条连接一直占着一个线程。用 waitress 时每个进程
+最多 SERVE_MAX_STREAMS 条（默认线程数的一半），超出的返回 503，剩下的线程留给普通请求。
+
+多进程（Linux / macOS）：
+- 主进程先 bind 好监听 socket，自己 create_app()，负责采集和目录 / 搜索索引的后台重扫，
+  每次快照更新写进共享内存（sharedsnap），但不处理请求；
+- 再起 N 个 worker 子进程（python serve.py --worker-fd ...），继承同一个 socket，
+  由内核把连接分给它们；worker 里 create_app(follow=...) 只读共享快照，不碰 psutil；
+- worker 退出了主进程负责重起，Ctrl+C / SIGTERM 时一起关掉。
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import config
+
+
+def _listen(host, port, backlog=1024):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+def _max_streams(threads):
+    """waitress 线程池固定大小，给 SSE 设上限；werkzeug 每个连接一个线程，不用限。"""
+    n = getattr(config, "SERVE_MAX_STREAMS", None)
+    if n:
+        return max(1, min(n, threads - 1))
+    try:
+        import waitress  # noqa: F401
+    except ImportError:
+        return None
+    return max(1, threads // 2)
+
+
+def _serve(app, sock, threads):
+    """在已经 listen 的 socket 上跑 WSGI 服务器，直到进程被结束。"""
+    try:
+        import waitress
+    except ImportError:
+        waitress = None
+    if waitress is not None:
+        waitress.serve(app, sockets=[sock], threads=threads, ident="LocalHub")
+        return
+    # 没装 waitress：werkzeug 每个连接一个线程，没有上限
+    from werkzeug.serving import make_server
+    host, port = sock.getsockname()[:2]
+    make_server(host, port, app, threaded=True, fd=sock.fileno()).serve_forever()
+
+
+def _log(msg):
+    print(f"[serve {os.getpid()}] {msg}", file=sys.stderr, flush=True)
+
+
+def run_single(host, port, threads):
+    from app import create_app
+    sock = _listen(host, port)
+    app = create_app(max_streams=_max_streams(threads))
+    _log(f"单进程，{threads} 线程，http://{host}:{port}")
+    _serve(app, sock, threads)
+
+
+def run_worker(fd, snapshot, threads):
+    from app import create_app
+    sock = socket.socket(fileno=fd)
+    app = create_app(follow=snapshot, max_streams=_max_streams(threads))
+    _serve(app, sock, threads)
+
+
+def run_master(host, port, workers, threads):
+    from app import create_app
+    from backend import share_sampler
+    from sharedsnap import default_path
+
+    sock = _listen(host, port)
+    sock.set_inheritable(True)
+    create_app()   # 主进程只要采样器和后台索引，不处理请求
+    snapshot = default_path()
+    writer = share_sampler(snapshot, getattr(config, "SHARED_SNAPSHOT_BYTES", None))
+
+    def spawn():
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker-fd", str(sock.fileno()),
+               "--snapshot", snapshot, "--threads", str(threads)]
+        return {"proc": subprocess.Popen(cmd, pass_fds=(sock.fileno(),)), "started": time.time()}
+
+    procs = [spawn() for _ in range(workers)]
+    _log(f"{workers} 个 worker × {threads} 线程，http://{host}:{port}，共享快照 {snapshot}")
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    try:
+        while not stopping:
+            time.sleep(1.0)
+            for i, w in enumerate(procs):
+                code = w["proc"].poll()
+                if code is None:
+                    continue
+                _log(f"worker {w['proc'].pid} 退出（{code}），重起")
+                # 刚起就挂（比如导入出错）的别疯狂重起
+                if time.time() - w["started"] < 5:
+                    time.sleep(5)
+                procs[i] = spawn()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for w in procs:
+            w["proc"].terminate()
+        for w in procs:
+            try:
+                w["proc"].wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                w["proc"].kill()
+        writer.close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="LocalHub 服务进程")
+    ap.add_argument("--host", default=getattr(config, "SERVE_HOST", "0.0.0.0"))
+    ap.add_argument("--port", type=int, default=getattr(config, "SERVE_PORT", 8000))
+    ap.add_argument("--workers", type=int, default=getattr(config, "SERVE_WORKERS", 1))
+    ap.add_argument("--threads", type=int, default=getattr(config, "SERVE_THREADS", 16))
+    ap.add_argument("--worker-fd", type=int, help=argparse.SUPPRESS)
+    ap.add_argument("--snapshot", help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.worker_fd is not None:
+        run_worker(args.worker_fd, args.snapshot, args.threads)
+    elif args.workers > 1 and os.name == "posix":
+        run_master(args.host, args.port, args.workers, args.threads)
+    else:
+        if args.workers > 1:
+            _log("Windows 上不支持多 worker，改用单进程")
+        run_single(args.host, args.port, args.threads)
+
+
+if __name__ == "__main__":
+    main()
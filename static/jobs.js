@@ -0,0 +1,103 @@
+// jobs.js：文件管理器的多选 + 批量复制 / 移动 / 删除（后台任务，轮询进度，可取消）
+(function () {
+  const bar = document.getElementById("jobBar");
+  const list = document.getElementById("jobList");
+  if (!bar || !list) return;
+  const cur = bar.dataset.path;
+  const all = document.getElementById("jobAll");
+  const count = document.getElementById("jobCount");
+  const LABEL = { copy: "复制", move: "移动", delete: "删除" };
+  const STATE = { queued: "排队中", running: "进行中", done: "完成", failed: "失败", cancelled: "已取消" };
+
+  function picked() {
+    return Array.from(document.querySelectorAll(".job-pick:checked")).map(c => c.value);
+  }
+  function refreshBar() {
+    const n = picked().length;
+    count.textContent = n;
+    bar.querySelectorAll("button[data-job]").forEach(b => { b.disabled = n === 0; });
+  }
+  document.addEventListener("change", e => {
+    if (e.target === all) {
+      document.querySelectorAll(".job-pick:not(:disabled)").forEach(c => { c.checked = all.checked; });
+    }
+    if (e.target === all || e.target.classList.contains("job-pick")) refreshBar();
+  });
+
+  function esc(s) {
+    return String(s).replace(/[&<>"']/g, c => ({ "&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;" }[c]));
+  }
+  function fmtBytes(v) {
+    const u = ["B", "KB", "MB", "GB", "TB"];
+    let i = 0;
+    while (v >= 1024 && i < u.length - 1) { v /= 1024; i++; }
+    return v.toFixed(i ? 1 : 0) + " " + u[i];
+  }
+
+  function render(job) {
+    let el = document.getElementById("job-" + job.id);
+    if (!el) {
+      el = document.createElement("div");
+      el.id = "job-" + job.id;
+      el.className = "border rounded p-2 mb-1 small bg-white";
+      list.prepend(el);
+    }
+    const active = job.state === "queued" || job.state === "running";
+    const bytes = job.total_bytes ? ` · ${fmtBytes(job.done_bytes)} / ${fmtBytes(job.total_bytes)}` : "";
+    const rate = active && job.rate_bps ? ` · ${fmtBytes(job.rate_bps)}/s` : "";
+    const methods = Object.entries(job.methods || {}).map(([k, v]) => `${k} ${v}`).join("，");
+    el.innerHTML = `
+      <div class="d-flex justify-content-between align-items-center">
+        <span>${LABEL[job.kind] || job.kind} ${job.sources.length} 项 · ${STATE[job.state] || job.state}
+          · ${job.done_files} / ${job.total_files} 个${bytes}${rate}
+          ${job.error_count ? `<span class="text-danger">· 出错 ${job.error_count}</span>` : ""}</span>
+        ${active ? '<button class="btn btn-sm btn-link text-danger p-0" data-cancel>取消</button>' : ""}
+      </div>
+      <div class="progress mt-1" style="height: 4px;">
+        <div class="progress-bar ${job.state === "failed" ? "bg-danger" : ""}" style="width: ${job.percent}%"></div>
+      </div>
+      ${methods ? `<div class="text-muted">${esc(methods)}</div>` : ""}
+      ${job.message ? `<div class="text-danger">${esc(job.message)}</div>` : ""}
+      ${job.errors && job.errors.length ? `<div class="text-danger text-truncate" title="${esc(job.errors.join("\n"))}">${esc(job.errors[0])}</div>` : ""}`;
+    const btn = el.querySelector("[data-cancel]");
+    if (btn) btn.onclick = () => fetch(`/api/jobs/${job.id}/cancel`, { method: "POST" }).then(r => r.json()).then(render);
+  }
+
+  function watch(id) {
+    fetch(`/api/jobs/${id}`).then(r => r.json()).then(job => {
+      render(job);
+      if (job.state === "queued" || job.state === "running") {
+        setTimeout(() => watch(id), 700);
+      } else if (job.state === "done" && !job.error_count) {
+        setTimeout(() => location.reload(), 600);   // 列表变了，刷新一下
+      }
+    }).catch(() => setTimeout(() => watch(id), 2000));
+  }
+
+  bar.querySelectorAll("button[data-job]").forEach(b => b.addEventListener("click", () => {
+    const kind = b.dataset.job;
+    const paths = picked();
+    let dest = "";
+    if (kind === "delete") {
+      if (!confirm(`确认删除选中的 ${paths.length} 项？目录会连同里面的内容一起删除，无法恢复。`)) return;
+    } else {
+      dest = prompt(`${LABEL[kind]}到哪个目录？（和地址栏里的 path 写法一样，比如 ${cur || "D:/backup"}）`, cur);
+      if (dest === null) return;
+    }
+    fetch("/api/jobs", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ kind, paths, dest }),
+    }).then(async r => {
+      const data = await r.json();
+      if (!r.ok) throw new Error(data.error || r.status);
+      render(data);
+      watch(data.id);
+    }).catch(e => alert(`${LABEL[kind]}失败：${e.message}`));
+  }));
+
+  // 页面刷新前还没跑完的任务接着显示
+  fetch("/api/jobs?limit=10").then(r => r.json()).then(d => {
+    d.jobs.filter(j => j.state === "queued" || j.state === "running").forEach(j => { render(j); watch(j.id); });
+  }).catch(() => {});
+})();
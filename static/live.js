@@ -0,0 +1,56 @@
+// live.js：订阅 /api/stream，把增量合并进本地状态，原地刷新页面
+// 用法：<span data-field="system.cpu.usage_percent"></span>
+//      LocalHubLive.onUpdate(state => { ... 自己渲染列表 ... })
+(function () {
+  const state = {};
+  const handlers = [];
+
+  function merge(dst, delta) {
+    for (const k in delta) {
+      const v = delta[k];
+      if (v === null) {
+        delete dst[k];
+      } else if (typeof v === "object" && !Array.isArray(v) && typeof dst[k] === "object" && dst[k] !== null && !Array.isArray(dst[k])) {
+        merge(dst[k], v);
+      } else {
+        dst[k] = v;
+      }
+    }
+  }
+
+  function lookup(path) {
+    return path.split(".").reduce((o, k) => (o == null ? undefined : o[k]), state);
+  }
+
+  function render() {
+    document.querySelectorAll("[data-field]").forEach(el => {
+      const v = lookup(el.dataset.field);
+      if (v !== undefined && v !== null) el.textContent = v;
+    });
+    handlers.forEach(fn => fn(state));
+  }
+
+  function connect(url) {
+    if (!window.EventSource) return;
+    const es = new EventSource(url);
+    es.addEventListener("snapshot", e => {
+      for (const k in state) delete state[k];
+      merge(state, JSON.parse(e.data));
+      render();
+    });
+    es.addEventListener("delta", e => {
+      merge(state, JSON.parse(e.data));
+      render();
+    });
+    // 断线浏览器会自己重连；被拒（比如连接数满了返回 503）时连接直接关掉，隔一会儿再试
+    es.addEventListener("error", () => {
+      if (es.readyState === EventSource.CLOSED) setTimeout(() => connect(url), 30000);
+    });
+  }
+
+  window.LocalHubLive = {
+    state: state,
+    connect: connect,
+    onUpdate: fn => handlers.push(fn),
+  };
+})();
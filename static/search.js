@@ -0,0 +1,57 @@
+// search.js：文件管理器顶部的文件名搜索框，边输边查 /api/files/search
+(function () {
+  const input = document.getElementById("fileSearch");
+  const box = document.getElementById("fileSearchResults");
+  if (!input || !box) return;
+  let timer = null;
+  let seq = 0;
+
+  function esc(s) {
+    return s.replace(/[&<>"']/g, c => ({ "&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;" }[c]));
+  }
+
+  function href(r) {
+    if (r.is_dir) return "/files?path=" + encodeURIComponent(r.path);
+    return "/files/download?path=" + encodeURIComponent(r.path);
+  }
+
+  function parent(p) {
+    const i = p.lastIndexOf("/");
+    return i < 0 ? "" : p.slice(0, i);
+  }
+
+  function render(data) {
+    if (!data.results || !data.results.length) {
+      box.innerHTML = `<div class="list-group-item small text-muted">没有匹配的文件</div>`;
+    } else {
+      box.innerHTML = data.results.map(r =>
+        `<a class="list-group-item list-group-item-action py-1" href="${href(r)}">
+           <div class="font-monospace small">${r.is_dir ? "📁" : "📄"} ${esc(r.name)}</div>
+           <div class="small text-muted">/${esc(parent(r.path))}</div>
+         </a>`).join("") +
+        `<div class="list-group-item small text-muted">${data.results.length}${data.truncated ? "+" : ""} 条 · ${data.took_ms} ms</div>`;
+    }
+    box.classList.remove("d-none");
+  }
+
+  function query() {
+    let q = input.value.trim();
+    if (!q) { box.classList.add("d-none"); return; }
+    let mode = "auto";
+    if (q.startsWith("^")) { mode = "prefix"; q = q.slice(1); }
+    const my = ++seq;
+    fetch(`/api/files/search?mode=${mode}&limit=50&q=` + encodeURIComponent(q))
+      .then(r => r.json())
+      .then(data => { if (my === seq) render(data); })
+      .catch(() => {});
+  }
+
+  input.addEventListener("input", () => {
+    clearTimeout(timer);
+    timer = setTimeout(query, 150);
+  });
+  input.addEventListener("keydown", e => { if (e.key === "Escape") box.classList.add("d-none"); });
+  document.addEventListener("click", e => {
+    if (!box.contains(e.target) && e.target !== input) box.classList.add("d-none");
+  });
+})();
@@ -0,0 +1,99 @@
+// upload.js：把文件管理器的上传表单换成分块上传（并行、失败重试、断点续传）
+(function () {
+  const PARALLEL = 3;
+  const RETRIES = 3;
+
+  async function sha256Hex(buf) {
+    if (!(window.crypto && crypto.subtle)) return null;   // 非安全上下文没有 subtle，跳过校验
+    const d = await crypto.subtle.digest("SHA-256", buf);
+    return Array.from(new Uint8Array(d)).map(b => b.toString(16).padStart(2, "0")).join("");
+  }
+
+  async function putChunk(id, file, start, end) {
+    const buf = await file.slice(start, end).arrayBuffer();
+    const headers = { "Content-Type": "application/octet-stream" };
+    const sum = await sha256Hex(buf);
+    if (sum) headers["X-Chunk-SHA256"] = sum;
+    for (let i = 0; ; i++) {
+      const r = await fetch(`/api/uploads/${id}?offset=${start}`, { method: "PUT", headers, body: buf }).catch(() => null);
+      if (r && r.ok) return r.json();
+      if (i >= RETRIES) throw new Error(r ? (await r.json()).error : "网络错误");
+    }
+  }
+
+  function missing(received, size, chunk) {
+    // 根据服务端记录的已收到区间算出还要传的分块
+    const out = [];
+    let pos = 0;
+    const spans = received.concat([[size, size]]);
+    for (const [a, b] of spans) {
+      for (let s = pos; s < a; s += chunk) out.push([s, Math.min(a, s + chunk)]);
+      pos = Math.max(pos, b);
+    }
+    return out;
+  }
+
+  async function upload(path, file, onProgress) {
+    const key = `upload:${path}:${file.name}:${file.size}:${file.lastModified}`;
+    let id = localStorage.getItem(key);
+    let st = null;
+    if (id) {
+      const r = await fetch(`/api/uploads/${id}`);
+      st = r.ok ? await r.json() : null;
+    }
+    let chunk = 8 * 1024 * 1024;
+    if (!st) {
+      const r = await fetch("/api/uploads", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ path: path, filename: file.name, size: file.size }),
+      });
+      const j = await r.json();
+      if (!r.ok) throw new Error(j.error);
+      id = j.id;
+      chunk = j.chunk_size;
+      st = { received: [], received_bytes: 0 };
+      localStorage.setItem(key, id);
+    }
+
+    const todo = missing(st.received, file.size, chunk);
+    let done = st.received_bytes;
+    onProgress(done, file.size);
+    async function worker() {
+      while (todo.length) {
+        const [s, e] = todo.shift();
+        await putChunk(id, file, s, e);
+        done += e - s;
+        onProgress(done, file.size);
+      }
+    }
+    await Promise.all(Array.from({ length: PARALLEL }, worker));
+
+    const r = await fetch(`/api/uploads/${id}/finalize`, { method: "POST" });
+    const j = await r.json();
+    if (!r.ok) throw new Error(j.error);
+    localStorage.removeItem(key);
+    return j.name;
+  }
+
+  document.addEventListener("DOMContentLoaded", function () {
+    const form = document.getElementById("uploadForm");
+    if (!form || !window.fetch) return;
+    const status = document.getElementById("uploadStatus");
+    form.addEventListener("submit", async function (ev) {
+      const input = form.querySelector("input[type=file]");
+      const file = input && input.files[0];
+      if (!file) return;   // 交给原表单，服务端会提示“没有选择文件”
+      ev.preventDefault();
+      const path = form.querySelector("input[name=path]").value;
+      try {
+        await upload(path, file, (n, total) => {
+          if (status) status.textContent = `上传中 ${total ? Math.floor(n * 100 / total) : 100}%`;
+        });
+        location.reload();
+      } catch (e) {
+        if (status) status.textContent = `上传失败：${e.message}（再次上传会从断点继续）`;
+      }
+    });
+  });
+})();
@@ -0,0 +1,6 @@
+# tests/conftest.py
+# 模块都在仓库根目录，直接 pytest 时也能 import
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,197 @@
+# tests/test_gpuprobe.py
+"""GPU 采集：popen 换成跑 Python 脚本的假 nvidia-smi，不需要 N 卡；静态信息用固定的 WMI 输出。"""
+import json
+import subprocess
+import sys
+import time
+
+import backend
+from gpuprobe import StreamProbe, StaticInventory, nvidia_smi_cmd, parse_nvidia_smi, parse_gpu_load
+
+NVSMI_LINES = [
+    "0, GPU-aaaa, NVIDIA GeForce RTX 3080, 535.104.05, 10240, 1024, 37, 55",
+    "1, GPU-bbbb, NVIDIA GeForce RTX 3080, 535.104.05, 10240, [N/A], [Not Supported], 60",
+]
+
+
+def fake_popen(runs):
+    """
+    返回一个 popen 替身：第 i 次被调用时起一个 Python 子进程，按顺序打印 runs[i] 里的行后退出
+    （最后一组一直重复用）。调用过的命令行记在 .calls 里。
+    """
+    def popen(cmd, **kw):
+        popen.calls.append(cmd)
+        lines = runs[min(len(popen.calls), len(runs)) - 1]
+        script = "import sys\nfor l in %r:\n    print(l, flush=True)\n" % (lines,)
+        return subprocess.Popen([sys.executable, "-c", script], **kw)
+    popen.calls = []
+    return popen
+
+
+def wait_for(cond, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if cond():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_parse_nvidia_smi_line():
+    idx, d = parse_nvidia_smi(NVSMI_LINES[0])
+    assert idx == 0
+    assert d["name"] == "NVIDIA GeForce RTX 3080"
+    assert d["memory_total_mb"] == 10240 and d["memory_used_mb"] == 1024
+    assert d["load"] == 37 and d["temperature"] == 55
+    _, d = parse_nvidia_smi(NVSMI_LINES[1])
+    assert d["memory_used_mb"] is None and d["load"] is None   # [N/A] / [Not Supported]
+    assert parse_nvidia_smi("index, uuid, name") is None
+    assert parse_nvidia_smi("") is None
+
+
+def test_stream_probe_reads_canned_output():
+    popen = fake_popen([NVSMI_LINES + ["garbage line"], []])
+    probe = StreamProbe(nvidia_smi_cmd(2), parse_nvidia_smi, popen=popen, restart_delay=0.05)
+    probe.start()
+    try:
+        assert wait_for(lambda: set(probe.latest()) == {0, 1})
+        assert probe.latest()[0]["load"] == 37
+        assert probe.latest(max_age=60)[1]["temperature"] == 60
+        assert popen.calls[0][0] == "nvidia-smi"
+    finally:
+        probe.stop()
+    assert not probe.running
+
+
+def test_stream_probe_restarts_after_child_dies():
+    first = ["0, GPU-aaaa, A, 1, 100, 10, 20, 30"]
+    second = ["0, GPU-aaaa, A, 1, 100, 10, 90, 30"]
+    popen = fake_popen([first, second])
+    probe = StreamProbe(["nvidia-smi"], parse_nvidia_smi, popen=popen, restart_delay=0.05)
+    probe.start()
+    try:
+        # 第一个子进程打完一行就退出；重启后的新值要能读到
+        assert wait_for(lambda: probe.latest().get(0, {}).get("load") == 90)
+        assert len(popen.calls) >= 2
+        assert probe.restarts >= 1
+        assert probe.error and probe.error.startswith("exited with")
+    finally:
+        probe.stop()
+
+
+def test_stream_probe_gives_up_after_max_restarts():
+    popen = fake_popen([[]])   # 每次起来什么都不输出就退出
+    probe = StreamProbe(["nvidia-smi"], parse_nvidia_smi, popen=popen, restart_delay=0.01, max_restarts=2)
+    probe.start()
+    assert wait_for(lambda: not probe.running)
+    assert len(popen.calls) == 3
+    assert probe.latest() == {}
+
+
+def test_stream_probe_popen_failure_is_retried():
+    calls = []
+
+    def popen(cmd, **kw):
+        calls.append(cmd)
+        raise FileNotFoundError("nvidia-smi")
+
+    probe = StreamProbe(["nvidia-smi"], parse_nvidia_smi, popen=popen, restart_delay=0.01, max_restarts=1)
+    probe.start()
+    assert wait_for(lambda: not probe.running)
+    assert len(calls) == 2
+    assert "nvidia-smi" in probe.error
+
+
+def test_stream_probe_latest_goes_stale():
+    popen = fake_popen([["12.5"], []])
+    probe = StreamProbe(["powershell"], parse_gpu_load, popen=popen, restart_delay=60)
+    probe.start()
+    try:
+        assert wait_for(lambda: probe.latest().get("load") == 12.5)
+        time.sleep(0.2)
+        assert probe.latest(max_age=0.1) == {}   # 子进程挂了没有新样本，不展示过期数据
+    finally:
+        probe.stop()
+
+
+def test_stop_kills_long_running_child():
+    def popen(cmd, **kw):
+        script = "import time\nprint('1.0', flush=True)\ntime.sleep(60)\n"
+        popen.proc = subprocess.Popen([sys.executable, "-c", script], **kw)
+        return popen.proc
+
+    probe = StreamProbe(["powershell"], parse_gpu_load, popen=popen)
+    probe.start()
+    assert wait_for(lambda: probe.latest().get("load") == 1.0)
+    probe.stop()
+    assert popen.proc.wait(timeout=5) is not None
+
+
+# ---- 静态信息 ----
+WMI_ONE = {"Name": "NVIDIA GeForce RTX 3080", "AdapterRAM": 4293918720,
+           "DriverVersion": "31.0.15.3623", "PNPDeviceID": "PCI\\VEN_10DE"}
+WMI_TWO = [WMI_ONE, {"Name": "Intel(R) UHD Graphics 630", "AdapterRAM": None, "DriverVersion": None}]
+
+
+def test_wmi_inventory_parse(monkeypatch):
+    monkeypatch.setattr(backend, "_ps_run", lambda script: json.dumps(WMI_ONE))
+    (gpu,) = backend._win_gpu_wmi_basic()   # 只有一块卡时 ConvertTo-Json 输出的是对象不是数组
+    assert gpu["vendor"] == "NVIDIA"
+    assert gpu["memory_total"] == "4095 MB"
+    assert gpu["memory_total_bytes"] == 4293918720
+    assert gpu["notes"] == ["Driver 31.0.15.3623"]
+
+    monkeypatch.setattr(backend, "_ps_run", lambda script: json.dumps(WMI_TWO))
+    gpus = backend._win_gpu_wmi_basic()
+    assert [g["vendor"] for g in gpus] == ["NVIDIA", "Intel"]
+    assert gpus[1]["memory_total"] is None and gpus[1]["notes"] == []
+
+
+def test_wmi_inventory_falls_back_and_handles_garbage(monkeypatch):
+    scripts = []
+
+    def ps_run(script):
+        scripts.append(script)
+        return "" if "Get-CimInstance" in script else json.dumps(WMI_ONE)
+
+    monkeypatch.setattr(backend, "_ps_run", ps_run)
+    assert len(backend._win_gpu_wmi_basic()) == 1
+    assert "Get-WmiObject" in scripts[-1]   # CIM 失败后换老接口
+
+    monkeypatch.setattr(backend, "_ps_run", lambda script: "not json")
+    assert backend._win_gpu_wmi_basic() == []
+
+
+def test_static_inventory_loads_once_in_background():
+    calls = []
+
+    def query():
+        calls.append(1)
+        return [{"name": "GPU"}]
+
+    inv = StaticInventory(query)
+    assert inv.get() == []   # 第一次不阻塞，后台去查
+    assert wait_for(lambda: inv.get() == [{"name": "GPU"}])
+    for _ in range(5):
+        inv.get()
+    assert len(calls) == 1
+
+
+def test_static_inventory_retries_after_failure():
+    results = [RuntimeError("boom"), [], [{"name": "GPU"}]]
+
+    def query():
+        r = results.pop(0)
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+    inv = StaticInventory(query, retry_after=0.1)
+    assert inv.load() == []       # 抛异常算失败
+    assert inv.get() == []        # retry_after 内不重试
+    assert len(results) == 2
+    time.sleep(0.15)
+    assert inv.load() == []       # 空列表也算失败
+    time.sleep(0.15)
+    assert inv.load() == [{"name": "GPU"}]
+    assert inv.get() == [{"name": "GPU"}]
@@ -0,0 +1,141 @@
+# tests/test_psworker.py
+"""ShellPool：用一个几行的 Python 回显服务代替 PowerShell，走同样的 \x1e 分帧协议。"""
+import sys
+import threading
+import time
+
+import pytest
+
+from psworker import ShellError, ShellPool, ShellWorker
+
+# script 的几种写法：echo:<文本> / sleep:<秒> / fail:<消息> / crash / pid / noise / stale
+ECHO_SERVER = r'''
+import json, os, sys, time
+MARK = "\x1e"
+
+def reply(**kw):
+    sys.stdout.write(MARK + json.dumps(kw) + "\n")
+    sys.stdout.flush()
+
+for line in sys.stdin:
+    if not line.strip():
+        continue
+    req = json.loads(line)
+    rid, cmd = req["id"], req["script"]
+    op, _, arg = cmd.partition(":")
+    if op == "echo":
+        reply(id=rid, ok=True, out=arg)
+    elif op == "sleep":
+        time.sleep(float(arg))
+        reply(id=rid, ok=True, out="slept")
+    elif op == "fail":
+        reply(id=rid, ok=False, error=arg)
+    elif op == "crash":
+        sys.exit(3)
+    elif op == "pid":
+        reply(id=rid, ok=True, out=str(os.getpid()))
+    elif op == "noise":
+        print("stray output without the marker", flush=True)
+        sys.stdout.write(MARK + "{not json\n")
+        reply(id=rid, ok=True, out="clean")
+    elif op == "stale":
+        reply(id=rid - 1, ok=True, out="old")
+        reply(id=rid, ok=True, out="new")
+'''
+
+ARGV = [sys.executable, "-u", "-c", ECHO_SERVER]
+
+
+@pytest.fixture
+def pool():
+    p = ShellPool(ARGV, size=2, timeout=5.0, idle_timeout=0)
+    yield p
+    p.close()
+
+
+def test_round_trip_and_reuse(pool):
+    assert pool.run("echo:你好") == "你好"
+    pid = pool.run("pid")
+    assert pool.run("pid") == pid   # 同一个常驻进程，不是每次新起
+    assert pool.stats()["starts"] == 1
+
+
+def test_ignores_unframed_and_stale_lines(pool):
+    assert pool.run("noise") == "clean"
+    assert pool.run("stale") == "new"
+
+
+def test_script_error_keeps_process(pool):
+    pid = pool.run("pid")
+    with pytest.raises(ShellError, match="bad thing"):
+        pool.run("fail:bad thing")
+    assert pool.run("pid") == pid
+    assert pool.stats()["errors"] == 1
+
+
+def test_timeout_kills_and_next_call_restarts(pool):
+    pid = pool.run("pid")
+    t0 = time.perf_counter()
+    with pytest.raises(ShellError, match="超时"):
+        pool.run("sleep:10", timeout=0.3)
+    assert time.perf_counter() - t0 < 2
+    assert pool.stats()["timeouts"] == 1
+    assert pool.stats()["alive"] == 0
+    assert pool.run("pid") != pid     # 卡住的进程被杀，换了新的
+    assert pool.stats()["starts"] == 2
+
+
+def test_crash_fails_fast_and_restarts(pool):
+    pid = pool.run("pid")
+    t0 = time.perf_counter()
+    with pytest.raises(ShellError, match="崩溃"):
+        pool.run("crash", timeout=5)
+    assert time.perf_counter() - t0 < 2   # 不用等到超时
+    assert pool.run("echo:back") == "back"
+    assert pool.run("pid") != pid
+
+
+def test_parallel_calls_use_separate_workers(pool):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.run("sleep:0.5"))) for _ in range(2)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ["slept", "slept"]
+    assert time.perf_counter() - t0 < 0.95
+    assert pool.stats()["alive"] == 2
+
+
+def test_no_idle_worker_times_out():
+    pool = ShellPool(ARGV, size=1, timeout=5.0, idle_timeout=0)
+    try:
+        th = threading.Thread(target=lambda: pool.run("sleep:0.5"))
+        th.start()
+        time.sleep(0.1)
+        with pytest.raises(ShellError, match="没有空闲"):
+            pool.run("echo:x", timeout=0.1)
+        th.join()
+    finally:
+        pool.close()
+
+
+def test_idle_workers_are_reaped():
+    pool = ShellPool(ARGV, size=1, timeout=5.0, idle_timeout=0.2)
+    try:
+        pool.run("echo:x")
+        assert pool.stats()["alive"] == 1
+        deadline = time.time() + 5
+        while pool.stats()["alive"] and time.time() < deadline:
+            time.sleep(0.05)
+        assert pool.stats()["alive"] == 0
+        assert pool.run("echo:y") == "y"   # 用到时再起
+    finally:
+        pool.close()
+
+
+def test_start_failure_is_shell_error():
+    w = ShellWorker(["/nonexistent/powershell"])
+    with pytest.raises(ShellError, match="启动失败"):
+        w.run("echo:x", timeout=1)
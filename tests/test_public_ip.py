@@ -0,0 +1,96 @@
+# tests/test_public_ip.py
+"""公网 IP 查询：本地起一个 http.server 代替 ipify，测缓存、换下一个地址和返回垃圾的情况。"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import backend
+
+
+class _Handler(BaseHTTPRequestHandler):
+    routes = {}   # path -> (状态码, 响应体)
+    hits = {}
+
+    def do_GET(self):
+        self.hits[self.path] = self.hits.get(self.path, 0) + 1
+        status, body = self.routes.get(self.path, (404, b"not found"))
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    # 本机地址别走环境里配的代理
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1,localhost")
+    monkeypatch.setenv("no_proxy", "127.0.0.1,localhost")
+    _Handler.routes = {
+        "/ip": (200, b"203.0.113.7\n"),
+        "/ip6": (200, b"2001:db8::1"),
+        "/html": (200, b"<html><body>Login required</body></html>"),
+        "/error": (500, b"oops"),
+    }
+    _Handler.hits = {}
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_get_public_ip_parses_body(server):
+    assert backend._get_public_ip([server + "/ip"], timeout=2) == "203.0.113.7"
+    assert backend._get_public_ip([server + "/ip6"], timeout=2) == "2001:db8::1"
+
+
+def test_get_public_ip_falls_back_to_next_url(server):
+    urls = [server + "/error", server + "/missing", server + "/ip"]
+    assert backend._get_public_ip(urls, timeout=2) == "203.0.113.7"
+    assert _Handler.hits == {"/error": 1, "/missing": 1, "/ip": 1}
+
+
+def test_get_public_ip_rejects_malformed_body(server):
+    # 门户劫持页 / 错误页不能当成 IP
+    assert backend._get_public_ip([server + "/html"], timeout=2) is None
+    assert backend._get_public_ip([server + "/html", server + "/ip"], timeout=2) == "203.0.113.7"
+
+
+def test_cache_serves_within_ttl(server):
+    cache = backend._PublicIpCache(urls=[server + "/ip"], ttl=60, negative_ttl=60, timeout=2)
+    assert cache.get() is None and cache.pending   # 第一次立即返回，后台去查
+    assert cache.refresh() == "203.0.113.7"
+    for _ in range(5):
+        assert cache.get() == "203.0.113.7"
+    time.sleep(0.2)
+    assert _Handler.hits["/ip"] <= 2   # 后台那次 + 同步那次，TTL 内不再查
+
+
+def test_cache_refreshes_after_ttl(server):
+    cache = backend._PublicIpCache(urls=[server + "/ip"], ttl=0.2, negative_ttl=60, timeout=2)
+    cache.refresh()
+    before = _Handler.hits["/ip"]
+    time.sleep(0.3)
+    assert cache.get() == "203.0.113.7"   # 过期了也先给旧值
+    deadline = time.time() + 5
+    while _Handler.hits["/ip"] == before and time.time() < deadline:
+        time.sleep(0.05)
+    assert _Handler.hits["/ip"] == before + 1
+
+
+def test_cache_keeps_old_value_and_negative_caches(server):
+    cache = backend._PublicIpCache(urls=[server + "/ip"], ttl=0, negative_ttl=60, timeout=2)
+    cache.refresh()
+    cache.configure(urls=[server + "/html"])
+    assert cache.refresh() == "203.0.113.7"   # 全失败时保留旧值
+    hits = _Handler.hits.get("/html", 0)
+    for _ in range(5):
+        cache.get()
+    time.sleep(0.2)
+    assert _Handler.hits.get("/html", 0) == hits   # 负缓存期内不重试
@@ -0,0 +1,177 @@
+# timeseries.py
+"""
+固定内存的多分辨率时序存储。
+
+每个分辨率一层环形缓冲（列式：一列 slot 号 + 每个指标一列 float），
+默认三层：1 秒保留 10 分钟、10 秒保留 24 小时、1 分钟保留 30 天。
+写入时逐层累加求平均，桶满一个 step 就落到对应层；
+查询时挑能覆盖该时间范围的最细一层，按 slot 直接定位，不扫原始样本。
+"""
+import math
+import re
+import threading
+from array import array
+
+# (step 秒, 保留秒数)
+DEFAULT_LEVELS = (
+    (1, 10 * 60),
+    (10, 24 * 3600),
+    (60, 30 * 86400),
+)
+
+_RANGE_RE = re.compile(r"^\s*(\d+)\s*([smhd]?)\s*$")
+_UNIT = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
+NAN = float("nan")
+
+
+def parse_range(text, default=3600):
+    """'90s' / '10m' / '1h' / '7d' → 秒"""
+    if not text:
+        return default
+    m = _RANGE_RE.match(str(text).lower())
+    if not m:
+        raise ValueError(f"无法解析时间范围：{text}")
+    return int(m.group(1)) * _UNIT[m.group(2)]
+
+
+def downsample(pts, max_points, step):
+    """点数超过 max_points 时把相邻点合并求平均；返回 (points, 新的 step)。"""
+    if not max_points or len(pts) <= max_points:
+        return pts, step
+    group = math.ceil(len(pts) / max_points)
+    merged = []
+    for i in range(0, len(pts), group):
+        chunk = pts[i:i + group]
+        merged.append((chunk[0][0], sum(v for _, v in chunk) / len(chunk)))
+    return merged, step * group
+
+
+class _Level:
+    def __init__(self, step, retention):
+        self.step = step
+        self.capacity = max(1, retention // step)
+        self.slots = array("q", [-1]) * self.capacity   # 每个位置当前存的是哪个 slot
+        self.cols = {}                                   # metric -> array('f')
+        # 正在累加的桶
+        self.cur_slot = None
+        self.sums = {}
+        self.counts = {}
+
+    def _col(self, metric):
+        col = self.cols.get(metric)
+        if col is None:
+            col = array("f", [NAN]) * self.capacity
+            self.cols[metric] = col
+        return col
+
+    def _flush(self):
+        if self.cur_slot is None:
+            return
+        pos = self.cur_slot % self.capacity
+        self.slots[pos] = self.cur_slot
+        for metric, col in self.cols.items():
+            n = self.counts.get(metric)
+            col[pos] = self.sums[metric] / n if n else NAN
+        for metric, n in self.counts.items():
+            if metric not in self.cols:
+                self._col(metric)[pos] = self.sums[metric] / n
+        self.sums = {}
+        self.counts = {}
+
+    def add(self, ts, values):
+        slot = int(ts // self.step)
+        if self.cur_slot is not None and slot < self.cur_slot:
+            return  # 时钟回拨的样本直接丢掉
+        if slot != self.cur_slot:
+            self._flush()
+            self.cur_slot = slot
+        for metric, v in values.items():
+            if v is None:
+                continue
+            self.sums[metric] = self.sums.get(metric, 0.0) + float(v)
+            self.counts[metric] = self.counts.get(metric, 0) + 1
+
+    def read(self, metric, start, end):
+        col = self.cols.get(metric)
+        s0 = int(start // self.step)
+        s1 = int(end // self.step)
+        s0 = max(s0, s1 - self.capacity + 1)
+        out = []
+        for slot in range(s0, s1 + 1):
+            if slot == self.cur_slot:
+                # 还没落盘的当前桶，直接用累加值
+                n = self.counts.get(metric)
+                if n:
+                    out.append((slot * self.step, self.sums[metric] / n))
+                continue
+            if col is None:
+                continue
+            pos = slot % self.capacity
+            if self.slots[pos] != slot:
+                continue
+            v = col[pos]
+            if not math.isnan(v):
+                out.append((slot * self.step, v))
+        return out
+
+    def nbytes(self):
+        return (self.slots.itemsize * len(self.slots)
+                + sum(c.itemsize * len(c) for c in self.cols.values()))
+
+
+class MetricStore:
+    def __init__(self, levels=DEFAULT_LEVELS):
+        self._levels = [_Level(step, retention) for step, retention in levels]
+        self._lock = threading.Lock()
+
+    def add(self, ts, values):
+        """values: {metric: float}；None 表示本次没有该指标。"""
+        with self._lock:
+            for lv in self._levels:
+                lv.add(ts, values)
+
+    def metrics(self):
+        with self._lock:
+            names = set()
+            for lv in self._levels:
+                names.update(lv.cols)
+                names.update(lv.counts)
+            return sorted(names)
+
+    @property
+    def retention(self):
+        """最粗一层能回看多少秒，再早的数据内存里没有。"""
+        lv = self._levels[-1]
+        return lv.step * lv.capacity
+
+    def _pick(self, span):
+        for lv in self._levels:
+            if lv.step * lv.capacity >= span:
+                return lv
+        return self._levels[-1]
+
+    def query(self, metric, start, end, max_points=None):
+        """
+        返回 {"step": 秒, "points": [[ts, value], ...]}。
+        max_points 给定时把相邻点再合并求平均，控制返回体积。
+        """
+        with self._lock:
+            lv = self._pick(end - start)
+            pts = lv.read(metric, start, end)
+            step = lv.step
+        pts, step = downsample(pts, max_points, step)
+        return {"step": step, "points": [[t, round(v, 3)] for t, v in pts]}
+
+    def drop(self, names):
+        """删掉一批指标（比如消失的网卡），释放它们占的列。"""
+        with self._lock:
+            for lv in self._levels:
+                for n in names:
+                    lv.cols.pop(n, None)
+                    lv.sums.pop(n, None)
+                    lv.counts.pop(n, None)
+
+    def nbytes(self):
+        with self._lock:
+            return sum(lv.nbytes() for lv in self._levels)
@@ -0,0 +1,290 @@
+# uploads.py
+"""
+分块、可续传的上传：
+
+    POST   /api/uploads                {path, filename, size}  → {id, chunk_size}
+    PUT    /api/uploads/<id>?offset=N  原始字节（可带 X-Chunk-SHA256）
+    GET    /api/uploads/<id>           已收到的区间，断线后据此补传
+    POST   /api/uploads/<id>/finalize  校验齐全后原子改名
+    DELETE /api/uploads/<id>           放弃
+
+数据直接 pwrite 进目标目录下的 .part 文件，不经过 Werkzeug 的临时文件；
+每个请求按 1 MiB 小块边读边写，内存占用和文件大小无关；
+各分块互不依赖，可以并行上传。状态存在 state_dir/<id>.json，进程重启后也能续传。
+超过 ttl 秒没有新分块的上传视为放弃，连同 .part 一起清掉（启动时和新建上传时顺带检查）。
+"""
+import contextlib
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:   # Windows：serve.py 不支持多进程，进程内的锁就够了
+    fcntl = None
+
+from werkzeug.utils import secure_filename
+
+from backend import _safe_join, dir_cache, _notify_write
+
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+READ_BLOCK = 1024 * 1024
+SWEEP_EVERY = 600   # 新建上传时最多每 10 分钟扫一次过期上传
+
+
+class UploadError(Exception):
+    """客户端可以看到的错误；status 是建议的 HTTP 状态码。"""
+
+    def __init__(self, msg, status=400):
+        super().__init__(msg)
+        self.status = status
+
+
+def _merge(ranges, s, e):
+    out = []
+    for a, b in sorted(ranges + [[s, e]]):
+        if out and a <= out[-1][1]:
+            out[-1][1] = max(out[-1][1], b)
+        else:
+            out.append([a, b])
+    return out
+
+
+def _pwrite(fd, data, offset):
+    if hasattr(os, "pwrite"):
+        return os.pwrite(fd, data, offset)
+    # Windows 没有 pwrite；每个请求各开各的 fd，lseek + write 也不会互相干扰
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.write(fd, data)
+
+
+class UploadManager:
+    def __init__(self, state_dir, chunk_size=8 * 1024 * 1024, max_chunk=64 * 1024 * 1024, ttl=72 * 3600):
+        self.state_dir = state_dir
+        self.chunk_size = chunk_size
+        self.max_chunk = max_chunk
+        self.ttl = ttl
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._swept = 0.0
+        self.sweep()
+
+    # ---- 状态文件 ----
+    def _meta_path(self, uid):
+        if not _ID_RE.match(uid or ""):
+            raise UploadError("无效的上传 ID", 404)
+        return os.path.join(self.state_dir, uid + ".json")
+
+    def _load(self, uid):
+        try:
+            with open(self._meta_path(uid), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadError("上传不存在或已结束", 404)
+
+    def _save(self, meta):
+        path = self._meta_path(meta["id"])
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _uid_lock(self, uid):
+        with self._lock:
+            return self._locks.setdefault(uid, threading.Lock())
+
+    @contextlib.contextmanager
+    def _locked(self, uid):
+        """
+        读-合并-写状态文件时持有：进程内用线程锁，
+        serve.py --workers 下同一上传的分块会落到不同进程，再加一把 flock。
+        锁在单独的 <id>.lock 上，状态文件每次 os.replace 换 inode，锁不住。
+        """
+        with self._uid_lock(uid):
+            if fcntl is None:
+                yield
+                return
+            fd = os.open(self._meta_path(uid)[:-5] + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    def _forget(self, uid):
+        """状态文件删掉之后再删锁文件；正在等锁的人拿到锁后 _load 会得到 404。"""
+        try:
+            os.remove(self._meta_path(uid)[:-5] + ".lock")
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._locks.pop(uid, None)
+
+    # ---- 过期清理 ----
+    def sweep(self, now=None):
+        """放弃超过 ttl 没动静的上传：删 .part 和状态文件，返回清掉几个。"""
+        if not self.ttl:
+            return 0
+        now = time.time() if now is None else now
+        self._swept = now
+        try:
+            names = os.listdir(self.state_dir)
+        except OSError:
+            return 0
+        removed = 0
+        for n in names:
+            path = os.path.join(self.state_dir, n)
+            if n.endswith(".tmp"):
+                # 写状态时崩掉留下的半截文件
+                try:
+                    if os.path.getmtime(path) < now - self.ttl:
+                        os.remove(path)
+                except OSError:
+                    pass
+                continue
+            uid = n[:-5]
+            if not n.endswith(".json") or not _ID_RE.match(uid):
+                continue
+            try:
+                # 每收到一块都会重写状态文件，mtime 就是最后活动时间
+                if os.path.getmtime(path) >= now - self.ttl:
+                    continue
+                self.abort(uid)
+                removed += 1
+            except (OSError, UploadError, ValueError):
+                pass
+        # 没有状态文件对应的锁文件（abort 中途崩掉）
+        for n in names:
+            if n.endswith(".lock") and n[:-5] + ".json" not in names:
+                try:
+                    os.remove(os.path.join(self.state_dir, n))
+                except OSError:
+                    pass
+        return removed
+
+    # ---- 协议 ----
+    def init(self, root, rel_dir, filename, size):
+        if time.time() - self._swept > SWEEP_EVERY:
+            self.sweep()
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            raise UploadError("size 无效")
+        if size < 0:
+            raise UploadError("size 无效")
+        base = _safe_join(root, rel_dir)
+        base.mkdir(parents=True, exist_ok=True)
+        name = secure_filename(filename or "") or (filename or "")
+        if not name or "/" in name or "\\" in name:
+            raise UploadError("文件名无效")
+
+        os.makedirs(self.state_dir, exist_ok=True)
+        uid = uuid.uuid4().hex
+        part = str(base / f".{name}.{uid}.part")
+        fd = os.open(part, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            os.ftruncate(fd, size)   # 稀疏预分配，分块可以乱序写
+        finally:
+            os.close(fd)
+
+        meta = {
+            "id": uid,
+            "dir": str(base),
+            "filename": name,
+            "part": part,
+            "size": size,
+            "received": [],
+            "created": time.time(),
+        }
+        self._save(meta)
+        return {"id": uid, "chunk_size": self.chunk_size, "size": size, "filename": name}
+
+    def write_chunk(self, uid, offset, stream, length, sha256=None):
+        meta = self._load(uid)
+        if length is None:
+            raise UploadError("需要 Content-Length", 411)
+        if length > self.max_chunk:
+            raise UploadError("分块太大", 413)
+        if offset < 0 or offset + length > meta["size"]:
+            raise UploadError("offset 越界", 416)
+
+        h = hashlib.sha256() if sha256 else None
+        fd = os.open(meta["part"], os.O_WRONLY | getattr(os, "O_BINARY", 0))
+        try:
+            pos = offset
+            left = length
+            while left > 0:
+                buf = stream.read(min(READ_BLOCK, left))
+                if not buf:
+                    raise UploadError("连接中断，分块不完整", 400)
+                if h:
+                    h.update(buf)
+                mv = memoryview(buf)
+                while mv:
+                    n = _pwrite(fd, mv, pos)
+                    mv = mv[n:]
+                    pos += n
+                left -= len(buf)
+        finally:
+            os.close(fd)
+
+        if h and h.hexdigest() != sha256.lower():
+            # 数据已经写进去了，但不记为已收到，客户端重传这一块就会覆盖
+            raise UploadError("分块校验失败", 422)
+
+        with self._locked(uid):
+            meta = self._load(uid)
+            meta["received"] = _merge(meta["received"], offset, offset + length)
+            self._save(meta)
+        return self._status(meta)
+
+    def status(self, uid):
+        return self._status(self._load(uid))
+
+    @staticmethod
+    def _status(meta):
+        got = sum(b - a for a, b in meta["received"])
+        return {
+            "id": meta["id"],
+            "filename": meta["filename"],
+            "size": meta["size"],
+            "received": meta["received"],
+            "received_bytes": got,
+            "complete": got == meta["size"],
+        }
+
+    def finalize(self, uid):
+        with self._locked(uid):
+            meta = self._load(uid)
+            st = self._status(meta)
+            if not st["complete"]:
+                raise UploadError("还有分块没收到", 409)
+            dst = os.path.join(meta["dir"], meta["filename"])
+            # 落盘后再原子替换，别人永远看不到半截文件
+            fd = os.open(meta["part"], os.O_RDONLY | getattr(os, "O_BINARY", 0))
+            try:
+                os.fsync(fd)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+            os.replace(meta["part"], dst)
+            os.remove(self._meta_path(uid))
+            self._forget(uid)
+        dir_cache.upsert(meta["dir"], meta["filename"])
+        _notify_write(meta["dir"])
+        return meta["filename"]
+
+    def abort(self, uid):
+        with self._locked(uid):
+            meta = self._load(uid)
+            try:
+                os.remove(meta["part"])
+            except FileNotFoundError:
+                pass
+            os.remove(self._meta_path(uid))
+            self._forget(uid)